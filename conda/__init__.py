@@ -10,7 +10,6 @@ import os
 from os.path import dirname
 import sys
 
-from ._vendor.auxlib.packaging import get_version
 from .common.compat import iteritems, text_type
 
 __all__ = (
@@ -18,8 +17,20 @@ __all__ = (
     "CONDA_PACKAGE_ROOT", "CondaError", "CondaMultiError", "CondaExitZero", "conda_signal_handler",
 )
 
+
+def _get_version():
+    # An installed conda carries a .version file. Only a development checkout needs
+    # auxlib's git-based lookup, which imports setuptools and is slow to load.
+    try:
+        with open(os.path.join(dirname(__file__), '.version')) as fh:
+            return fh.read().strip()
+    except (IOError, OSError):
+        from ._vendor.auxlib.packaging import get_version
+        return get_version(__file__)
+
+
 __name__ = "conda"
-__version__ = get_version(__file__)
+__version__ = _get_version()
 __author__ = "Continuum Analytics, Inc."
 __email__ = "conda@continuum.io"
 __license__ = "BSD"
@@ -2,16 +2,140 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from glob import glob
+import json
 import os
 from os.path import abspath, basename, dirname, expanduser, expandvars, isdir, join
 import re
+from stat import S_ISDIR
 import sys
 
+from . import __version__ as CONDA_VERSION
+from .base.constants import ROOT_ENV_NAME, SEARCH_PATH
+
 try:
     from cytoolz.itertoolz import concatv
 except ImportError:  # pragma: no cover
     from ._vendor.toolz.itertoolz import concatv  # NOQA
 
+ACTIVATION_CACHE_VERSION = 1
+ACTIVATION_CACHE_FN = '.activate_cache.json'
+
+# environment variables that can override the configuration the activator needs
+ACTIVATION_ENV_VARS = (
+    'CONDA_CHANGEPS1',
+    'CONDA_ENVS_DIRS',
+    'CONDA_ENVS_PATH',
+    'CONDA_MAX_SHLVL',
+    'CONDA_ROOT_DIR',
+    'CONDA_ROOT_PREFIX',
+)
+
+
+class ActivationContext(object):
+    # A minimal stand-in for conda.base.context.context, holding only the parameters the
+    #   activator reads.  Shell activation runs in every new terminal, so building it should
+    #   not require loading conda's full configuration machinery.
+    #
+    # The values are cached in a small json file, together with a fingerprint of everything
+    #   they were computed from: the mtime of every file on the condarc search path, the
+    #   relevant environment variables, and the conda install.  The full context is loaded
+    #   (and the cache rewritten) only when the fingerprint changes.
+
+    def __init__(self, root_prefix, max_shlvl, changeps1, envs_dirs):
+        self.root_prefix = root_prefix
+        self.max_shlvl = max_shlvl
+        self.changeps1 = changeps1
+        self.envs_dirs = tuple(envs_dirs)
+
+    def dump(self):
+        return {
+            'root_prefix': self.root_prefix,
+            'max_shlvl': self.max_shlvl,
+            'changeps1': self.changeps1,
+            'envs_dirs': list(self.envs_dirs),
+        }
+
+    @classmethod
+    def from_context(cls, context):
+        return cls(context.root_prefix, context.max_shlvl, context.changeps1, context.envs_dirs)
+
+    @classmethod
+    def load(cls):
+        fingerprint = get_activation_fingerprint()
+        cache_paths = get_activation_cache_paths()
+        for cache_path in cache_paths:
+            cached = read_activation_cache(cache_path, fingerprint)
+            if cached is not None:
+                return cls(**cached)
+
+        from .base.context import context
+        activation_context = cls.from_context(context)
+        for cache_path in cache_paths:
+            if write_activation_cache(cache_path, fingerprint, activation_context):
+                break
+        return activation_context
+
+
+def get_activation_cache_paths():
+    return (
+        join(sys.prefix, 'conda-meta', ACTIVATION_CACHE_FN),
+        expand(join('~', '.conda', ACTIVATION_CACHE_FN)),
+    )
+
+
+def get_activation_fingerprint():
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except (IOError, OSError):
+            return None
+        if S_ISDIR(st.st_mode):
+            return sorted([fn, os.stat(join(path, fn)).st_mtime] for fn in os.listdir(path)
+                          if fn.endswith(('.yml', '.yaml')))
+        return st.st_mtime
+
+    # paths still holding an unset environment variable can't name a real file; leaving them
+    #   out keeps the fingerprint from depending on the current working directory
+    search_path = (expand(path) for path in SEARCH_PATH if '$' not in expandvars(path))
+    return {
+        'conda_version': CONDA_VERSION,
+        'conda_prefix': sys.prefix,
+        'search_path': [[path, _stamp(path)] for path in search_path],
+        'env_vars': dict((key, os.environ[key]) for key in ACTIVATION_ENV_VARS
+                         if key in os.environ),
+    }
+
+
+def read_activation_cache(cache_path, fingerprint):
+    try:
+        with open(cache_path) as fh:
+            cache = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache.get('version') != ACTIVATION_CACHE_VERSION or cache.get('fingerprint') != fingerprint:
+        return None
+    return cache.get('context')
+
+
+def write_activation_cache(cache_path, fingerprint, activation_context):
+    cache = {
+        'version': ACTIVATION_CACHE_VERSION,
+        'fingerprint': fingerprint,
+        'context': activation_context.dump(),
+    }
+    temp_path = '%s.%s' % (cache_path, os.getpid())
+    try:
+        with open(temp_path, 'w') as fh:
+            json.dump(cache, fh)
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        try:
+            os.unlink(temp_path)
+        except (IOError, OSError):
+            pass
+        return False
+    return True
+
 
 class Activator(object):
     # Activate and deactivate have three tasks
@@ -35,8 +159,11 @@ class Activator(object):
     # To implement support for a new shell, ideally one would only need to add shell-specific
     # information to the __init__ method of this class.
 
-    def __init__(self, shell):
-        from .base.context import context
+    def __init__(self, shell, context=None):
+        # context can be any object exposing the root_prefix, max_shlvl, changeps1, and
+        #   envs_dirs parameters, e.g. an ActivationContext
+        if context is None:
+            from .base.context import context
         self.context = context
 
         if shell == 'posix':
@@ -104,8 +231,7 @@ class Activator(object):
                 from .exceptions import EnvironmentLocationNotFound
                 raise EnvironmentLocationNotFound(prefix)
         else:
-            from .base.context import locate_prefix_by_name
-            prefix = locate_prefix_by_name(self.context, name_or_prefix)
+            prefix = self._locate_prefix_by_name(name_or_prefix)
 
         # query environment
         old_conda_shlvl = int(os.getenv('CONDA_SHLVL', 0))
@@ -280,6 +406,19 @@ class Activator(object):
                 path_list.insert(idx, join(new_prefix, 'bin'))
         return self.path_conversion(*path_list)
 
+    def _locate_prefix_by_name(self, name):
+        # same search as EnvsDirectory.locate_prefix_by_name, without importing conda.core
+        if name == ROOT_ENV_NAME:
+            return self.context.root_prefix
+
+        for envs_dir in concatv(self.context.envs_dirs, (os.getcwd(),)):
+            prefix = join(envs_dir, name)
+            if isdir(prefix):
+                return prefix
+
+        from .exceptions import EnvironmentNameNotFound
+        raise EnvironmentNameNotFound(name)
+
     def _default_env(self, prefix):
         if prefix == self.context.root_prefix:
             return 'root'
@@ -342,7 +481,7 @@ else:  # pragma: py2 no cover
 def main():
     command = sys.argv[1]
     shell = sys.argv[2]
-    activator = Activator(shell)
+    activator = Activator(shell, ActivationContext.load())
     remainder_args = sys.argv[3:] if len(sys.argv) >= 4 else ()
     # if '-h' in remainder_args or '--help' in remainder_args:
     #     pass
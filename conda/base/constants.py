@@ -90,6 +90,10 @@ ROOT_NO_RM = (
 MAX_CHANNEL_PRIORITY = 10000
 
 CONDA_TARBALL_EXTENSION = '.tar.bz2'
+# appended to a tarball's name while it is being downloaded
+PARTIAL_EXTENSION = '.partial'
+# appended to a tarball's name for the url and validators of the download its partial file holds
+PARTIAL_INFO_EXTENSION = '.partial.json'
 
 UNKNOWN_CHANNEL = "<unknown>"
 
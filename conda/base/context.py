@@ -71,6 +71,13 @@ def default_python_validation(value):
     return "default_python value '%s' not of the form '[23].[0-9]'" % value
 
 
+def sat_solver_validation(value):
+    from ..logic import SAT_SOLVERS
+    if value not in SAT_SOLVERS:
+        return ("sat_solver value '%s' must be one of: %s" % (value, ', '.join(SAT_SOLVERS)))
+    return True
+
+
 def ssl_verify_validation(value):
     if isinstance(value, string_types):
         if not isfile(value):
@@ -81,6 +88,9 @@ def ssl_verify_validation(value):
 
 class Context(Configuration):
 
+    # compiled condarc files; kept per user since they include the user's own condarc
+    _config_cache_paths = (join(expanduser('~'), '.conda', '.condarc_cache'), )
+
     add_pip_as_python_dependency = PrimitiveParameter(True)
     allow_softlinks = PrimitiveParameter(True)
     auto_update_conda = PrimitiveParameter(True, aliases=('self_update',))
@@ -92,11 +102,16 @@ class Context(Configuration):
                                         element_type=string_types + (NoneType,))
     disallow = SequenceParameter(string_types)
     enable_private_envs = PrimitiveParameter(False)
+    explain_conflicts = PrimitiveParameter(True)
     force_32bit = PrimitiveParameter(False)
     max_shlvl = PrimitiveParameter(2)
     path_conflict = PrimitiveParameter(PathConflict.clobber)
     pinned_packages = SequenceParameter(string_types, string_delimiter='/')  # TODO: consider a different string delimiter  # NOQA
     rollback_enabled = PrimitiveParameter(True)
+    sat_solver = PrimitiveParameter('pycosat', validation=sat_solver_validation)
+    solver_processes = PrimitiveParameter(1)
+    solver_prop_limit = PrimitiveParameter(0)
+    solver_timeout_secs = PrimitiveParameter(0.)
     track_features = SequenceParameter(string_types)
     use_pip = PrimitiveParameter(True)
     skip_safety_checks = PrimitiveParameter(False)
@@ -124,6 +139,8 @@ class Context(Configuration):
     remote_connect_timeout_secs = PrimitiveParameter(9.15)
     remote_read_timeout_secs = PrimitiveParameter(60.)
     remote_max_retries = PrimitiveParameter(3)
+    download_segment_threshold = PrimitiveParameter(100 * 1024 * 1024)
+    download_segments = PrimitiveParameter(4)
 
     add_anaconda_token = PrimitiveParameter(True, aliases=('add_binstar_token',))
     _channel_alias = PrimitiveParameter(DEFAULT_CHANNEL_ALIAS,
@@ -617,11 +634,27 @@ def get_help_dict():
             Package specifications to disallow installing. The default is to allow
             all packages.
             """),
+        'download_segment_threshold': dals("""
+            Packages of at least this many bytes are downloaded in download_segments byte
+            ranges at once, from servers that support range requests, when concurrent is
+            enabled. A value of 0 downloads every package as a single stream.
+            """),
+        'download_segments': dals("""
+            The number of byte ranges, each fetched over its own connection, that a
+            package larger than download_segment_threshold is split into.
+            """),
         'envs_dirs': dals("""
             The list of directories to search for named environments. When creating a new
             named environment, the environment will be placed in the first writable
             location.
             """),
+        'explain_conflicts': dals("""
+            When the requested package specifications conflict, search for the
+            dependency chains that cause the conflict, and report them. Explanations
+            are cached in the package cache, keyed by the specifications and the
+            channel contents. When False, fail immediately, listing all the requested
+            specifications.
+            """),
         'force': dals("""
             Override any of conda's objections and safeguards for installing packages and
             potentially breaking environments. Also re-installs the package, even if the
@@ -690,6 +723,13 @@ def get_help_dict():
             Should any error occur during an unlink/link transaction, revert any disk
             mutations made to that point in the transaction.
             """),
+        'sat_solver': dals("""
+            The SAT solver backend used to resolve package specifications. 'pycosat'
+            (the default) hands the complete problem to the solver on every query.
+            'pycryptosat' and 'pysat' keep a single incremental solver alive for each
+            solve, which is considerably faster for large environments, but require
+            the pycryptosat or python-sat package, respectively.
+            """),
         'shortcuts': dals("""
             Allow packages to create OS-specific shortcuts (e.g. in the Windows Start
             Menu) at install time.
@@ -697,6 +737,23 @@ def get_help_dict():
         'show_channel_urls': dals("""
             Show channel URLs when displaying what is going to be downloaded.
             """),
+        'solver_processes': dals("""
+            The number of worker processes used to run independent solver queries
+            concurrently, when looking for alternate solutions and when searching for
+            the cause of a conflict. A value of 0 uses one process per CPU. Not
+            supported on Windows.
+            """),
+        'solver_prop_limit': dals("""
+            The propagation limit of each SAT solver query made while optimizing a
+            solution; 0 means no limit. When a query reaches it, the best solution found
+            so far is used. Combine with solver_timeout_secs to bound the time spent in
+            any single query.
+            """),
+        'solver_timeout_secs': dals("""
+            The number of seconds after which conda stops optimizing a solution, and uses
+            the best one found so far, with a warning; 0 means no limit. The check happens
+            between SAT solver queries, so a solve can run over by up to one query.
+            """),
         'ssl_verify': dals("""
             Conda verifies SSL certificates for HTTPS requests, just like a web
             browser. By default, SSL verification is enabled, and conda operations will
@@ -143,6 +143,14 @@ def add_parser_install(p):
         action="store_true",
         default=False,
         help="Use an alternate algorithm to generate an unsatisfiability hint.")
+    p.add_argument(
+        "--no-explain",
+        action="store_false",
+        dest="explain_conflicts",
+        default=NULL,
+        help="When the package specifications conflict, fail right away instead of "
+             "searching for the cause of the conflict.",
+    )
     p.add_argument(
         "--update-dependencies", "--update-deps",
         action="store_true",
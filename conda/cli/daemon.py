@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+An opt-in, long-running conda process that serves commands over a local Unix socket.
+
+Start a daemon with::
+
+    python -m conda.cli.daemon [SOCKET_PATH]
+
+and set CONDA_DAEMON_SOCKET to the socket path. Both the conda command line and
+``conda.cli.python_api.run_command`` then hand their command to the daemon instead of starting
+up conda themselves. Every command still re-reads the configuration, but the daemon keeps
+repodata, package cache contents and prefix metadata loaded between commands. Those are
+reloaded only when the files they were read from change on disk.
+
+Commands are run one at a time, each in the working directory and with the environment
+variables of the client that sent it. Output is returned once the command has finished, and
+commands that would prompt for confirmation fail instead; pass --yes or --dry-run.
+
+Messages are JSON documents preceded by their length as a 4-byte big-endian integer. A client
+sends ``{"argv": [...], "cwd": ..., "env": {...}}`` and receives
+``{"stdout": ..., "stderr": ..., "rc": ...}``. ``{"shutdown": true}`` stops the daemon.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from contextlib import contextmanager
+import json
+from logging import getLogger
+import os
+from os.path import expanduser, join
+import socket
+import struct
+import sys
+
+# This module is imported by thin clients on every invocation. Keep its module-level imports
+# cheap, and import the rest of conda in the functions that run in the daemon.
+
+DAEMON_SOCKET_VAR = 'CONDA_DAEMON_SOCKET'
+HEADER = struct.Struct(str('>I'))
+
+# loggers a command may reconfigure, and which are restored after every command
+COMMAND_LOGGERS = (None, 'conda', 'requests', 'requests.packages.urllib3', 'print', 'dotupdate',
+                   'stdoutlog', 'stderrlog', 'progress', 'fetch')
+
+log = getLogger(__name__)
+
+
+def default_socket_path():
+    return join(expanduser('~'), '.conda', 'daemon.sock')
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data.decode('utf-8'))
+
+
+def _connect(socket_path):
+    if not socket_path or not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (IOError, OSError):
+        sock.close()
+        return None
+    return sock
+
+
+def _request(sock, message):
+    try:
+        send_message(sock, message)
+        response = recv_message(sock)
+    finally:
+        sock.close()
+    if response is None:
+        from ..exceptions import CondaError
+        raise CondaError("The conda daemon closed the connection before answering.")
+    return response
+
+
+def run_in_daemon(arguments, socket_path=None):
+    """Run a conda command line, without the leading 'conda', in a daemon.
+
+    Returns a tuple of stdout, stderr, and return_code, or None if no daemon is listening on
+    socket_path, which defaults to $CONDA_DAEMON_SOCKET.
+    """
+    sock = _connect(socket_path or os.getenv(DAEMON_SOCKET_VAR))
+    if sock is None:
+        return None
+    response = _request(sock, {
+        'argv': list(arguments),
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    })
+    return response['stdout'], response['stderr'], response['rc']
+
+
+def shutdown_daemon(socket_path=None):
+    """Ask a daemon to exit after its current command. Returns False if none is listening."""
+    sock = _connect(socket_path or os.getenv(DAEMON_SOCKET_VAR))
+    if sock is None:
+        return False
+    _request(sock, {'shutdown': True})
+    return True
+
+
+class _NoInput(object):
+
+    def readline(self, *args):
+        from ..exceptions import CondaError
+        raise CondaError("The conda daemon cannot prompt for input. "
+                         "Pass --yes or --dry-run instead.")
+
+    read = readline
+
+
+@contextmanager
+def _command_environment(argv, cwd, env):
+    saved_argv, saved_stdin, saved_cwd = sys.argv, sys.stdin, os.getcwd()
+    saved_environ = os.environ.copy()
+    saved_loggers = [(logr, logr.level, list(logr.handlers), logr.propagate)
+                     for logr in (getLogger(name) for name in COMMAND_LOGGERS)]
+    sys.argv, sys.stdin = ['conda'] + list(argv), _NoInput()
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        os.chdir(cwd)
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        sys.argv, sys.stdin = saved_argv, saved_stdin
+        for logr, level, handlers, propagate in saved_loggers:
+            logr.setLevel(level)
+            logr.handlers[:] = handlers
+            logr.propagate = propagate
+
+
+def refresh_caches():
+    """Forget whatever this process has loaded that has since changed on disk."""
+    from ..core.linked_data import delete_stale_linked_data
+    from ..core.package_cache import PackageCache
+    from ..models.channel import Channel
+
+    delete_stale_linked_data()
+    PackageCache.clear_stale()
+    Channel._reset_state()
+
+
+def run_command_line(argv):
+    from ..common.compat import text_type
+    from ..exceptions import conda_exception_handler
+    from .main import _main
+
+    try:
+        return conda_exception_handler(_main, 'conda', *argv) or 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        sys.stderr.write(text_type(e.code))
+        return 1
+
+
+class CondaDaemon(object):
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._shutdown = False
+
+    def _bind(self):
+        from ..exceptions import CondaError
+
+        if os.path.exists(self.socket_path):
+            sock = _connect(self.socket_path)
+            if sock is not None:
+                sock.close()
+                raise CondaError("A conda daemon is already listening on %s"
+                                 % self.socket_path)
+            os.unlink(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # only the user running the daemon may connect to it
+        saved_umask = os.umask(0o077)
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(saved_umask)
+        sock.listen(16)
+        return sock
+
+    def serve_forever(self):
+        server = self._bind()
+        log.info("conda daemon listening on %s", self.socket_path)
+        try:
+            while not self._shutdown:
+                conn, _ = server.accept()
+                try:
+                    self.handle(conn)
+                finally:
+                    conn.close()
+        finally:
+            server.close()
+            os.unlink(self.socket_path)
+
+    def handle(self, conn):
+        request = recv_message(conn)
+        if request is None:
+            return
+        if request.get('shutdown'):
+            self._shutdown = True
+            send_message(conn, {'stdout': '', 'stderr': '', 'rc': 0})
+        else:
+            try:
+                response = self.execute(request)
+            except Exception as e:
+                log.debug("failed to run %r", request, exc_info=True)
+                response = {'stdout': '', 'stderr': "conda daemon error: %r\n" % e, 'rc': 1}
+            send_message(conn, response)
+
+    def execute(self, request):
+        from ..common.io import captured, replace_log_streams
+
+        env = dict(request['env'])
+        # subprocesses of a command, such as link scripts, must not call back into this daemon
+        env.pop(DAEMON_SOCKET_VAR, None)
+        refresh_caches()
+        with _command_environment(request['argv'], request['cwd'], env):
+            with captured() as c, replace_log_streams():
+                return_code = run_command_line(request['argv'])
+        log.debug("conda %s returned %s", ' '.join(request['argv']), return_code)
+        return {'stdout': c.stdout, 'stderr': c.stderr, 'rc': return_code}
+
+
+def main(args=None):
+    from argparse import ArgumentParser
+
+    from ..gateways.logging import initialize_logging
+
+    p = ArgumentParser(prog='python -m conda.cli.daemon',
+                       description="Serve conda commands over a local Unix socket.")
+    p.add_argument('socket_path', nargs='?',
+                   default=os.getenv(DAEMON_SOCKET_VAR) or default_socket_path(),
+                   help="Path of the socket to listen on (default: $%s, or %s)."
+                        % (DAEMON_SOCKET_VAR, default_socket_path()))
+    args = p.parse_args(args)
+    initialize_logging()
+    CondaDaemon(args.socket_path).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
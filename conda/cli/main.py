@@ -35,8 +35,53 @@ Additional help for each command can be accessed by using:
     conda <command> -h
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
+import os
 import sys
 
+# Each subcommand, mapped to the suffix of the conda.cli.main_* module that configures
+# and executes it. Only the module of the subcommand being run is imported.
+SUBCOMMANDS = (
+    ('info', 'info'),
+    ('help', 'help'),
+    ('list', 'list'),
+    ('search', 'search'),
+    ('create', 'create'),
+    ('install', 'install'),
+    ('update', 'update'),
+    ('upgrade', 'update'),
+    ('remove', 'remove'),
+    ('uninstall', 'remove'),
+    ('config', 'config'),
+    ('clean', 'clean'),
+    ('prefetch', 'prefetch'),
+    ('package', 'package'),
+)
+SUBCOMMAND_MODULES = dict(SUBCOMMANDS)
+
+
+def configure_subcommand_parsers(sub_parsers, commands=None):
+    """Add the parsers for commands, or for all subcommands, to sub_parsers."""
+    import importlib
+    for command, suffix in SUBCOMMANDS:
+        if commands is None or command in commands:
+            module = importlib.import_module('conda.cli.main_' + suffix)
+            if command == suffix:
+                module.configure_parser(sub_parsers)
+            else:
+                module.configure_parser(sub_parsers, name=command)
+
+
+def find_subcommand(args):
+    """Return the subcommand args will run, if it is a builtin subcommand and not
+    preceded by a help flag; otherwise None.  `conda help` prints the help of every
+    subcommand, so it gets None too."""
+    for arg in args:
+        if arg in ('-h', '--help'):
+            return None
+        elif not arg.startswith('-'):
+            return arg if arg in SUBCOMMAND_MODULES and arg != 'help' else None
+    return None
+
 
 def generate_parser():
     from argparse import SUPPRESS
@@ -76,7 +121,6 @@ def generate_parser():
 
 
 def _main(*args):
-    import importlib
     from logging import CRITICAL, DEBUG, getLogger
 
     from ..base.constants import SEARCH_PATH
@@ -90,26 +134,23 @@ def _main(*args):
 
     p, sub_parsers = generate_parser()
 
-    main_modules = ["info", "help", "list", "search", "create", "install", "update",
-                    "remove", "config", "clean", "package"]
-    modules = ["conda.cli.main_"+suffix for suffix in main_modules]
-    for module in modules:
-        imported = importlib.import_module(module)
-        imported.configure_parser(sub_parsers)
-        if "update" in module:
-            imported.configure_parser(sub_parsers, name='upgrade')
-        if "remove" in module:
-            imported.configure_parser(sub_parsers, name='uninstall')
-
-    from .find_commands import find_commands
+    def is_command(arg):
+        if arg in SUBCOMMAND_MODULES or arg.startswith('-'):
+            return True
+        from .find_commands import find_commands
+        return arg in find_commands()
 
     # when using sys.argv, first argument is generally conda or __main__.py.  Ignore it.
     if (any(sname in args[0] for sname in ('conda', 'conda.exe', '__main__.py', 'conda-script.py'))
-        and (args[1] in list(sub_parsers.choices.keys()) + find_commands()
-             or args[1].startswith('-'))):
+            and is_command(args[1])):
         log.debug("Ignoring first argument (%s), as it is not a subcommand", args[0])
         args = args[1:]
 
+    # Only a builtin subcommand's own parser is needed to run it. Help output, and the
+    # dispatch of external conda-* commands on a parse error, need all of them.
+    command = find_subcommand(args)
+    configure_subcommand_parsers(sub_parsers, None if command is None else (command,))
+
     args = p.parse_args(args)
 
     context.__init__(SEARCH_PATH, 'conda', args)
@@ -156,6 +197,16 @@ def main(*args):
             initialize_logging()
             return handle_exception(e)
 
+    # keep in sync with conda.cli.daemon.DAEMON_SOCKET_VAR, which is only imported when set
+    if len(args) > 1 and os.getenv('CONDA_DAEMON_SOCKET'):
+        from .daemon import run_in_daemon
+        response = run_in_daemon(args[1:])
+        if response is not None:
+            stdout, stderr, return_code = response
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+            return return_code
+
     from ..exceptions import conda_exception_handler
     return conda_exception_handler(_main, *args)
 
@@ -13,7 +13,7 @@ from os.path import getsize, isdir, join
 import sys
 
 from .conda_argparse import add_parser_json, add_parser_yes
-from ..base.constants import CONDA_TARBALL_EXTENSION
+from ..base.constants import CONDA_TARBALL_EXTENSION, PARTIAL_EXTENSION, PARTIAL_INFO_EXTENSION
 from ..base.context import context
 
 log = getLogger(__name__)
@@ -76,14 +76,15 @@ def find_tarballs():
     from ..core.package_cache import PackageCache
     pkgs_dirs = defaultdict(list)
     totalsize = 0
-    part_ext = CONDA_TARBALL_EXTENSION + '.part'
+    part_exts = (CONDA_TARBALL_EXTENSION + '.part', CONDA_TARBALL_EXTENSION + PARTIAL_EXTENSION,
+                 CONDA_TARBALL_EXTENSION + PARTIAL_INFO_EXTENSION)
     for package_cache in PackageCache.all_writable(context.pkgs_dirs):
         pkgs_dir = package_cache.pkgs_dir
         if not isdir(pkgs_dir):
             continue
         root, _, filenames = next(os.walk(pkgs_dir))
         for fn in filenames:
-            if fn.endswith(CONDA_TARBALL_EXTENSION) or fn.endswith(part_ext):
+            if fn.endswith(CONDA_TARBALL_EXTENSION) or fn.endswith(part_exts):
                 pkgs_dirs[pkgs_dir].append(fn)
                 totalsize += getsize(join(root, fn))
 
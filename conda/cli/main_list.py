@@ -28,6 +28,10 @@ List all packages installed into the environment 'myenv':
 
     conda list -n myenv
 
+Inventory every environment, one JSON document per line:
+
+    conda list --all-envs --json
+
 Save packages for future use:
 
     conda list --export > package-list.txt
@@ -80,6 +84,12 @@ def configure_parser(sub_parsers):
         help="Output requirement string only (output may be used by "
              " conda create --file).",
     )
+    p.add_argument(
+        "--all-envs",
+        action="store_true",
+        help="List the packages of every known environment. With --json, one JSON "
+             "document is written per line for each environment, as soon as it is read.",
+    )
     p.add_argument(
         '-r', "--revisions",
         action="store_true",
@@ -186,27 +196,91 @@ def print_packages(prefix, regex=None, format='human', piplist=False,
     return exitcode
 
 
+def print_all_envs(regex=None, format='human', piplist=False, json=False,
+                   show_channel_urls=None):
+    from json import dumps
+    from os.path import basename, dirname
+    import sys
+
+    from .._vendor.auxlib.entity import EntityEncoder
+    from ..base.constants import ROOT_ENV_NAME
+    from ..base.context import context
+    from ..common.compat import text_type
+    from ..core.envs_manager import list_all_known_prefixes
+    from ..core.linked_data import linked, load_linked_data_concurrently
+
+    exitcode = 0
+    for prefix, _, error in load_linked_data_concurrently(list_all_known_prefixes()):
+        if prefix == context.root_prefix:
+            name = ROOT_ENV_NAME
+        elif dirname(prefix) in context.envs_dirs:
+            name = basename(prefix)
+        else:
+            name = None
+        if json:
+            document = {'prefix': prefix, 'name': name}
+            if error is None:
+                document['packages'] = list_packages(prefix, linked(prefix), regex,
+                                                     format='canonical')[1]
+            else:
+                document['error'] = text_type(error)
+            sys.stdout.write(dumps(document, sort_keys=True, cls=EntityEncoder) + '\n')
+            sys.stdout.flush()
+        elif error is None:
+            print_packages(prefix, regex, format, piplist=piplist,
+                           show_channel_urls=show_channel_urls)
+            print()
+        else:
+            log.debug("cannot list %s", prefix, exc_info=error)
+            sys.stderr.write("# cannot list %s: %s\n" % (prefix, error))
+        if error is not None:
+            exitcode = 1
+    return exitcode
+
+
 def print_explicit(prefix, add_md5=False):
     from ..base.constants import UNKNOWN_CHANNEL
     from ..base.context import context
-    from ..core.linked_data import linked_data
+    from ..core.linked_data import iter_linked_records
     if not isdir(prefix):
         from ..exceptions import EnvironmentLocationNotFound
         raise EnvironmentLocationNotFound(prefix)
+    if add_md5:
+        # records without an md5 get the checksum of their tarball in the package cache
+        from ..core.package_cache import PackageCache
+        pkgs_dirs = context.pkgs_dirs
     print_export_header(context.subdir)
     print("@EXPLICIT")
-    for meta in sorted(linked_data(prefix).values(), key=lambda x: x['name']):
+    for meta in iter_linked_records(prefix):
         url = meta.get('url')
         if not url or url.startswith(UNKNOWN_CHANNEL):
             print('# no URL for: %s' % meta['fn'])
             continue
-        md5 = meta.get('md5')
-        print(url + ('#%s' % md5 if add_md5 and md5 else ''))
+        md5 = add_md5 and (meta.get('md5') or PackageCache.md5sum_for_url(url, pkgs_dirs))
+        print(url + ('#%s' % md5 if md5 else ''))
+
+
+def print_export(prefix, regex=None):
+    from ..base.context import context
+    from ..core.linked_data import iter_linked_records
+    if not isdir(prefix):
+        from ..exceptions import EnvironmentLocationNotFound
+        raise EnvironmentLocationNotFound(prefix)
+    print_export_header(context.subdir)
+    pat = re.compile(regex, re.I) if regex else None
+    # ordered by the lowercased name, as the output always has been
+    for rec in sorted(iter_linked_records(prefix), key=lambda rec: rec['name'].lower()):
+        if pat is None or pat.search(rec['name']):
+            print('%(name)s=%(version)s=%(build)s' % rec)
 
 
 def execute(args, parser):
     from ..base.context import context
     from .common import stdout_json
+    if args.all_envs and (args.name or args.prefix or args.revisions or args.explicit):
+        from ..exceptions import CondaValueError
+        raise CondaValueError("--all-envs cannot be combined with --name, --prefix, "
+                              "--revisions or --explicit")
     prefix = context.prefix_w_legacy_search
     regex = args.regex
     if args.full_name:
@@ -238,6 +312,14 @@ def execute(args, parser):
     if context.json:
         format = 'canonical'
 
+    if format == 'export' and not args.all_envs:
+        print_export(prefix, regex)
+        return
+
+    if args.all_envs:
+        return print_all_envs(regex, format, piplist=args.pip, json=context.json,
+                              show_channel_urls=context.show_channel_urls)
+
     exitcode = print_packages(prefix, regex, format, piplist=args.pip,
                               json=context.json,
                               show_channel_urls=context.show_channel_urls)
@@ -0,0 +1,116 @@
+# (c) Continuum Analytics, Inc. / http://continuum.io
+# All Rights Reserved
+#
+# conda is distributed under the terms of the BSD 3-clause license.
+# Consult LICENSE.txt or http://opensource.org/licenses/BSD-3-Clause.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from logging import getLogger
+
+from .common import ensure_override_channels_requires_channel, specs_from_args, stdout_json
+from .conda_argparse import add_parser_channels, add_parser_json
+from ..base.context import context
+
+log = getLogger(__name__)
+
+descr = """Fetch channel metadata and packages into the caches ahead of time.
+
+The repodata of every channel is fetched for each subdir (and for noarch) and stored
+in the index cache, ready to be loaded. Given package specifications, the packages a
+new environment with those specifications would need are also downloaded into the
+package cache, several at a time. Packages that are already cached are skipped, so
+an interrupted prefetch can simply be run again.
+
+Later commands can then run from the caches alone with --offline.
+"""
+
+example = """
+Examples:
+
+Cache the repodata of conda-forge for 64-bit Linux and macOS:
+
+    conda prefetch -c conda-forge --subdir linux-64 --subdir osx-64
+
+Also download everything an environment with numpy and scipy would need:
+
+    conda prefetch numpy scipy
+
+Later, create that environment without touching the network:
+
+    conda create -n sci --offline numpy scipy
+"""
+
+
+def configure_parser(sub_parsers):
+    p = sub_parsers.add_parser(
+        'prefetch',
+        description=descr,
+        help="Fetch channel metadata and packages into the caches ahead of time.",
+        epilog=example,
+    )
+    p.add_argument(
+        '--subdir',
+        action='append',
+        dest='subdirs',
+        help="""Platform subdirectory to fetch, formatted like 'osx-64', 'linux-32', 'win-64',
+        and so on. May be given more than once. The default is the current platform.""",
+    )
+    p.add_argument(
+        'packages',
+        metavar='package_spec',
+        action="store",
+        nargs='*',
+        help="Packages to solve for and download, together with their dependencies.",
+    )
+    add_parser_channels(p)
+    add_parser_json(p)
+    p.set_defaults(func=execute)
+
+
+def execute(args, parser):
+    from ..core.index import get_index
+    from ..core.package_cache import ProgressiveFetchExtract
+    from ..exceptions import CondaMultiError
+    from ..resolve import Resolve
+
+    ensure_override_channels_requires_channel(args)
+    if context.offline:
+        from ..exceptions import CondaValueError
+        raise CondaValueError("conda prefetch cannot run offline")
+    specs = specs_from_args(args.packages, json=context.json)
+
+    index, link_dists = {}, []
+    for subdir in args.subdirs or (context.subdir,):
+        subdir_index = get_index(channel_urls=context.channels, prepend=not args.override_channels,
+                                 platform=subdir)
+        if specs:
+            dists = Resolve(subdir_index).install(specs)
+            index.update((dist, subdir_index[dist]) for dist in dists)
+            link_dists.extend(dist for dist in dists if dist not in link_dists)
+
+    pfe = ProgressiveFetchExtract(index, link_dists)
+    pfe.prepare()
+    total = len(pfe.cache_actions)
+    if link_dists and not context.json:
+        print("%d of %d packages are already cached."
+              % (len(link_dists) - total, len(link_dists)))
+
+    fetched, errors = [], []
+    for q, (action, error) in enumerate(pfe.fetch_concurrently(), 1):
+        if error is None:
+            fetched.append(action.url)
+        else:
+            errors.extend(error.errors)
+        if not context.json:
+            print("[%d/%d] %s %s" % (q, total, 'failed' if error else 'fetched',
+                                     action.target_package_basename))
+
+    if errors:
+        raise CondaMultiError(errors)
+    if context.json:
+        stdout_json({
+            'success': True,
+            'packages': sorted(index[dist]['url'] for dist in link_dists),
+            'fetched': sorted(fetched),
+        })
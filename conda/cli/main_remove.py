@@ -114,9 +114,9 @@ def execute(args, parser):
     from ..exceptions import CondaEnvironmentError, CondaValueError, PackageNotFoundError
     from ..gateways.disk.delete import delete_trash
     from ..plan import (get_blank_actions)
-    from ..core.solve import get_resolve_object
+    from ..core.solve import resolve_for_prefix
     from ..core.solve import solve_for_actions
-    from ..resolve import MatchSpec
+    from ..resolve import MatchSpec, Resolve
     from ..core.linked_data import linked_data
     from ..gateways.disk.delete import rm_rf
     from ..instructions import PREFIX
@@ -166,21 +166,23 @@ def execute(args, parser):
         specs = specs_from_args(args.package_names)
         env_spec_map = groupby(get_env, specs)
         action_groups = []
+        shared_r = Resolve(index.copy())
         for env_name, spcs in iteritems(env_spec_map):
             pfx = ed.to_prefix(env_name)
-            r = get_resolve_object(index.copy(), pfx)
             specs_to_remove = tuple(MatchSpec(s) for s in spcs)
             prune = pfx != context.root_prefix
-            dists_for_unlinking, dists_for_linking = solve_for_actions(
-                pfx, r,
-                specs_to_remove=specs_to_remove, prune=prune,
-            )
+            with resolve_for_prefix(shared_r, pfx) as r:
+                dists_for_unlinking, dists_for_linking = solve_for_actions(
+                    pfx, r,
+                    specs_to_remove=specs_to_remove, prune=prune,
+                )
+                pfx_index = r.index.copy()
             actions = get_blank_actions(pfx)
             actions['UNLINK'].extend(dists_for_unlinking)
             actions['LINK'].extend(dists_for_linking)
             actions['SPECS'].extend(s.spec for s in specs_to_remove)
             actions['ACTION'] = 'REMOVE'
-            action_groups.append((actions, r.index))
+            action_groups.append((actions, pfx_index))
         action_groups = tuple(action_groups)
     else:
         specs = specs_from_args(args.package_names)
@@ -5,8 +5,10 @@ from importlib import import_module
 from logging import getLogger
 from shlex import split
 
+from .. import CondaError
 from ..base.constants import APP_NAME, SEARCH_PATH
 from ..base.context import context
+from ..cli.daemon import run_in_daemon
 from ..cli.main import generate_parser
 from ..common.io import captured, replace_log_streams, argv
 from ..common.path import win_path_double_escape
@@ -24,6 +26,7 @@ class Commands:
     INFO = "info"
     INSTALL = "install"
     LIST = "list"
+    PREFETCH = "prefetch"
     REMOVE = "remove"
     SEARCH = "search"
     UPDATE = "update"
@@ -48,6 +51,10 @@ def run_command(command, *arguments, **kwargs):
           search_path: an optional non-standard search path for configuration information
               that overrides the default SEARCH_PATH
 
+    When $CONDA_DAEMON_SOCKET names the socket of a running conda daemon (see
+    conda.cli.daemon), the command is run there unless a search_path is given. A command
+    that fails in the daemon raises a CondaError carrying its stdout and stderr.
+
     Returns: a tuple of stdout, stderr, and return_code
 
     Examples:
@@ -59,13 +66,23 @@ def run_command(command, *arguments, **kwargs):
     """
     use_exception_handler = kwargs.get('use_exception_handler', False)
     configuration_search_path = kwargs.get('search_path', SEARCH_PATH)
-    p, sub_parsers = generate_parser()
-    get_configure_parser_function(command)(sub_parsers)
-
     arguments = map(win_path_double_escape, arguments)
     command_line = "%s %s" % (command, " ".join(arguments))
     split_command_line = split(command_line)
 
+    if configuration_search_path == SEARCH_PATH:
+        response = run_in_daemon(split_command_line)
+        if response is not None:
+            stdout, stderr, return_code = response
+            if return_code and not use_exception_handler:
+                e = CondaError("conda %s failed in the conda daemon:\n%s"
+                               % (command_line, stderr))
+                e.stdout, e.stderr = stdout, stderr
+                raise e
+            return stdout, stderr, return_code
+
+    p, sub_parsers = generate_parser()
+    get_configure_parser_function(command)(sub_parsers)
     args = p.parse_args(split_command_line)
     context.__init__(
         search_path=configuration_search_path,
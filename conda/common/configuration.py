@@ -10,6 +10,9 @@ Features include:
 
 Easily extensible to other source formats, e.g. json and ini
 
+Parsed yaml files can be compiled into a marshal cache, keyed by the mtime and size of every
+file on the search path, so that unchanged configuration loads without importing ruamel.yaml.
+
 Limitations:
   - at the moment only supports a "flat" config structure; no nested data structures
 
@@ -21,16 +24,18 @@ from collections import Mapping, defaultdict
 from glob import glob
 from itertools import chain
 from logging import getLogger
-from os import environ, stat
-from os.path import basename, join
+import marshal
+from os import (O_CREAT, O_EXCL, O_WRONLY, environ, fdopen, getpid, open as os_open, rename,
+                stat, unlink)
+from os.path import basename, join, lexists
 from stat import S_IFDIR, S_IFMT, S_IFREG
+import sys
 
 from enum import Enum, EnumMeta
 
 from .compat import (isiterable, iteritems, itervalues, odict, primitive_types, string_types,
                      text_type, with_metaclass)
 from .constants import EMPTY_MAP, NULL
-from .yaml import yaml_load
 from .. import CondaError, CondaMultiError
 from .._vendor.auxlib.collection import AttrDict, first, frozendict, last, make_immutable
 from .._vendor.auxlib.exceptions import ThisShouldNeverHappenError
@@ -46,15 +51,11 @@ except ImportError:  # pragma: no cover
     from .._vendor.toolz.dicttoolz import merge
     from .._vendor.toolz.functoolz import excepts
     from .._vendor.toolz.itertoolz import concat, concatv, unique
-try:
-    from ruamel_yaml.comments import CommentedSeq, CommentedMap
-    from ruamel_yaml.scanner import ScannerError
-except ImportError:  # pragma: no cover
-    from ruamel.yaml.comments import CommentedSeq, CommentedMap  # pragma: no cover
-    from ruamel.yaml.scanner import ScannerError
 
 log = getLogger(__name__)
 
+CONFIG_CACHE_VERSION = 1
+
 
 def pretty_list(iterable, padding='  '):  # TODO: move elsewhere in conda.common
     if not isiterable(iterable):
@@ -256,6 +257,33 @@ class ArgParseRawParameter(RawParameter):
                                                                     args_from_argparse)
 
 
+def _get_ruamel_types():
+    # ruamel.yaml is only imported when a yaml file actually has to be parsed
+    try:
+        from ruamel_yaml.comments import CommentedSeq, CommentedMap
+        from ruamel_yaml.scanner import ScannerError
+    except ImportError:  # pragma: no cover
+        from ruamel.yaml.comments import CommentedSeq, CommentedMap  # pragma: no cover
+        from ruamel.yaml.scanner import ScannerError
+    return CommentedSeq, CommentedMap, ScannerError
+
+
+def _to_marshalable(value):
+    # strip ruamel.yaml's container and scalar subclasses
+    if isinstance(value, Mapping):
+        return dict((_to_marshalable(k), _to_marshalable(v)) for k, v in iteritems(value))
+    elif isinstance(value, (list, tuple)):
+        return [_to_marshalable(v) for v in value]
+    elif isinstance(value, bool):
+        return bool(value)
+    for primitive_type in (int, float, text_type, str):
+        if isinstance(value, primitive_type):
+            return primitive_type(value)
+    if value is None:
+        return None
+    raise TypeError("cannot compile %r into the configuration cache" % (value,))
+
+
 class YamlRawParameter(RawParameter):
     # this class should encapsulate all direct use of ruamel.yaml in this module
 
@@ -277,7 +305,8 @@ class YamlRawParameter(RawParameter):
     def __process(self, parameter_obj):
         if hasattr(self, '_value'):
             return
-        elif isinstance(self._raw_value, CommentedSeq):
+        CommentedSeq, CommentedMap, _ = _get_ruamel_types()
+        if isinstance(self._raw_value, CommentedSeq):
             valuecomments = self._get_yaml_list_comments(self._raw_value)
             self._valueflags = tuple(ParameterFlag.from_string(s) for s in valuecomments)
             self._value = tuple(self._raw_value)
@@ -292,6 +321,34 @@ class YamlRawParameter(RawParameter):
         else:
             raise ThisShouldNeverHappenError()  # pragma: no cover
 
+    def dump(self):
+        """Return a marshal-able tuple from which ``from_dump`` rebuilds this parameter."""
+        CommentedSeq, CommentedMap, _ = _get_ruamel_types()
+        raw_value = self._raw_value
+        if isinstance(raw_value, CommentedSeq):
+            valuecomments = list(self._get_yaml_list_comments(raw_value))
+        elif isinstance(raw_value, CommentedMap):
+            valuecomments = self._get_yaml_map_comments(raw_value)
+        else:
+            valuecomments = None
+        return (self._keycomment, _to_marshalable(raw_value), valuecomments)
+
+    @classmethod
+    def from_dump(cls, source, key, dumped):
+        keycomment, raw_value, valuecomments = dumped
+        self = cls(source, key, raw_value, keycomment)
+        if isinstance(raw_value, list):
+            self._valueflags = tuple(ParameterFlag.from_string(s) for s in valuecomments)
+            self._value = tuple(raw_value)
+        elif isinstance(raw_value, dict):
+            self._valueflags = dict((k, ParameterFlag.from_string(v))
+                                    for k, v in iteritems(valuecomments) if v is not None)
+            self._value = frozendict(raw_value)
+        else:
+            self._valueflags = None
+            self._value = raw_value
+        return self
+
     @staticmethod
     def _get_yaml_key_comment(commented_dict, key):
         try:
@@ -327,6 +384,8 @@ class YamlRawParameter(RawParameter):
 
     @classmethod
     def make_raw_parameters_from_file(cls, filepath):
+        from .yaml import yaml_load
+        _, _, ScannerError = _get_ruamel_types()
         with open(filepath, 'r') as fh:
             try:
                 ruamel_yaml = yaml_load(fh)
@@ -335,38 +394,118 @@ class YamlRawParameter(RawParameter):
                 raise LoadError("Invalid YAML", filepath, mark.line, mark.column)
         return cls.make_raw_parameters(filepath, ruamel_yaml) or EMPTY_MAP
 
+    @classmethod
+    def make_raw_parameters_from_dump(cls, source, dumped_map):
+        if dumped_map:
+            return dict((key, cls.from_dump(source, key, dumped))
+                        for key, dumped in iteritems(dumped_map))
+        return EMPTY_MAP
 
-def load_file_configs(search_path):
-    # returns an ordered map of filepath and dict of raw parameter objects
 
-    def _file_yaml_loader(fullpath):
+def _get_config_file_stamps(search_path):
+    # yield a tuple(filepath, mtime, size) for every yaml file the search path resolves to
+
+    def _file_stamp(fullpath, st):
         assert fullpath.endswith((".yml", ".yaml")) or "condarc" in basename(fullpath), fullpath
-        yield fullpath, YamlRawParameter.make_raw_parameters_from_file(fullpath)
+        return fullpath, st.st_mtime, st.st_size
 
-    def _dir_yaml_loader(fullpath):
-        for filepath in sorted(concatv(glob(join(fullpath, "*.yml")),
-                                       glob(join(fullpath, "*.yaml")))):
-            yield filepath, YamlRawParameter.make_raw_parameters_from_file(filepath)
+    for path in search_path:
+        fullpath = expand(path)
+        # stat the path for file type, or skip it if path doesn't exist
+        try:
+            st = stat(fullpath)
+        except OSError:
+            continue
+        st_mode = S_IFMT(st.st_mode)
+        if st_mode == S_IFREG:
+            yield _file_stamp(fullpath, st)
+        elif st_mode == S_IFDIR:
+            for filepath in sorted(concatv(glob(join(fullpath, "*.yml")),
+                                           glob(join(fullpath, "*.yaml")))):
+                try:
+                    yield _file_stamp(filepath, stat(filepath))
+                except OSError:
+                    continue
 
-    # map a stat result to a file loader or a directory loader
-    _loader = {
-        S_IFREG: _file_yaml_loader,
-        S_IFDIR: _dir_yaml_loader,
-    }
 
-    def _get_st_mode(path):
-        # stat the path for file type, or None if path doesn't exist
+def read_config_cache(cache_paths):
+    # returns the path of the first valid cache found, and its map of
+    #   filepath -> [mtime, size, dumped raw parameters]
+    cache_version = [CONFIG_CACHE_VERSION, list(sys.version_info[:2])]
+    for cache_path in cache_paths:
         try:
-            return S_IFMT(stat(path).st_mode)
-        except OSError:
-            return None
+            with open(cache_path, 'rb') as fh:
+                cache = marshal.load(fh)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            continue
+        if isinstance(cache, dict) and cache.get('version') == cache_version:
+            return cache_path, cache['files']
+    return None, {}
+
+
+def write_config_cache(cache_paths, files):
+    cache = {
+        'version': [CONFIG_CACHE_VERSION, list(sys.version_info[:2])],
+        'files': files,
+    }
+    for cache_path in cache_paths:
+        temp_path = '%s.%s' % (cache_path, getpid())
+        try:
+            # the cache holds the contents of the user's condarc files, including any
+            #   credentials, so it's only ever readable by its owner
+            with fdopen(os_open(temp_path, O_WRONLY | O_CREAT | O_EXCL, 0o600), 'wb') as fh:
+                marshal.dump(cache, fh)
+            rename(temp_path, cache_path)
+        except (IOError, OSError, ValueError) as e:
+            log.debug("unable to write configuration cache %s\n%r", cache_path, e)
+            try:
+                unlink(temp_path)
+            except (IOError, OSError):
+                pass
+        else:
+            return cache_path
+    return None
+
 
-    expanded_paths = tuple(expand(path) for path in search_path)
-    stat_paths = (_get_st_mode(path) for path in expanded_paths)
-    load_paths = (_loader[st_mode](path)
-                  for path, st_mode in zip(expanded_paths, stat_paths)
-                  if st_mode is not None)
-    raw_data = odict(kv for kv in chain.from_iterable(load_paths))
+def load_file_configs(search_path, cache_paths=()):
+    # returns an ordered map of filepath and dict of raw parameter objects
+    # if cache_paths are given, files whose mtime and size match their entry in the first valid
+    #   compiled cache found there are loaded without parsing yaml, and the cache is rewritten
+    #   whenever any file had to be parsed
+    file_stamps = tuple(_get_config_file_stamps(search_path))
+    if not cache_paths:
+        return odict((filepath, YamlRawParameter.make_raw_parameters_from_file(filepath))
+                     for filepath, _, _ in file_stamps)
+
+    cache_path, cached_files = read_config_cache(cache_paths)
+    raw_data = odict()
+    stale = False
+    for filepath, mtime, size in file_stamps:
+        cached = cached_files.get(filepath)
+        if cached and cached[:2] == [mtime, size]:
+            raw_data[filepath] = YamlRawParameter.make_raw_parameters_from_dump(filepath,
+                                                                                cached[2])
+            continue
+        raw_parameters = YamlRawParameter.make_raw_parameters_from_file(filepath)
+        raw_data[filepath] = raw_parameters
+        try:
+            dumped = dict((key, rp.dump()) for key, rp in iteritems(raw_parameters))
+        except TypeError as e:
+            log.debug("not caching configuration file %s: %r", filepath, e)
+            cached_files.pop(filepath, None)
+        else:
+            cached_files[filepath] = [mtime, size, dumped]
+        stale = True
+
+    if stale:
+        # forget files that have since been removed, e.g. from other search paths
+        for filepath in tuple(cached_files):
+            if filepath not in raw_data and not lexists(filepath):
+                del cached_files[filepath]
+        write_cache_paths = cache_paths
+        if cache_path:
+            write_cache_paths = (cache_path, ) + tuple(p for p in cache_paths if p != cache_path)
+        write_config_cache(write_cache_paths, cached_files)
     return raw_data
 
 
@@ -699,6 +838,9 @@ class ConfigurationType(type):
 @with_metaclass(ConfigurationType)
 class Configuration(object):
 
+    # where to keep compiled yaml configuration; see load_file_configs
+    _config_cache_paths = ()
+
     def __init__(self, search_path=(), app_name=None, argparse_args=None):
         self.raw_data = odict()
         self._cache_ = dict()
@@ -731,7 +873,7 @@ class Configuration(object):
             if raw_data_held_contents:
                 self.raw_data = odict()
 
-            self._set_raw_data(load_file_configs(search_path))
+            self._set_raw_data(load_file_configs(search_path, self._config_cache_paths))
 
             if raw_data_held_contents:
                 # this should only be triggered on re-initialization / reset
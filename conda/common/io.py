@@ -156,3 +156,25 @@ def attach_stderr_handler(level=WARN, logger_name=None, propagate=False, formatt
         logr.addHandler(new_stderr_handler)
         logr.setLevel(level)
         logr.propagate = propagate
+
+
+def concurrent_map(func, iterable, max_workers):
+    """
+    Yield func(item) for each item, in order.  The calls are made on a pool of max_workers
+    threads when context.concurrent is set, and one at a time otherwise.
+    """
+    from ..base.context import context
+    executor_cls = None
+    if context.concurrent:
+        try:
+            from concurrent.futures import ThreadPoolExecutor as executor_cls
+        except ImportError:  # pragma: no cover
+            # concurrent.futures is only available in Python >= 3.2 or if futures is installed
+            pass
+    if executor_cls is None:
+        for item in iterable:
+            yield func(item)
+        return
+    with executor_cls(max_workers) as executor:
+        for result in executor.map(func, iterable):
+            yield result
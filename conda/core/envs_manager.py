@@ -382,6 +382,28 @@ class EnvsDirectory(object):
         return pep or None
 
 
+def list_all_known_prefixes():
+    """
+    Return every environment conda knows about: the root prefix, the directories in each
+    envs directory, and the environments registered in the envs directories' catalogs.
+    """
+    prefixes = [context.root_prefix]
+    for envs_dir in context.envs_dirs:
+        if isdir(envs_dir):
+            prefixes.extend(join(envs_dir, dn) for dn in sorted(listdir(envs_dir))
+                            if not dn.startswith('.'))
+        prefixes.extend(env['location'] for env in EnvsDirectory(envs_dir)._registered_envs)
+
+    seen = set()
+    result = []
+    for prefix in prefixes:
+        prefix = normpath(prefix)
+        if prefix not in seen and isdir(prefix):
+            seen.add(prefix)
+            result.append(prefix)
+    return result
+
+
 def get_prefix(ctx, args, search=True):
     """Get the prefix to operate in
 
@@ -16,7 +16,7 @@ from ..gateways.disk.read import read_index_json
 from ..models.channel import prioritize_channels
 from ..models.dist import Dist
 from ..models.index_record import EMPTY_LINK, IndexRecord
-from ..resolve import MatchSpec
+from ..resolve import MatchSpec, register_depends_matches
 
 try:
     from cytoolz.itertoolz import take
@@ -30,8 +30,15 @@ stdoutlog = getLogger('stdoutlog')
 def _supplement_index_with_prefix(index, prefix, channels):
     # type: (Dict[Dist, IndexRecord], str, Set[canonical_channel]) -> None
     # supplement index with information from prefix/conda-meta
+    index.update(get_prefix_records(index, prefix, channels))
+
+
+def get_prefix_records(index, prefix, channels):
+    # type: (Dict[Dist, IndexRecord], str, Set[canonical_channel]) -> Dict[Dist, IndexRecord]
+    # the records that supplement index with information from prefix/conda-meta
     assert prefix
     maxp = len(channels) + 1
+    records = {}
     for dist, info in iteritems(linked_data(prefix)):
         if dist in index:
             # The downloaded repodata takes priority, so we do not overwrite.
@@ -39,7 +46,7 @@ def _supplement_index_with_prefix(index, prefix, channels):
             # knows this package is installed.
             old_record = index[dist]
             link = info.get('link') or EMPTY_LINK
-            index[dist] = IndexRecord.from_objects(old_record, link=link)
+            records[dist] = IndexRecord.from_objects(old_record, link=link)
         else:
             # If the package is not in the repodata, use the local data. If
             # the 'depends' field is not present, we need to set it; older
@@ -52,7 +59,8 @@ def _supplement_index_with_prefix(index, prefix, channels):
             # it is in a channel we don't know about, assign it a value just
             # above the priority of all known channels.
             priority = MAX_CHANNEL_PRIORITY if dist.channel in channels else maxp
-            index[dist] = IndexRecord.from_objects(info, depends=depends, priority=priority)
+            records[dist] = IndexRecord.from_objects(info, depends=depends, priority=priority)
+    return records
 
 
 def _supplement_index_with_cache(index, channels):
@@ -168,9 +176,11 @@ def fetch_index(channel_urls, use_cache=False, index=None):
 
     if index is None:
         index = {}
-    for _, repodata in reversed(repodatas):
+    for url, repodata in reversed(repodatas):
         if repodata:
             index.update(repodata.get('packages', {}))
+            register_depends_matches(url, repodata.get('packages', {}),
+                                     repodata.get('_depends_matches'))
 
     if not context.json:
         stdoutlog.info('\n')
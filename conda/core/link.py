@@ -2,6 +2,7 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from collections import defaultdict, namedtuple
+from contextlib import contextmanager
 from logging import getLogger
 import os
 from os.path import dirname, isdir, join
@@ -11,7 +12,7 @@ from traceback import format_exc
 import warnings
 
 from .linked_data import (get_python_version_for_prefix, linked_data as get_linked_data,
-                          load_meta)
+                          linked_data_lock, load_meta)
 from .package_cache import PackageCache
 from .path_actions import (CompilePycAction, CreateApplicationEntryPointAction,
                            CreateApplicationSoftlinkAction, CreateLinkedPackageRecordAction,
@@ -196,7 +197,19 @@ class UnlinkLinkTransaction(object):
     def execute(self):
         if not self._verified:
             self.verify()
-        self._execute(tuple(concat(interleave(itervalues(self.prefix_action_groups)))))
+        with self._lock_prefixes(tuple(self.prefix_action_groups)):
+            self._execute(tuple(concat(interleave(itervalues(self.prefix_action_groups)))))
+
+    @classmethod
+    @contextmanager
+    def _lock_prefixes(cls, target_prefixes):
+        # other conda processes don't read the linked data of a prefix while it changes
+        if not target_prefixes:
+            yield
+            return
+        with linked_data_lock(target_prefixes[0]):
+            with cls._lock_prefixes(target_prefixes[1:]):
+                yield
 
     @classmethod
     def _prepare(cls, index, target_prefix, unlink_dists, link_dists, command_action,
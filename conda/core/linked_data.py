@@ -3,19 +3,31 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import json
 from logging import getLogger
-from os import listdir
+from os import getpid, listdir, rename, stat
 from os.path import isdir, isfile, join
 
 from ..exceptions import CondaDependencyError
 from ..base.constants import UNKNOWN_CHANNEL
-from ..common.compat import itervalues, odict
+from ..base.context import context
+from ..common.compat import iteritems, itervalues, odict
+from ..common.io import concurrent_map
 from ..gateways.disk.delete import rm_rf
+from ..lock import DirectoryLock
 from ..models.channel import Channel
 from ..models.dist import Dist
 from ..models.index_record import EMPTY_LINK, IndexRecord
 
+try:
+    import cPickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
 log = getLogger(__name__)
 
+LINKED_DATA_PICKLE_VERSION = 2
+LINKED_DATA_SNAPSHOT_FN = '.linked_data.q'
+LINKED_DATA_LOAD_THREADS = 8
+
 
 # Because the conda-meta .json files do not include channel names in
 # their filenames, we have to pull that information from the .json
@@ -26,37 +38,35 @@ log = getLogger(__name__)
 linked_data_ = {}
 # type: Dict[Dist, IndexRecord]
 
+# The conda-meta stamps each prefix in linked_data_ was loaded with, so a long-running process
+# can tell when another process has changed the prefix.
+linked_data_stamps_ = {}
+# type: Dict[str, Option[Dict[str, Tuple[float, int]]]]
 
-def load_linked_data(prefix, dist_name, rec=None, ignore_channels=False):
-    meta_file = join(prefix, 'conda-meta', dist_name + '.json')
-    if rec is None:
-        try:
-            log.trace("loading linked data for %s", meta_file)
-            with open(meta_file) as fi:
-                rec = json.load(fi)
-        except IOError:
-            return None
-    else:
-        linked_data(prefix)  # TODO: is this even doing anything?
-
-        if hasattr(rec, 'dump'):
-            rec = rec.dump()
 
+def _fill_fn_and_url(prefix, dist_name, rec):
     url = rec.get('url')
     fn = rec.get('fn')
     if not fn:
         fn = rec['fn'] = url.rsplit('/', 1)[-1] if url else dist_name + '.tar.bz2'
     if fn[:-8] != dist_name:
-        log.debug('Ignoring invalid package metadata file: %s' % meta_file)
+        log.debug('Ignoring invalid package metadata file: %s',
+                  join(prefix, 'conda-meta', dist_name + '.json'))
         return None
     channel = rec.get('channel')
     if channel:
         channel = channel.rstrip('/')
         if not url or (url.startswith('file:') and channel[0] != UNKNOWN_CHANNEL):
-            url = rec['url'] = channel + '/' + fn
-    channel, schannel = Channel(url).url_channel_wtf
-
+            url = channel + '/' + fn
     rec['url'] = url
+    return rec
+
+
+def _make_linked_record(prefix, dist_name, rec, ignore_channels):
+    if _fill_fn_and_url(prefix, dist_name, rec) is None:
+        return None
+    channel, schannel = Channel(rec['url']).url_channel_wtf
+
     rec['channel'] = channel
     rec['schannel'] = schannel
     rec['link'] = rec.get('link') or EMPTY_LINK
@@ -65,8 +75,36 @@ def load_linked_data(prefix, dist_name, rec=None, ignore_channels=False):
         dist = Dist.from_string(dist_name)
     else:
         dist = Dist.from_string(dist_name, channel_override=schannel)
-    linked_data_[prefix][dist] = rec = IndexRecord(**rec)
+    return dist, IndexRecord(**rec)
 
+
+def _read_meta_file(prefix, dist_name):
+    meta_file = join(prefix, 'conda-meta', dist_name + '.json')
+    try:
+        log.trace("loading linked data for %s", meta_file)
+        with open(meta_file) as fi:
+            return json.load(fi)
+    except IOError:
+        return None
+
+
+def load_linked_data(prefix, dist_name, rec=None, ignore_channels=False):
+    if rec is None:
+        rec = _read_meta_file(prefix, dist_name)
+        if rec is None:
+            return None
+    else:
+        linked_data(prefix)  # TODO: is this even doing anything?
+
+        if hasattr(rec, 'dump'):
+            rec = rec.dump()
+
+    dist_rec = _make_linked_record(prefix, dist_name, rec, ignore_channels)
+    if dist_rec is None:
+        return None
+
+    dist, rec = dist_rec
+    linked_data_[prefix][dist] = rec
     return rec
 
 
@@ -87,10 +125,21 @@ def delete_prefix_from_linked_data(path):
                             None)
     if linked_data_path:
         del linked_data_[linked_data_path]
+        linked_data_stamps_.pop(linked_data_path, None)
         return True
     return False
 
 
+def delete_stale_linked_data():
+    """Forget the records of every loaded prefix whose conda-meta changed since it was loaded."""
+    for prefix, stamps in list(iteritems(linked_data_stamps_)):
+        meta_dir = join(prefix, 'conda-meta')
+        if stamps != (get_meta_file_stamps(meta_dir) if isdir(meta_dir) else None):
+            log.debug("conda-meta of %s changed on disk; reloading its linked data", prefix)
+            linked_data_.pop(prefix, None)
+            del linked_data_stamps_[prefix]
+
+
 def load_meta(prefix, dist):
     """
     Return the install meta-data for a linked package in a prefix, or None
@@ -99,6 +148,88 @@ def load_meta(prefix, dist):
     return linked_data(prefix).get(dist)
 
 
+def linked_data_lock(prefix, shared=False):
+    """
+    Return a lock on the conda-meta directory of prefix.  Transactions changing the prefix hold it
+    exclusively, and linked_data() holds it shared while it reads the conda-meta files.
+    """
+    return DirectoryLock(join(prefix, 'conda-meta'), shared=shared)
+
+
+def get_meta_file_stamps(meta_dir):
+    # type: (str) -> Dict[str, Tuple[float, int]]
+    stamps = {}
+    for fn in listdir(meta_dir):
+        if fn.endswith('.json'):
+            try:
+                st = stat(join(meta_dir, fn))
+            except (IOError, OSError):
+                continue
+            stamps[fn] = (st.st_mtime, st.st_size)
+    return stamps
+
+
+def get_channel_settings():
+    # The channel names in the records, and in the keys of a snapshot, are derived from these
+    # settings, so a snapshot is stale once any of them changes.
+    return (
+        context._channel_alias,
+        tuple(context._migrated_channel_aliases),
+        tuple(context._default_channels),
+        tuple(sorted(iteritems(context._custom_channels))),
+        tuple(sorted((name, tuple(urls))
+                     for name, urls in iteritems(context._custom_multichannels))),
+        tuple(sorted(iteritems(context.migrated_custom_channels))),
+        context.local_build_root,
+    )
+
+
+def read_linked_data_snapshot(meta_dir, stamps, ignore_channels):
+    snapshot_path = join(meta_dir, LINKED_DATA_SNAPSHOT_FN)
+    if not isfile(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        import traceback
+        log.debug("Failed to load linked data snapshot.\n%s", traceback.format_exc())
+        return None
+
+    def _check_snapshot_valid():
+        yield snapshot.get('_pickle_version') == LINKED_DATA_PICKLE_VERSION
+        yield snapshot.get('_ignore_channels') == ignore_channels
+        yield snapshot.get('_stamps') == stamps
+        yield snapshot.get('_channel_settings') == get_channel_settings()
+
+    if not all(_check_snapshot_valid()):
+        log.debug("linked data snapshot %s is stale", snapshot_path)
+        return None
+    return snapshot['records']
+
+
+def write_linked_data_snapshot(meta_dir, stamps, ignore_channels, recs):
+    # Write to a temporary file and rename, so concurrent readers never see a partial snapshot.
+    # A prefix that isn't writable just doesn't get a snapshot.
+    snapshot_path = join(meta_dir, LINKED_DATA_SNAPSHOT_FN)
+    temp_path = "%s.%s" % (snapshot_path, getpid())
+    snapshot = {
+        '_pickle_version': LINKED_DATA_PICKLE_VERSION,
+        '_ignore_channels': ignore_channels,
+        '_stamps': stamps,
+        '_channel_settings': get_channel_settings(),
+        'records': recs,
+    }
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+        rename(temp_path, snapshot_path)
+    except Exception:
+        import traceback
+        log.debug("Failed to write linked data snapshot.\n%s", traceback.format_exc())
+        rm_rf(temp_path)
+
+
 def linked_data(prefix, ignore_channels=False):
     """
     Return a dictionary of the linked packages in prefix.
@@ -107,15 +238,80 @@ def linked_data(prefix, ignore_channels=False):
     recs = linked_data_.get(prefix)
     if recs is None:
         recs = linked_data_[prefix] = odict()
+        linked_data_stamps_[prefix] = None
         meta_dir = join(prefix, 'conda-meta')
         if isdir(meta_dir):
-            for fn in listdir(meta_dir):
-                if fn.endswith('.json'):
-                    dist_name = fn[:-5]
-                    load_linked_data(prefix, dist_name, ignore_channels=ignore_channels)
+            with linked_data_lock(prefix, shared=True):
+                _load_meta_dir(prefix, meta_dir, recs, ignore_channels)
     return recs
 
 
+def _load_meta_dir(prefix, meta_dir, recs, ignore_channels):
+    # The snapshot is only trusted while the mtime and size of every conda-meta/*.json file
+    # match those recorded when it was written.
+    stamps = linked_data_stamps_[prefix] = get_meta_file_stamps(meta_dir)
+    snapshot_recs = read_linked_data_snapshot(meta_dir, stamps, ignore_channels)
+    if snapshot_recs is not None:
+        recs.update(snapshot_recs)
+        return
+    for fn in sorted(stamps):
+        dist_name = fn[:-5]
+        load_linked_data(prefix, dist_name, ignore_channels=ignore_channels)
+    if stamps:
+        write_linked_data_snapshot(meta_dir, stamps, ignore_channels, recs)
+
+
+def load_linked_data_concurrently(prefixes, ignore_channels=False):
+    """
+    Yield (prefix, linked_data(prefix), exception) for each prefix, in order.  When
+    context.concurrent is set, the conda-meta of the following prefixes is loaded on a thread
+    pool meanwhile.  exception is None unless loading the prefix failed.
+    """
+    def load(prefix):
+        try:
+            return prefix, linked_data(prefix, ignore_channels), None
+        except Exception as e:
+            log.debug("failed to load linked data for %s", prefix, exc_info=True)
+            return prefix, None, e
+
+    for result in concurrent_map(load, tuple(prefixes), LINKED_DATA_LOAD_THREADS):
+        yield result
+
+
+def iter_linked_records(prefix):
+    """
+    Yield the record of each package linked in prefix as a plain dict, sorted by package name,
+    as the conda-meta files are read.  Records that aren't loaded already are read on a thread
+    pool when context.concurrent is set, and are not kept in memory.  Every record has 'fn' and
+    'url' filled in, but unlike linked_data(), the channels of records read here are not looked
+    up.
+    """
+    recs = linked_data_.get(prefix)
+    meta_dir = join(prefix, 'conda-meta')
+    if recs is None and isdir(meta_dir):
+        stamps = get_meta_file_stamps(meta_dir)
+        recs = read_linked_data_snapshot(meta_dir, stamps, False)
+        if recs is None:
+            # '-' sorts before every other character allowed in a package name, so sorting the
+            # file names sorts the records by package name
+            dist_names = tuple(fn[:-5] for fn in sorted(stamps))
+            for rec in _read_meta_files_concurrently(prefix, dist_names):
+                if rec is not None:
+                    yield rec
+            return
+    for dist in sorted(recs or (), key=lambda d: d.dist_name):
+        yield recs[dist].dump()
+
+
+def _read_meta_files_concurrently(prefix, dist_names):
+    def read(dist_name):
+        rec = _read_meta_file(prefix, dist_name)
+        return None if rec is None else _fill_fn_and_url(prefix, dist_name, rec)
+
+    for rec in concurrent_map(read, dist_names, LINKED_DATA_LOAD_THREADS):
+        yield rec
+
+
 def linked(prefix, ignore_channels=False):
     """
     Return the set of canonical names of linked packages in prefix.
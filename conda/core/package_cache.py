@@ -2,9 +2,11 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from functools import reduce
+import json
 from logging import getLogger
-from os import listdir
+from os import getpid, listdir, rename, stat
 from os.path import basename, join
+from threading import Lock
 from traceback import format_exc
 
 from .path_actions import CacheUrlAction, ExtractPackageAction
@@ -15,10 +17,12 @@ from .._vendor.auxlib.path import expand
 from ..base.constants import CONDA_TARBALL_EXTENSION, PACKAGE_CACHE_MAGIC_FILE, UNKNOWN_CHANNEL
 from ..base.context import context
 from ..common.compat import iteritems, iterkeys, itervalues, text_type, with_metaclass
+from ..common.io import concurrent_map
 from ..common.path import url_to_path
 from ..common.signals import signal_handler
 from ..common.url import path_to_url
 from ..gateways.disk.create import create_package_cache_directory
+from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import compute_md5sum, isdir, isfile, islink
 from ..gateways.disk.test import file_path_is_writable
 from ..models.channel import Channel
@@ -33,6 +37,9 @@ except ImportError:  # pragma: no cover
 log = getLogger(__name__)
 stderrlog = getLogger('stderrlog')
 
+# how many tarballs ProgressiveFetchExtract.fetch_concurrently downloads at a time
+FETCH_THREADS = 5
+
 
 class UrlsData(object):
     # this is a class to manage urls.txt
@@ -69,6 +76,68 @@ class UrlsData(object):
         return first(self, lambda url: basename(url) == package_path)
 
 
+class Md5sumsData(object):
+    # this is a class to manage md5sums.json, which remembers the md5 of each tarball in a
+    #   package cache along with the mtime and size the tarball had when it was computed
+    # the file is only read when a checksum is first needed
+
+    def __init__(self, pkgs_dir):
+        self.pkgs_dir = pkgs_dir
+        self.md5sums_json_path = join(pkgs_dir, 'md5sums.json')
+        self._md5sums_data = None
+        self._lock = Lock()  # tarballs may be fetched concurrently
+
+    @property
+    def _md5sums(self):
+        if self._md5sums_data is None:
+            try:
+                with open(self.md5sums_json_path) as fh:
+                    self._md5sums_data = json.load(fh)
+            except (IOError, OSError, ValueError):
+                self._md5sums_data = {}
+        return self._md5sums_data
+
+    def get(self, tarball_full_path):
+        """Return the md5 of a tarball in this cache, reading the tarball only when its checksum
+        isn't known yet."""
+        st = stat(tarball_full_path)
+        entry = self._md5sums.get(basename(tarball_full_path))
+        if entry and entry[1:] == [st.st_mtime, st.st_size]:
+            return entry[0]
+        md5sum = compute_md5sum(tarball_full_path)
+        self.add(tarball_full_path, md5sum)
+        return md5sum
+
+    def add(self, tarball_full_path, md5sum):
+        st = stat(tarball_full_path)
+        with self._lock:
+            self._md5sums[basename(tarball_full_path)] = [md5sum, st.st_mtime, st.st_size]
+            # write to a temporary file and rename, so concurrent readers never see a partial
+            # file; a read-only package cache just doesn't remember its checksums
+            temp_path = "%s.%s" % (self.md5sums_json_path, getpid())
+            try:
+                with open(temp_path, 'w') as fh:
+                    json.dump(self._md5sums, fh, sort_keys=True)
+                rename(temp_path, self.md5sums_json_path)
+            except (IOError, OSError) as e:
+                log.debug("cannot write %s: %r", self.md5sums_json_path, e)
+                rm_rf(temp_path)
+
+
+def get_package_cache_stamp(pkgs_dir):
+    # entries are added and removed as directories and tarballs directly in pkgs_dir, and their
+    # urls are appended to urls.txt
+    stamp = []
+    for path in (pkgs_dir, join(pkgs_dir, 'urls.txt')):
+        try:
+            st = stat(path)
+        except (IOError, OSError):
+            stamp.append(None)
+        else:
+            stamp.append((st.st_mtime, st.st_size))
+    return tuple(stamp)
+
+
 class PackageCacheEntry(object):
 
     @classmethod
@@ -119,7 +188,7 @@ class PackageCacheEntry(object):
     @memoizemethod
     def _calculate_md5sum(self):
         assert self.is_fetched
-        return compute_md5sum(self.package_tarball_full_path)
+        return PackageCache(self.pkgs_dir).md5sums_data.get(self.package_tarball_full_path)
 
     def __repr__(self):
         args = ('%s=%r' % (key, getattr(self, key))
@@ -156,7 +225,9 @@ class PackageCache(object):
         # type: Dict[Dist, PackageCacheEntry]
 
         self.pkgs_dir = pkgs_dir
+        self._stamp = get_package_cache_stamp(pkgs_dir)
         self.urls_data = UrlsData(pkgs_dir)
+        self.md5sums_data = Md5sumsData(pkgs_dir)
 
         # caching object for is_writable property
         self._is_writable = None
@@ -233,10 +304,37 @@ class PackageCache(object):
                          for pkgs_dir in context.pkgs_dirs)
         return pc_entry
 
+    @classmethod
+    def md5sum_for_url(cls, url, pkgs_dirs=None):
+        """Return the md5 of the tarball downloaded from url into any package cache, or None.
+
+        Checksums are remembered in each package cache, so a tarball is read at most once.
+        """
+        if pkgs_dirs is None:
+            pkgs_dirs = context.pkgs_dirs
+        tarball_basename = basename(url)
+        for pkgs_dir in pkgs_dirs:
+            tarball_full_path = join(pkgs_dir, tarball_basename)
+            if not isfile(tarball_full_path):
+                continue
+            package_cache = cls(pkgs_dir)
+            # another channel's package may have the same file name
+            if package_cache.urls_data.get_url(tarball_basename) == url:
+                return package_cache.md5sums_data.get(tarball_full_path)
+        return None
+
     @classmethod
     def clear(cls):
         cls._cache_.clear()
 
+    @classmethod
+    def clear_stale(cls):
+        """Drop the cached instances whose package cache directory changed on disk."""
+        for pkgs_dir, package_cache in list(iteritems(cls._cache_)):
+            if package_cache._stamp != get_package_cache_stamp(pkgs_dir):
+                log.debug("package cache %s changed on disk; rescanning it", pkgs_dir)
+                del cls._cache_[pkgs_dir]
+
     def tarball_file_in_this_cache(self, tarball_path, md5sum=None):
         tarball_full_path, md5sum = self._clean_tarball_path_and_get_md5sum(tarball_path,
                                                                             md5sum=md5sum)
@@ -495,6 +593,39 @@ class ProgressiveFetchExtract(object):
             for action in concatv(self.cache_actions, self.extract_actions):
                 self._execute_action(action)
 
+    def fetch_concurrently(self, max_workers=FETCH_THREADS):
+        """
+        Execute only the cache actions, max_workers at a time when context.concurrent is set,
+        and leave the tarballs unextracted.  Yields (cache_action, exception) for each action in
+        order; exception is None unless the action failed.  Tarballs that are already cached
+        need no cache action, so running this again after an interruption only fetches the
+        tarballs that are still missing.
+        """
+        if not self._prepared:
+            self.prepare()
+
+        def fetch(action):
+            try:
+                self._execute_action(action)
+            except CondaMultiError as e:
+                return action, e
+            return action, None
+
+        def fetched(result):
+            action, error = result
+            if error is None:
+                # make the tarball visible to later lookups in this process, as
+                # ExtractPackageAction does for the extracted package
+                target_package_cache = PackageCache(action.target_pkgs_dir)
+                recorded_url = target_package_cache.urls_data.get_url(action.target_full_path)
+                dist = Dist(recorded_url or path_to_url(action.target_full_path))
+                pc_entry = PackageCacheEntry.make_legacy(action.target_pkgs_dir, dist)
+                target_package_cache[pc_entry.dist] = pc_entry
+            return result
+
+        for result in concurrent_map(fetch, self.cache_actions, max_workers):
+            yield fetched(result)
+
     @staticmethod
     def _execute_action(action):
         if not action.verified:
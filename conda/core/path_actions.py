@@ -1090,8 +1090,9 @@ class CacheUrlAction(PathAction):
                     target_package_cache.urls_data.add_url(self.url)
 
         else:
-            download(self.url, self.target_full_path, self.md5sum)
+            md5sum = download(self.url, self.target_full_path, self.md5sum)
             target_package_cache.urls_data.add_url(self.url)
+            target_package_cache.md5sums_data.add(self.target_full_path, md5sum)
 
     def reverse(self):
         if lexists(self.hold_path):
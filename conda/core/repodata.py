@@ -9,7 +9,7 @@ import hashlib
 import json
 from logging import DEBUG, getLogger
 from mmap import ACCESS_READ, mmap
-from os import makedirs
+from os import makedirs, stat
 from os.path import dirname, join, split as path_split
 import re
 from textwrap import dedent
@@ -53,9 +53,13 @@ log = getLogger(__name__)
 dotlog = getLogger('dotupdate')
 stderrlog = getLogger('stderrlog')
 
-REPODATA_PICKLE_VERSION = 1
+REPODATA_PICKLE_VERSION = 2
 REPODATA_HEADER_RE = b'"(_etag|_mod|_cache_control)":[ ]?"(.*)"'
 
+# Repodata already loaded by this process, keyed by cache path. A long-running process reuses
+# an entry for as long as the stamp of the cache file it was loaded from is unchanged.
+local_repodata_ = {}
+
 
 def collect_all_repodata(use_cache, tasks):
     repodatas = executor = None
@@ -352,7 +356,35 @@ def read_pickled_repodata(cache_path, channel_url, schannel, priority, etag, mod
     return repodata
 
 
+def get_local_repodata_stamp(cache_path, channel_url, schannel, etag, mod_stamp):
+    try:
+        st = stat(cache_path)
+    except (IOError, OSError):
+        return None
+    # A 304 response only touches the cache file, so its validators are preferred over its
+    # mtime when the channel provides them.
+    file_stamp = (st.st_size, etag, mod_stamp) if etag or mod_stamp else (st.st_size,
+                                                                          st.st_mtime)
+    return file_stamp + (channel_url, schannel, context.add_pip_as_python_dependency)
+
+
 def read_local_repodata(cache_path, channel_url, schannel, priority, etag, mod_stamp):
+    stamp = get_local_repodata_stamp(cache_path, channel_url, schannel, etag, mod_stamp)
+    loaded_stamp, local_repodata = local_repodata_.get(cache_path, (None, None))
+    if stamp is not None and stamp == loaded_stamp:
+        log.debug("reusing repodata already loaded from %s", cache_path)
+        if '_priority' in local_repodata and int(local_repodata['_priority']) != priority:
+            local_repodata['_priority']._priority = priority
+        return local_repodata
+
+    local_repodata = _read_local_repodata(cache_path, channel_url, schannel, priority,
+                                          etag, mod_stamp)
+    if stamp is not None:
+        local_repodata_[cache_path] = stamp, local_repodata
+    return local_repodata
+
+
+def _read_local_repodata(cache_path, channel_url, schannel, priority, etag, mod_stamp):
     local_repodata = read_pickled_repodata(cache_path, channel_url, schannel, priority,
                                            etag, mod_stamp)
     if local_repodata:
@@ -402,6 +434,9 @@ def process_repodata(repodata, channel_url, schannel, priority):
         rec = IndexRecord(**info)
         packages[Dist(rec)] = rec
     repodata['packages'] = packages
+    # imported here, so that fetching repodata doesn't pull in the solver
+    from ..resolve import compute_depends_matches
+    repodata['_depends_matches'] = compute_depends_matches(packages)
 
 
 @dotlog_on_return("fetching repodata:")
@@ -2,13 +2,14 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from collections import defaultdict
+from contextlib import contextmanager
 from copy import copy
 from genericpath import exists
 from logging import getLogger
 from os.path import basename, join
 
 from .envs_manager import EnvsDirectory
-from .index import _supplement_index_with_prefix
+from .index import _supplement_index_with_prefix, get_prefix_records
 from .link import PrefixSetup, UnlinkLinkTransaction
 from .linked_data import linked_data
 from .._vendor.boltons.setutils import IndexedSet
@@ -195,6 +196,18 @@ def get_resolve_object(index, prefix):
     return r
 
 
+@contextmanager
+def resolve_for_prefix(r, prefix):
+    """Supplement the index of a shared Resolve object with the records of prefix
+    for the duration of the context, so that several prefixes can be solved
+    without preprocessing the index again for each of them."""
+    undo = r.update_index(get_prefix_records(r.index, prefix, {}))
+    try:
+        yield r
+    finally:
+        r.update_index(undo)
+
+
 def get_install_transaction(prefix, index, spec_strs, force=False, only_names=None,
                             always_copy=False, pinned=True, minimal_hint=False, update_deps=True,
                             prune=False, channel_priority_map=None, is_update=False):
@@ -213,7 +226,8 @@ def get_install_transaction(prefix, index, spec_strs, force=False, only_names=No
         # if ANY package requesting a private env is required in the root env, all packages for
         #   that requested env must instead be installed in the root env
 
-        root_r = get_resolve_object(index.copy(), context.root_prefix)
+        # one Resolve object is shared by the solves of all prefixes involved
+        r = Resolve(index.copy())
 
         def get_env_for_spec(spec):
             # use resolve's get_dists_for_spec() to find the "best" matching record
@@ -221,7 +235,8 @@ def get_install_transaction(prefix, index, spec_strs, force=False, only_names=No
             return ensure_pad(record_for_spec.preferred_env)
 
         # specs grouped by target env, the 'None' key holds the specs for the root env
-        env_add_map = groupby(get_env_for_spec, (MatchSpec(s) for s in spec_strs))
+        with resolve_for_prefix(r, context.root_prefix) as root_r:
+            env_add_map = groupby(get_env_for_spec, (MatchSpec(s) for s in spec_strs))
         requested_root_specs_to_add = {s for s in env_add_map.pop(None, ())}
 
         ed = EnvsDirectory(join(context.root_prefix, 'envs'))
@@ -234,10 +249,11 @@ def get_install_transaction(prefix, index, spec_strs, force=False, only_names=No
                                                   prune, channel_priority_map, is_update)
 
         root_specs_to_remove = set(MatchSpec(s.name) for s in concat(itervalues(env_add_map)))
-        required_root_dists, _ = solve_prefix(context.root_prefix, root_r,
-                                              specs_to_remove=root_specs_to_remove,
-                                              specs_to_add=requested_root_specs_to_add,
-                                              prune=True)
+        with resolve_for_prefix(r, context.root_prefix) as root_r:
+            required_root_dists, _ = solve_prefix(context.root_prefix, root_r,
+                                                  specs_to_remove=root_specs_to_remove,
+                                                  specs_to_add=requested_root_specs_to_add,
+                                                  prune=True)
 
         required_root_package_names = tuple(d.name for d in required_root_dists)
 
@@ -274,18 +290,20 @@ def get_install_transaction(prefix, index, spec_strs, force=False, only_names=No
             specs_to_add = env_add_map[env_name]
             spec_to_remove = env_remove_map[env_name]
             pfx = ed.preferred_env_to_prefix(env_name)
-            unlink, link = solve_for_actions(pfx, get_resolve_object(index.copy(), pfx),
-                                             specs_to_remove=spec_to_remove,
-                                             specs_to_add=specs_to_add,
-                                             prune=True)
+            with resolve_for_prefix(r, pfx) as pfx_r:
+                unlink, link = solve_for_actions(pfx, pfx_r,
+                                                 specs_to_remove=spec_to_remove,
+                                                 specs_to_add=specs_to_add,
+                                                 prune=True)
             unlink_link_map[env_name] = unlink, link, specs_to_add
 
         # now solve root prefix
         # we have to solve root a second time in all cases, because this time we don't prune
         root_specs_to_add = set(concatv(requested_root_specs_to_add, forced_root_specs_to_add))
-        root_unlink, root_link = solve_for_actions(context.root_prefix, root_r,
-                                                   specs_to_remove=root_specs_to_remove,
-                                                   specs_to_add=root_specs_to_add)
+        with resolve_for_prefix(r, context.root_prefix) as root_r:
+            root_unlink, root_link = solve_for_actions(context.root_prefix, root_r,
+                                                       specs_to_remove=root_specs_to_remove,
+                                                       specs_to_add=root_specs_to_add)
         if root_unlink or root_link:
             # this needs to be added to odict last; the private envs need to be updated first
             unlink_link_map[None] = root_unlink, root_link, root_specs_to_add
@@ -4,17 +4,29 @@ installed Python packages, e.g. using "python setup.py install", or "pip".
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from glob import glob
 from io import open
+from logging import getLogger
 import os
-from os.path import isdir, isfile, join
+from os.path import getmtime, isdir, isfile, join
 import re
 import sys
 
 from .common.compat import itervalues, on_win
+from .common.io import concurrent_map
 from .core.linked_data import linked_data
 from .misc import rel_path
 from .models.dist import Dist
 
+log = getLogger(__name__)
+
+EGG_INFO_READ_THREADS = 8
+
+# The distributions found in a site-packages directory, keyed by the directory. A scan is
+# reused while the directory's mtime is unchanged, as installing, upgrading or removing a
+# distribution adds or removes its metadata directory.
+site_packages_ = {}
+
 
 def get_site_packages_dir(installed_pkgs):
     for info in itervalues(installed_pkgs):
@@ -28,44 +40,104 @@ def get_site_packages_dir(installed_pkgs):
     return None
 
 
-def get_egg_info_files(sp_dir):
-    for fn in os.listdir(sp_dir):
+def find_site_packages_dirs(prefix, installed_pkgs=None):
+    sp_dir = get_site_packages_dir(linked_data(prefix) if installed_pkgs is None
+                                   else installed_pkgs)
+    if sp_dir is not None:
+        return [join(prefix, sp_dir)]
+    # python was not installed by conda
+    if on_win:
+        return sorted(glob(join(prefix, 'Lib', 'site-packages')))
+    return sorted(glob(join(prefix, 'lib', 'python*', 'site-packages')))
+
+
+def _iter_egg_info_files(sp_dir, develop_path=None):
+    try:
+        fns = os.listdir(sp_dir)
+    except OSError as e:
+        # e.g. the source directory of an egg-link that has since been removed
+        log.debug("unable to list python packages in %s: %r", sp_dir, e)
+        return
+    for fn in fns:
         if fn.endswith('.egg-link'):
             with open(join(sp_dir, fn), 'r') as reader:
-                for egg in get_egg_info_files(reader.readline().strip()):
-                    yield egg
+                target = reader.readline().strip()
+            for egg in _iter_egg_info_files(target, target):
+                yield egg
         if not fn.endswith(('.egg', '.egg-info', '.dist-info')):
             continue
         path = join(sp_dir, fn)
         if isfile(path):
-            yield path
+            yield path, develop_path
         elif isdir(path):
             for path2 in [join(path, 'PKG-INFO'),
                           join(path, 'EGG-INFO', 'PKG-INFO'),
                           join(path, 'METADATA')]:
                 if isfile(path2):
-                    yield path2
+                    yield path2, develop_path
+
+
+def get_egg_info_files(sp_dir):
+    for path, _ in _iter_egg_info_files(sp_dir):
+        yield path
 
 
 pat = re.compile(r'(\w+):\s*(\S+)', re.I)
-def parse_egg_info(path):
+def read_egg_info(path):
     """
-    Parse an .egg-info file and return its canonical distribution name
+    Return the (name, version) recorded in an .egg-info or .dist-info metadata file
     """
     info = {}
-    for line in open(path, encoding='utf-8'):
-        line = line.strip()
-        m = pat.match(line)
-        if m:
-            key = m.group(1).lower()
-            info[key] = m.group(2)
-        try:
-            return '%(name)s-%(version)s-<pip>' % info
-        except KeyError:
-            pass
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            m = pat.match(line.strip())
+            if m:
+                info[m.group(1).lower()] = m.group(2)
+                if 'name' in info and 'version' in info:
+                    return info['name'], info['version']
     return None
 
 
+def parse_egg_info(path):
+    """
+    Parse an .egg-info file and return its canonical distribution name
+    """
+    name_version = read_egg_info(path)
+    return '%s-%s-<pip>' % name_version if name_version else None
+
+
+def _read_egg_info_quietly(path):
+    try:
+        return read_egg_info(path)
+    except (IOError, OSError, UnicodeDecodeError) as e:
+        log.debug("unable to read python package metadata %s: %r", path, e)
+        return None
+
+
+def scan_site_packages(sp_dir):
+    """
+    Return a tuple of (metadata_path, name, version, develop_path) for every distribution with
+    .egg-info or .dist-info metadata in sp_dir.  develop_path is the source directory of a
+    distribution installed with `setup.py develop` or `pip install -e`, and None otherwise.
+    """
+    try:
+        mtime = getmtime(sp_dir)
+    except (IOError, OSError):
+        return ()
+    scanned_mtime, dists = site_packages_.get(sp_dir, (None, ()))
+    if scanned_mtime == mtime:
+        return dists
+
+    files = list(_iter_egg_info_files(sp_dir))
+    name_versions = concurrent_map(_read_egg_info_quietly, [path for path, _ in files],
+                                   EGG_INFO_READ_THREADS)
+    dists = tuple((path, name_version[0], name_version[1], develop_path)
+                  for (path, develop_path), name_version in zip(files, name_versions)
+                  if name_version)
+    site_packages_[sp_dir] = mtime, dists
+    return dists
+
+
 def get_egg_info(prefix, all_pkgs=False):
     """
     Return a set of canonical names of all Python packages (in `prefix`),
@@ -83,15 +155,10 @@ def get_egg_info(prefix, all_pkgs=False):
         conda_files.update(info.get('files', []))
 
     res = set()
-    for path in get_egg_info_files(join(prefix, sp_dir)):
+    for path, name, version, _ in scan_site_packages(join(prefix, sp_dir)):
         f = rel_path(prefix, path)
         if all_pkgs or f not in conda_files:
-            try:
-                dist = parse_egg_info(path)
-            except UnicodeDecodeError:
-                dist = None
-            if dist:
-                res.add(Dist(dist))
+            res.add(Dist('%s-%s-<pip>' % (name, version)))
     return res
 
 
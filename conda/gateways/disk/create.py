@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from errno import EACCES, EPERM
+from errno import EACCES, EOPNOTSUPP, EPERM
 from io import open
 import json
 from logging import getLogger
@@ -36,6 +36,9 @@ stdoutlog = getLogger('stdoutlog')
 
 mkdir_p = mkdir_p  # in __init__.py to help with circular imports
 
+# the ioctl that clones a file's extents, from linux/fs.h
+FICLONE = 0x40049409
+
 python_entry_point_template = dals("""
 # -*- coding: utf-8 -*-
 import re
@@ -203,6 +206,46 @@ def create_hard_link_or_copy(src, dst):
         shutil.copy2(src, dst)
 
 
+def reflink(src, dst):
+    """Create dst as a copy-on-write clone of the regular file src.
+
+    Only filesystems with shared extents on Linux (btrfs, xfs, ...) support this; everywhere
+    else an OSError is raised and no dst is left behind.
+    """
+    if not sys.platform.startswith('linux'):
+        raise OSError(EOPNOTSUPP, "reflinks are not supported on %s" % sys.platform, dst)
+    import fcntl
+    with open(src, 'rb') as fi:
+        with open(dst, 'wb') as fo:
+            try:
+                fcntl.ioctl(fo.fileno(), FICLONE, fi.fileno())
+            except (IOError, OSError):
+                fo.close()
+                os.unlink(dst)
+                raise
+    shutil.copystat(src, dst)
+
+
+def create_reflink_hard_link_or_copy(src, dst):
+    """Share src's data with dst as cheaply as the filesystem allows, unless always_copy is set.
+
+    Returns the LinkType that was used; a reflink counts as a copy.
+    """
+    if not context.always_copy:
+        try:
+            reflink(src, dst)
+            return LinkType.copy
+        except (IOError, OSError) as e:
+            log.trace("reflink failed for %s => %s: %r", src, dst, e)
+        try:
+            link(src, dst)
+            return LinkType.hardlink
+        except (IOError, OSError) as e:
+            log.trace("hard link failed for %s => %s: %r", src, dst, e)
+    shutil.copy2(src, dst)
+    return LinkType.copy
+
+
 def _is_unix_executable_using_ORIGIN(path):
     if on_win:
         return False
@@ -2,18 +2,23 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import hashlib
+import json
 from logging import DEBUG, getLogger
 from os.path import basename, exists
-from threading import Lock
+from threading import Event, Lock, local
 import warnings
 
 from requests.exceptions import ConnectionError, HTTPError, SSLError
 
 from .connection import CondaSession
+from .disk.delete import rm_rf
+from .disk.update import backoff_rename
 from .. import CondaError
 from .._vendor.auxlib.ish import dals
 from .._vendor.auxlib.logz import stringify
+from ..base.constants import PARTIAL_EXTENSION, PARTIAL_INFO_EXTENSION
 from ..base.context import context
+from ..common.io import concurrent_map
 from ..exceptions import BasicClobberError, CondaHTTPError, MD5MismatchError, maybe_raise
 
 log = getLogger(__name__)
@@ -21,23 +26,21 @@ log = getLogger(__name__)
 
 class SingleThreadCondaSession(CondaSession):
     # according to http://stackoverflow.com/questions/18188044/is-the-session-object-from-pythons-requests-library-thread-safe  # NOQA
-    # request's Session isn't thread-safe for us
+    # request's Session isn't thread-safe for us, so each thread gets a session of its own
 
-    _session = None
-    _mutex = Lock()
+    _local = local()
 
     def __init__(self):
         super(SingleThreadCondaSession, self).__init__()
 
     def __enter__(self):
-        session = SingleThreadCondaSession._session
+        session = getattr(SingleThreadCondaSession._local, 'session', None)
         if session is None:
-            session = SingleThreadCondaSession._session = self
-        SingleThreadCondaSession._mutex.acquire()
+            session = SingleThreadCondaSession._local.session = self
         return session
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        SingleThreadCondaSession._mutex.release()
+        pass
 
 
 def disable_ssl_verify_warning():
@@ -49,6 +52,140 @@ def disable_ssl_verify_warning():
         warnings.simplefilter('ignore', InsecureRequestWarning)
 
 
+def _hash_partial(partial_path, digest_builder):
+    # feed the bytes of the partial file to the digest, and return how many there are
+    try:
+        with open(partial_path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(2 ** 20), b''):
+                digest_builder.update(chunk)
+            return fh.tell()
+    except (IOError, OSError):
+        return 0
+
+
+def _read_partial_info(partial_info_path):
+    try:
+        with open(partial_info_path) as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_partial_info(partial_info_path, url, resp):
+    # only a strong ETag can be used in If-Range
+    etag = resp.headers.get('ETag')
+    partial_info = {
+        'url': url,
+        'etag': etag if etag and not etag.startswith('W/') else None,
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+    with open(partial_info_path, 'w') as fh:
+        json.dump(partial_info, fh)
+    return partial_info
+
+
+def _range_headers(start, stop, partial_info):
+    # the server only returns the requested range if the resource is unchanged; otherwise it
+    #   returns the whole new resource
+    headers = {'Range': 'bytes=%d-%s' % (start, '' if stop is None else stop - 1)}
+    validator = partial_info.get('etag') or partial_info.get('last_modified')
+    if validator:
+        headers['If-Range'] = validator
+    return headers
+
+
+def _is_resumed_response(resp, resume_from):
+    # a server that doesn't support ranges answers with the full content and a 200 status
+    content_range = resp.headers.get('Content-Range', '')
+    return resp.status_code == 206 and content_range.startswith('bytes %d-' % resume_from)
+
+
+def _can_download_in_segments(resp, remaining_bytes):
+    threshold = context.download_segment_threshold
+    if not threshold or remaining_bytes < threshold or context.download_segments < 2:
+        return False
+    if not context.concurrent:
+        # the segments would only be fetched one after another
+        return False
+    if resp.headers.get('Content-Encoding', 'identity') != 'identity':
+        # byte ranges would refer to the encoded content
+        return False
+    return resp.status_code == 206 or resp.headers.get('Accept-Ranges') == 'bytes'
+
+
+def _download_segments(url, partial_path, partial_info, start, stop, timeout):
+    # Fetch bytes start to stop of url into partial_path as download_segments byte ranges at
+    #   once, each over a connection of its own. If any range fails, partial_path is truncated
+    #   to the bytes it holds from its beginning, so a later attempt can resume from there.
+    segment_size = -(-(stop - start) // context.download_segments)
+    segments = tuple((offset, min(offset + segment_size, stop))
+                     for offset in range(start, stop, segment_size))
+    written = [0] * len(segments)
+    progress = [start]
+    progress_lock = Lock()
+    failed = Event()
+
+    with open(partial_path, 'ab') as fh:
+        # drop anything past start, then preallocate the rest of the file
+        fh.truncate(start)
+        fh.truncate(stop)
+
+    def fetch_segment(index):
+        segment_start, segment_stop = segments[index]
+        try:
+            with SingleThreadCondaSession() as session:
+                headers = _range_headers(segment_start, segment_stop, partial_info)
+                resp = session.get(url, stream=True, proxies=session.proxies, timeout=timeout,
+                                   headers=headers)
+                if log.isEnabledFor(DEBUG):
+                    log.debug(stringify(resp))
+                resp.raise_for_status()
+                if not _is_resumed_response(resp, segment_start):
+                    raise CondaError("The server did not return the requested bytes "
+                                     "%(start)d-%(stop)d of %(url)s",
+                                     url=url, start=segment_start, stop=segment_stop - 1)
+
+                with open(partial_path, 'r+b') as fh:
+                    fh.seek(segment_start)
+                    for chunk in resp.iter_content(2 ** 14):
+                        if failed.is_set():
+                            # another segment failed; it raises for the whole download
+                            return
+                        chunk = chunk[:segment_stop - segment_start - written[index]]
+                        fh.write(chunk)
+                        written[index] += len(chunk)
+                        with progress_lock:
+                            progress[0] += len(chunk)
+                            getLogger('fetch.update').info(progress[0])
+
+                if written[index] != segment_stop - segment_start:
+                    message = dals("""
+                    Downloaded bytes did not match the requested range
+                      url: %(url)s
+                      range: %(start)d-%(stop)d
+                      downloaded bytes: %(downloaded_bytes)d
+                    """)
+                    raise CondaError(message, url=url, start=segment_start,
+                                     stop=segment_stop - 1, downloaded_bytes=written[index])
+        except Exception:
+            failed.set()
+            raise
+
+    try:
+        for _ in concurrent_map(fetch_segment, range(len(segments)), len(segments)):
+            pass
+    except Exception:
+        complete = start
+        for (segment_start, segment_stop), segment_written in zip(segments, written):
+            complete = segment_start + segment_written
+            if complete < segment_stop:
+                break
+        log.debug("segmented download of %s failed; keeping its first %d bytes", url, complete)
+        with open(partial_path, 'ab') as fh:
+            fh.truncate(complete)
+        raise
+
+
 def download(url, target_full_path, md5sum):
     content_length = None
 
@@ -58,63 +195,105 @@ def download(url, target_full_path, md5sum):
     if not context.ssl_verify:
         disable_ssl_verify_warning()
 
+    # bytes are written to a partial file, which is renamed into place once the download is
+    #   complete and verified; a failed download leaves it for the next attempt to resume, which
+    #   it only does if the url and validators recorded beside it show the same, unchanged file
+    partial_path = target_full_path + PARTIAL_EXTENSION
+    partial_info_path = target_full_path + PARTIAL_INFO_EXTENSION
     try:
         timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
         with SingleThreadCondaSession() as session:
-            resp = session.get(url, stream=True, proxies=session.proxies, timeout=timeout)
+            digest_builder = hashlib.new('md5')
+            partial_info = _read_partial_info(partial_info_path)
+            if partial_info.get('url') == url:
+                resume_from = _hash_partial(partial_path, digest_builder)
+            else:
+                resume_from = 0
+            headers = _range_headers(resume_from, None, partial_info) if resume_from else None
+            resp = session.get(url, stream=True, proxies=session.proxies, timeout=timeout,
+                               headers=headers)
             if log.isEnabledFor(DEBUG):
                 log.debug(stringify(resp))
+
+            if resume_from and not _is_resumed_response(resp, resume_from):
+                log.debug("cannot resume download of %s at byte %d; starting over",
+                          url, resume_from)
+                digest_builder = hashlib.new('md5')
+                resume_from = 0
+                if resp.status_code != 200:
+                    # e.g. 416 Range Not Satisfiable, when the partial file is already too long
+                    resp.close()
+                    resp = session.get(url, stream=True, proxies=session.proxies,
+                                       timeout=timeout)
+                    if log.isEnabledFor(DEBUG):
+                        log.debug(stringify(resp))
             resp.raise_for_status()
+            if not resume_from:
+                partial_info = _write_partial_info(partial_info_path, url, resp)
 
             content_length = int(resp.headers.get('Content-Length', 0))
-
             if content_length:
+                content_length += resume_from
                 getLogger('fetch.start').info((basename(target_full_path)[:14], content_length))
 
-            digest_builder = hashlib.new('md5')
-            try:
-                with open(target_full_path, 'wb') as fh:
-                    streamed_bytes = 0
-                    for chunk in resp.iter_content(2 ** 14):
-                        # chunk could be the decompressed form of the real data
-                        # but we want the exact number of bytes read till now
-                        streamed_bytes = resp.raw.tell()
-                        try:
-                            fh.write(chunk)
-                        except IOError as e:
-                            message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
-                            # TODO: make this CondaIOError
-                            raise CondaError(message, target_path=target_full_path, errno=e.errno)
-
-                        digest_builder.update(chunk)
-
-                        if content_length and 0 <= streamed_bytes <= content_length:
-                            getLogger('fetch.update').info(streamed_bytes)
-
-                if content_length and streamed_bytes != content_length:
-                    # TODO: needs to be a more-specific error type
-                    message = dals("""
-                    Downloaded bytes did not match Content-Length
-                      url: %(url)s
-                      target_path: %(target_path)s
-                      Content-Length: %(content_length)d
-                      downloaded bytes: %(downloaded_bytes)d
-                    """)
-                    raise CondaError(message, url=url, target_path=target_full_path,
-                                     content_length=content_length,
-                                     downloaded_bytes=streamed_bytes)
+            if _can_download_in_segments(resp, content_length - resume_from):
+                resp.close()
+                _download_segments(url, partial_path, partial_info, resume_from, content_length,
+                                   timeout)
+                # the segments were written out of order, so the digest is computed afterwards
+                digest_builder = hashlib.new('md5')
+                _hash_partial(partial_path, digest_builder)
+            else:
+                try:
+                    with open(partial_path, 'ab' if resume_from else 'wb') as fh:
+                        streamed_bytes = resume_from
+                        for chunk in resp.iter_content(2 ** 14):
+                            # chunk could be the decompressed form of the real data
+                            # but we want the exact number of bytes read till now
+                            streamed_bytes = resume_from + resp.raw.tell()
+                            try:
+                                fh.write(chunk)
+                            except IOError as e:
+                                message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
+                                # TODO: make this CondaIOError
+                                raise CondaError(message, target_path=target_full_path,
+                                                 errno=e.errno)
+
+                            digest_builder.update(chunk)
+
+                            if content_length and 0 <= streamed_bytes <= content_length:
+                                getLogger('fetch.update').info(streamed_bytes)
+
+                    if content_length and streamed_bytes != content_length:
+                        # TODO: needs to be a more-specific error type
+                        message = dals("""
+                        Downloaded bytes did not match Content-Length
+                          url: %(url)s
+                          target_path: %(target_path)s
+                          Content-Length: %(content_length)d
+                          downloaded bytes: %(downloaded_bytes)d
+                        """)
+                        raise CondaError(message, url=url, target_path=target_full_path,
+                                         content_length=content_length,
+                                         downloaded_bytes=streamed_bytes)
 
-            except (IOError, OSError) as e:
-                if e.errno == 104:
-                    # Connection reset by peer
-                    log.debug("%s, trying again" % e)
-                raise
+                except (IOError, OSError) as e:
+                    if e.errno == 104:
+                        # Connection reset by peer
+                        log.debug("%s, trying again" % e)
+                    raise
 
         actual_md5sum = digest_builder.hexdigest()
         if md5sum and actual_md5sum != md5sum:
             log.debug("MD5 sums mismatch for download: %s (%s != %s), "
                       "trying again" % (url, digest_builder.hexdigest(), md5sum))
+            # the bytes on disk are wrong somewhere, so the next attempt can't build on them
+            rm_rf(partial_path)
+            rm_rf(partial_info_path)
             raise MD5MismatchError(url, target_full_path, md5sum, actual_md5sum)
+        backoff_rename(partial_path, target_full_path, force=True)
+        rm_rf(partial_info_path)
+        return actual_md5sum
 
     except (ConnectionError, HTTPError, SSLError) as e:
         help_message = dals("""
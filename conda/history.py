@@ -17,16 +17,30 @@ from .core.linked_data import linked
 from .exceptions import CondaFileIOError, CondaHistoryError
 from .gateways.disk.update import touch
 from .models.dist import Dist
-from .resolve import MatchSpec
+from .models.match_spec import MatchSpec
 
 try:
     from cytoolz.itertoolz import groupby
 except ImportError:  # pragma: no cover
     from ._vendor.toolz.itertoolz import groupby  # NOQA
 
+try:
+    import cPickle as pickle
+except ImportError:  # pragma: no cover
+    import pickle
+
 
 log = logging.getLogger(__name__)
 
+HISTORY_INDEX_PICKLE_VERSION = 1
+HISTORY_INDEX_FN = '.history.q'
+# number of bytes preceding the indexed offset that must be unchanged for the index to be trusted
+HISTORY_INDEX_GUARD_SIZE = 256
+
+SEP_PAT = re.compile(r'==>\s*(.+?)\s*<==')
+COM_PAT = re.compile(r'#\s*cmd:\s*(.+)')
+SPEC_PAT = re.compile(r'#\s*(\w+)\s*specs:\s*(.+)?')
+
 
 class CondaHistoryWarning(Warning):
     pass
@@ -70,6 +84,94 @@ def pretty_content(content):
         return iter(sorted(content))
 
 
+def parse_lines(lines):
+    """
+    yield a tuple(index of header line, datetime string, set of distributions/diffs, comments)
+    for each revision found in lines
+    """
+    rev = None
+    for q, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        m = SEP_PAT.match(line)
+        if m:
+            if rev is not None:
+                yield rev
+            rev = (q, m.group(1), set(), [])
+        elif rev is None:
+            continue
+        elif line.startswith('#'):
+            rev[3].append(line)
+        else:
+            rev[2].add(line)
+    if rev is not None:
+        yield rev
+
+
+def apply_revision(state, content):
+    """
+    return the set of distributions resulting from applying a revision's content to state
+    """
+    if not is_diff(content):
+        return set(content)
+    state = set(state)
+    for s in content:
+        if s.startswith('-'):
+            state.discard(s[1:])
+        elif s.startswith('+'):
+            state.add(s[1:])
+        else:
+            raise CondaHistoryError('Did not expect: %s' % s)
+    return state
+
+
+def parse_user_request(dt, content, comments):
+    """
+    return the user request recorded with a revision as a dict, or None if the revision
+    does not record the command that was run
+    """
+    item = {'date': dt}
+    for line in comments:
+        m = COM_PAT.match(line)
+        if m:
+            argv = m.group(1).split()
+            if argv[0].endswith('conda'):
+                argv[0] = 'conda'
+            item['cmd'] = argv
+        m = SPEC_PAT.match(line)
+        if m:
+            action, specs = m.groups()
+            item['action'] = action
+            specs = specs and specs.replace("'", '"') or ""
+            if specs.startswith('['):
+                item['specs'] = json.loads(specs.replace('u"', '"'))
+            else:
+                item['specs'] = specs.split(',')
+    dists = groupby(itemgetter(0), content)
+    item['unlink_dists'] = dists.get('-', ())
+    item['link_dists'] = dists.get('+', ())
+    return item if 'cmd' in item else None
+
+
+def update_requested_specs(spec_map, request):
+    """
+    update spec_map, a dict of package name to a tuple(spec string, dist string or None),
+    with the specs of a user request
+    """
+    axn = request.get('action', '')
+    if axn.startswith('install'):
+        link_dists = tuple(d[1:] for d in request.get('link_dists', ()))
+        for spec_str in (s for s in request['specs'] if s):
+            spec = MatchSpec(spec_str)
+            dist_str = next((d for d in link_dists if spec.match(Dist(d))), None)
+            spec_map[spec.name] = (spec_str, dist_str)
+    elif axn.startswith('remove'):
+        for name in (MatchSpec(s).name for s in request['specs']):
+            spec_map.pop(name, None)
+    return spec_map
+
+
 class History(object):
 
     def __init__(self, prefix):
@@ -124,24 +226,11 @@ class History(object):
         parse the history file and return a list of
         tuples(datetime strings, set of distributions/diffs, comments)
         """
-        res = []
         if not isfile(self.path):
-            return res
-        sep_pat = re.compile(r'==>\s*(.+?)\s*<==')
+            return []
         with open(self.path) as f:
             lines = f.read().splitlines()
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            m = sep_pat.match(line)
-            if m:
-                res.append((m.group(1), set(), []))
-            elif line.startswith('#'):
-                res[-1][2].append(line)
-            elif len(res) > 0:
-                res[-1][1].add(line)
-        return res
+        return [(dt, cont, com) for _, dt, cont, com in parse_lines(lines)]
 
     def get_user_requests(self):
         """
@@ -152,67 +241,28 @@ class History(object):
         'action': install/remove/update
         'specs': the specs being used
         """
-        res = []
-        com_pat = re.compile(r'#\s*cmd:\s*(.+)')
-        spec_pat = re.compile(r'#\s*(\w+)\s*specs:\s*(.+)?')
-        for dt, unused_cont, comments in self.parse():
-            item = {'date': dt}
-            for line in comments:
-                m = com_pat.match(line)
-                if m:
-                    argv = m.group(1).split()
-                    if argv[0].endswith('conda'):
-                        argv[0] = 'conda'
-                    item['cmd'] = argv
-                m = spec_pat.match(line)
-                if m:
-                    action, specs = m.groups()
-                    item['action'] = action
-                    specs = specs and specs.replace("'", '"') or ""
-                    if specs.startswith('['):
-                        item['specs'] = json.loads(specs.replace('u"', '"'))
-                    else:
-                        item['specs'] = specs.split(',')
-            if 'cmd' in item:
-                res.append(item)
-            dists = groupby(itemgetter(0), unused_cont)
-            item['unlink_dists'] = dists.get('-', ())
-            item['link_dists'] = dists.get('+', ())
-        return res
+        requests = (parse_user_request(dt, cont, com) for dt, cont, com in self.parse())
+        return [item for item in requests if item is not None]
 
     def get_requested_specs(self):
-        spec_map = {}
-        for request in self.get_user_requests():
-            axn = request.get('action', '')
-            if axn.startswith('install'):
-                link_dists = tuple(Dist(d[1:]) for d in request.get('link_dists', ()))
-                specs = tuple(MatchSpec(s) for s in request['specs'] if s)
-                match = lambda spec: next((d for d in link_dists if spec.match(d)), None)
-                dists = tuple(match(s) for s in specs)
-                spec_map.update({s.name: (s, d) for (s, d) in zip(specs, dists)})
-            elif axn.startswith('remove'):
-                for name in (MatchSpec(s).name for s in request['specs']):
-                    spec_map.pop(name, None)
-        return set(itervalues(spec_map))
+        index, tail = self.read_index()
+        spec_map = dict(index['spec_map'])
+        for _, dt, cont, com in tail:
+            request = parse_user_request(dt, cont, com)
+            if request is not None:
+                update_requested_specs(spec_map, request)
+        return set((MatchSpec(spec_str), Dist(dist_str) if dist_str else None)
+                   for spec_str, dist_str in itervalues(spec_map))
 
     def construct_states(self):
         """
         return a list of tuples(datetime strings, set of distributions)
         """
         res = []
-        cur = set([])
+        cur = set()
         for dt, cont, unused_com in self.parse():
-            if not is_diff(cont):
-                cur = cont
-            else:
-                for s in cont:
-                    if s.startswith('-'):
-                        cur.discard(s[1:])
-                    elif s.startswith('+'):
-                        cur.add(s[1:])
-                    else:
-                        raise CondaHistoryError('Did not expect: %s' % s)
-            res.append((dt, cur.copy()))
+            cur = apply_revision(cur, cont)
+            res.append((dt, cur))
         return res
 
     def get_state(self, rev=-1):
@@ -221,14 +271,146 @@ class History(object):
         defaults to latest (which is the same as the current state when
         the log file is up-to-date)
         """
-        states = self.construct_states()
-        if not states:
-            return set([])
-        times, pkgs = zip(*states)
-        return pkgs[rev]
+        index, tail = self.read_index()
+        revision_count = len(index['offsets']) + len(tail)
+        if revision_count == 0:
+            return set()
+        if rev < 0:
+            rev += revision_count
+        if not 0 <= rev < revision_count:
+            raise IndexError("revision %d does not exist" % rev)
+        if rev < len(index['offsets']) - 1:
+            # an earlier revision; only the history up to that revision needs to be replayed
+            return self._replay_state(index['offsets'][rev + 1])
+        state = index['state']
+        for _, _, cont, _ in tail[:rev - len(index['offsets']) + 1]:
+            state = apply_revision(state, cont)
+        return set(state)
+
+    def iter_revisions(self):
+        """
+        yield a tuple(datetime string, set of distributions/diffs, comments) for each revision
+
+        Each indexed revision is read from its byte offset on its own, so the history is never
+        held in memory as a whole, and only the revisions added since the index was last
+        extended are parsed twice.
+        """
+        index, tail = self.read_index()
+        offsets = index['offsets']
+        if offsets:
+            ends = offsets[1:] + [index['sealed_offset']]
+            with open(self.path, 'rb') as f:
+                for offset, end in zip(offsets, ends):
+                    f.seek(offset)
+                    lines = f.read(end - offset).decode('utf-8', 'replace').splitlines()
+                    for _, dt, cont, com in parse_lines(lines):
+                        yield dt, cont, com
+        for _, dt, cont, com in tail:
+            yield dt, cont, com
+
+    def _replay_state(self, end_offset):
+        with open(self.path, 'rb') as f:
+            lines = f.read(end_offset).decode('utf-8', 'replace').splitlines()
+        state = set()
+        for _, _, cont, _ in parse_lines(lines):
+            state = apply_revision(state, cont)
+        return state
+
+    @property
+    def index_path(self):
+        return join(self.meta_dir, HISTORY_INDEX_FN)
+
+    def read_index(self):
+        """
+        return a tuple(index, tail), where index summarizes every complete revision of the
+        history file, and tail is the list of revisions (as yielded by parse_lines) that
+        follow those already summarized
+
+        The index holds the byte offset of every indexed revision, the state and the
+        requested specs after the last indexed revision, and is stored beside the history
+        file.  Only the bytes following the index are read and parsed, and the index is
+        extended as new revisions are sealed by later ones.  The last revision of the file
+        is never indexed, because 'specs' comments are appended to it after the fact.
+        """
+        index = self._load_index()
+        if index is None:
+            index = {
+                '_pickle_version': HISTORY_INDEX_PICKLE_VERSION,
+                'offsets': [],
+                'sealed_offset': 0,
+                'guard': b'',
+                'state': set(),
+                'spec_map': {},
+            }
+        if not isfile(self.path):
+            return index, []
+
+        with open(self.path, 'rb') as f:
+            f.seek(index['sealed_offset'])
+            data = f.read()
+        # older conda wrote the history in the platform's default encoding; split the bytes
+        #   into lines first, so undecodable bytes don't shift the offsets
+        byte_lines = data.splitlines(True)
+        line_offsets = [index['sealed_offset']]
+        for line in byte_lines:
+            line_offsets.append(line_offsets[-1] + len(line))
+        lines = [line.decode('utf-8', 'replace') for line in byte_lines]
+        tail = list(parse_lines(lines))
+        if len(tail) < 2:
+            return index, tail
+
+        for q, dt, cont, com in tail[:-1]:
+            index['offsets'].append(line_offsets[q])
+            index['state'] = apply_revision(index['state'], cont)
+            request = parse_user_request(dt, cont, com)
+            if request is not None:
+                update_requested_specs(index['spec_map'], request)
+        sealed_offset = line_offsets[tail[-1][0]]
+        guard_start = max(sealed_offset - HISTORY_INDEX_GUARD_SIZE, 0)
+        with open(self.path, 'rb') as f:
+            f.seek(guard_start)
+            index['guard'] = f.read(sealed_offset - guard_start)
+        index['sealed_offset'] = sealed_offset
+        self._write_index(index)
+        return index, tail[-1:]
+
+    def _load_index(self):
+        if not isfile(self.index_path) or not isfile(self.path):
+            return None
+        try:
+            with open(self.index_path, 'rb') as f:
+                index = pickle.load(f)
+            if index.get('_pickle_version') != HISTORY_INDEX_PICKLE_VERSION:
+                return None
+            # the history file is append-only; make sure the indexed part hasn't been rewritten
+            sealed_offset, guard = index['sealed_offset'], index['guard']
+            with open(self.path, 'rb') as f:
+                f.seek(sealed_offset - len(guard))
+                if f.read(len(guard)) != guard or not f.read(3) == b'==>':
+                    log.debug("history index %s is stale", self.index_path)
+                    return None
+            return index
+        except Exception:
+            import traceback
+            log.debug("Failed to load history index.\n%s", traceback.format_exc())
+            return None
+
+    def _write_index(self, index):
+        temp_path = "%s.%s" % (self.index_path, os.getpid())
+        try:
+            with open(temp_path, 'wb') as f:
+                pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, self.index_path)
+        except Exception:
+            import traceback
+            log.debug("Failed to write history index.\n%s", traceback.format_exc())
+            try:
+                os.unlink(temp_path)
+            except (IOError, OSError):
+                pass
 
     def print_log(self):
-        for i, (date, content, unused_com) in enumerate(self.parse()):
+        for i, (date, content, unused_com) in enumerate(self.iter_revisions()):
             print('%s  (rev %d)' % (date, i))
             for line in pretty_content(content):
                 print('    %s' % line)
@@ -236,7 +418,7 @@ class History(object):
 
     def object_log(self):
         result = []
-        for i, (date, content, unused_com) in enumerate(self.parse()):
+        for i, (date, content, unused_com) in enumerate(self.iter_revisions()):
             # Based on Mateusz's code; provides more details about the
             # history event
             event = {
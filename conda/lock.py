@@ -7,25 +7,40 @@
 """
 Tools for working with locks
 
-A lock is just an empty directory. We use directories because this lets us use
-the race condition-proof os.makedirs.
+A lock is an advisory ``fcntl.flock`` lock held on a ``.conda_lock`` file. Because the kernel
+releases flock locks when the holding process exits, a crashed conda process can never leave a
+stale lock behind. Locks can be taken exclusively (writers) or shared (readers), so several
+readers of one prefix don't serialize behind each other. A process holding a lock exclusively
+already has it for reading, so its own shared locks on the same path don't wait.
 
-For now, there is one global lock for all of conda, because some things happen
-globally (such as downloading packages).
+Older versions of conda signaled a lock with the mere existence of a ``*.pid*.conda_lock`` file.
+Those files are still honored while the pid recorded in their name is alive, and are removed
+when it is not.
 
-We don't raise an error if the lock is named with the current PID
+On platforms without fcntl (Windows), a lock falls back to an exclusive lock file created with
+``O_EXCL``, and shared locks are exclusive too.
+
+The time spent waiting for a lock is recorded on the lock object as ``wait_time``, and is
+reported at debug level.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from errno import EACCES, EAGAIN, EEXIST, ENOENT, EPERM
 from glob import glob
 import logging
 import os
 from os.path import abspath, basename, dirname, isdir, join
+import re
 import time
 
-from .common.compat import range
+from .common.constants import NULL
 from .exceptions import LockError
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 LOCK_EXTENSION = 'conda_lock'
 
 # Keep the string "LOCKERROR" in this string so that external
@@ -37,9 +52,15 @@ If you are sure that conda is not running, remove it and try again.
 You can also use: $ conda clean --lock
 """
 
+LEGACY_PID_RE = re.compile(r'\.pid(\d+)\.%s$' % LOCK_EXTENSION)
+
 stdoutlog = logging.getLogger('stdoutlog')
 log = logging.getLogger(__name__)
 
+# lock files this process holds an exclusive lock on
+_exclusive_lock_file_paths = set()
+
+
 def touch(file_name, times=None):
     """ Touch function like touch in Unix shell
     :param file_name: the name of file
@@ -55,49 +76,214 @@ def touch(file_name, times=None):
                  e.errno)
 
 
+def pid_is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM means the process exists, but belongs to another user
+        return e.errno == EPERM
+    except (OverflowError, ValueError):
+        return False
+    return True
+
+
+def retries_to_timeout(retries):
+    # matches the total time slept by the exponential backoff of the original glob-based lock
+    return 0.1 * (2 ** (retries + 1) - 1)
+
+
 class FileLock(object):
     """Lock a path (file or directory) with the lock file sitting *beside* path.
 
     :param path_to_lock: the path to be locked
-    :param retries: max number of retries
+    :param retries: max number of retries; only used to derive a default timeout
+    :param timeout: seconds to wait for the lock before raising LockError; None blocks forever
+    :param shared: take a shared (reader) lock instead of an exclusive (writer) lock
     """
-    def __init__(self, path_to_lock, retries=10):
-        """
-        """
+    def __init__(self, path_to_lock, retries=10, timeout=NULL, shared=False):
         self.path_to_lock = abspath(path_to_lock)
-        self.retries = retries
-        self.lock_file_path = "%s.pid{0}.%s" % (self.path_to_lock, LOCK_EXTENSION)
-        # e.g. if locking path `/conda`, lock file will be `/conda.pidXXXX.conda_lock`
-        self.lock_file_glob_str = "%s.pid*.%s" % (self.path_to_lock, LOCK_EXTENSION)
         assert isdir(dirname(self.path_to_lock)), "{0} doesn't exist".format(self.path_to_lock)
         assert "::" not in self.path_to_lock, self.path_to_lock
+        # e.g. if locking path `/conda`, lock file will be `/conda.conda_lock`
+        self._init_lock_paths(self.path_to_lock)
+        self.retries = retries
+        self.timeout = retries_to_timeout(retries) if timeout is NULL else timeout
+        self.shared = shared
+        self.wait_time = None
+        self._fd = None
+
+    def _init_lock_paths(self, lock_path_pre):
+        self.lock_file_path = "%s.%s" % (lock_path_pre, LOCK_EXTENSION)
+        self.legacy_lock_file_glob_str = "%s.pid*.%s" % (lock_path_pre, LOCK_EXTENSION)
+
+    @property
+    def mode(self):
+        return 'shared' if self.shared else 'exclusive'
 
     def __enter__(self):
-        sleep_time = 1
-        self.lock_file_path = self.lock_file_path.format(os.getpid())
-        last_glob_match = None
+        start = time.time()
+        if self.shared and self.lock_file_path in _exclusive_lock_file_paths:
+            self.wait_time = 0
+            log.trace("%s already holds lock %s exclusively", os.getpid(), self.lock_file_path)
+            return self
+        deadline = None if self.timeout is None else start + self.timeout
+        self._wait_for_legacy_locks(deadline)
+        if fcntl is None:  # pragma: no cover
+            self._acquire_exclusive_file(deadline)
+        else:
+            self._acquire_flock(deadline)
+        if self._fd is not None and not self.shared:
+            _exclusive_lock_file_paths.add(self.lock_file_path)
+        self.wait_time = time.time() - start
+        log.debug("acquired %s lock %s after waiting %.3f sec",
+                  self.mode, self.lock_file_path, self.wait_time)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fd is None:
+            return
+        if not self.shared:
+            _exclusive_lock_file_paths.discard(self.lock_file_path)
+        try:
+            if fcntl is None:  # pragma: no cover
+                self._unlink_lock_file()
+            else:
+                self._release_flock()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        log.trace("released %s lock %s", self.mode, self.lock_file_path)
+
+    def _raise_lock_error(self, holder):
+        stdoutlog.error("Timed out after %g sec waiting for lock, giving up", self.timeout)
+        raise LockError(LOCKSTR.format(holder))
+
+    def _sleep(self, sleep_time, deadline, holder):
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self._raise_lock_error(holder)
+            sleep_time = min(sleep_time, remaining)
+        log.trace("waiting %g sec for lock held by %s", sleep_time, holder)
+        time.sleep(sleep_time)
+        return min(sleep_time * 2, 1)
 
-        for _ in range(self.retries + 1):
+    def _wait_for_legacy_locks(self, deadline):
+        # honor lock files written by older versions of conda, and clean up any left behind
+        # by processes that no longer exist
+        sleep_time = 0.05
+        while True:
+            live_holders = []
+            for path in glob(self.legacy_lock_file_glob_str):
+                match = LEGACY_PID_RE.search(path)
+                if match and not pid_is_alive(int(match.group(1))):
+                    log.debug("removing stale lock file %s", path)
+                    self._try_unlink(path)
+                else:
+                    live_holders.append(path)
+            if not live_holders:
+                return
+            sleep_time = self._sleep(sleep_time, deadline, live_holders)
+
+    def _open_lock_file(self):
+        try:
+            return os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT, 0o666)
+        except (OSError, IOError) as e:
+            if self.shared:
+                # e.g. reading a prefix we can't write to
+                log.debug("reading %s without a lock [errno %d]", self.path_to_lock, e.errno)
+                return None
+            log.warn("Failed to create lock, do not run conda in parallel processes [errno %d]",
+                     e.errno)
+            return None
+
+    def _acquire_flock(self, deadline):
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        if deadline is not None:
+            operation |= fcntl.LOCK_NB
+        sleep_time = 0.01
+        while True:
+            fd = self._open_lock_file()
+            if fd is None:
+                return
+            try:
+                fcntl.flock(fd, operation)
+            except (OSError, IOError) as e:
+                os.close(fd)
+                if e.errno not in (EAGAIN, EACCES):
+                    raise
+                sleep_time = self._sleep(sleep_time, deadline, self._read_holder())
+                continue
+            if self._is_current_lock_file(fd):
+                self._fd = fd
+                if not self.shared:
+                    self._write_holder()
+                return
+            # the previous holder unlinked the lock file while we were waiting on it
+            os.close(fd)
 
-            # search, whether there is process already locked on this file
-            glob_result = glob(self.lock_file_glob_str)
-            if glob_result:
-                log.debug(LOCKSTR.format(glob_result))
-                log.debug("Sleeping for %s seconds", sleep_time)
+    def _is_current_lock_file(self, fd):
+        try:
+            path_stat = os.stat(self.lock_file_path)
+        except (OSError, IOError):
+            return False
+        fd_stat = os.fstat(fd)
+        return (path_stat.st_dev, path_stat.st_ino) == (fd_stat.st_dev, fd_stat.st_ino)
 
-                time.sleep(sleep_time / 10)
-                sleep_time *= 2
-                last_glob_match = glob_result
+    def _release_flock(self):
+        # only remove the lock file when no other reader holds it; a process waiting on the
+        # unlinked file notices, and opens a new lock file
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (OSError, IOError):
+            pass
+        else:
+            self._unlink_lock_file()
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _acquire_exclusive_file(self, deadline):  # pragma: no cover
+        sleep_time = 0.05
+        while True:
+            try:
+                self._fd = os.open(self.lock_file_path, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+            except (OSError, IOError) as e:
+                if e.errno != EEXIST:
+                    log.warn("Failed to create lock, do not run conda in parallel processes "
+                             "[errno %d]", e.errno)
+                    return
+                sleep_time = self._sleep(sleep_time, deadline, self._read_holder())
             else:
-                touch(self.lock_file_path)
-                return self
+                self._write_holder()
+                return
 
-        stdoutlog.error("Exceeded max retries, giving up")
-        raise LockError(LOCKSTR.format(last_glob_match))
+    def _write_holder(self):
+        try:
+            os.ftruncate(self._fd, 0)
+            os.write(self._fd, ("%d\n" % os.getpid()).encode('ascii'))
+        except (OSError, IOError) as e:
+            log.trace("unable to record pid in lock file %s [errno %d]",
+                      self.lock_file_path, e.errno)
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        from .gateways.disk.delete import rm_rf
-        rm_rf(self.lock_file_path)
+    def _read_holder(self):
+        try:
+            with open(self.lock_file_path) as fh:
+                pid = fh.read().strip()
+        except (OSError, IOError):
+            pid = None
+        return "%s (pid %s)" % (self.lock_file_path, pid) if pid else self.lock_file_path
+
+    def _unlink_lock_file(self):
+        self._try_unlink(self.lock_file_path)
+
+    @staticmethod
+    def _try_unlink(path):
+        try:
+            os.unlink(path)
+        except (OSError, IOError) as e:
+            if e.errno != ENOENT:
+                log.trace("unable to remove lock file %s [errno %d]", path, e.errno)
 
 
 class DirectoryLock(FileLock):
@@ -106,19 +292,16 @@ class DirectoryLock(FileLock):
     Useful when, for example, locking the root prefix at ``/conda``, and ``/`` is not writable.
 
     :param directory_path: the path to be locked
-    :param retries: max number of retries
+    :param retries: max number of retries; only used to derive a default timeout
+    :param timeout: seconds to wait for the lock before raising LockError; None blocks forever
+    :param shared: take a shared (reader) lock instead of an exclusive (writer) lock
     """
 
-    def __init__(self, directory_path, retries=10):
+    def __init__(self, directory_path, retries=10, timeout=NULL, shared=False):
         self.directory_path = abspath(directory_path)
-        directory_name = basename(self.directory_path)
-        self.retries = retries
-        lock_path_pre = join(self.directory_path, directory_name)
-        self.lock_file_path = "%s.pid{0}.%s" % (lock_path_pre, LOCK_EXTENSION)
-        # e.g. if locking directory `/conda`, lock file will be `/conda/conda.pidXXXX.conda_lock`
-        self.lock_file_glob_str = "%s.pid*.%s" % (lock_path_pre, LOCK_EXTENSION)
-        # make sure '/' exists
-        assert isdir(dirname(self.directory_path)), "{0} doesn't exist".format(self.directory_path)
+        super(DirectoryLock, self).__init__(self.directory_path, retries, timeout, shared)
+        # e.g. if locking directory `/conda`, lock file will be `/conda/conda.conda_lock`
+        self._init_lock_paths(join(self.directory_path, basename(self.directory_path)))
         if not isdir(self.directory_path):
             try:
                 os.makedirs(self.directory_path)
@@ -24,31 +24,331 @@ being used will only be used in the positive or the negative, respectively
 is probably best if you do not take advantage of this directly, but rather
 through the Require and Prevent functions.
 
+The clauses are handed to a SAT solver through the SatSolver interface. The
+default backend, pycosat, is handed the complete clause list on every call.
+Incremental backends (pycryptosat, python-sat) keep one solver instance alive
+for the lifetime of a Clauses object, only ever add new clauses to it, and
+solve temporary constraints under an assumed activation literal instead.
+
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from itertools import chain, combinations
+from array import array
+from importlib import import_module
+from itertools import chain, combinations, islice
 import logging
 import pycosat
+from time import time
 
-from .common.compat import iteritems
+from .common.compat import iteritems, odict, on_win
 from .exceptions import CondaValueError
 
 dotlog = logging.getLogger('dotupdate')
 log = logging.getLogger(__name__)
 
+# Beyond this size, Clauses.minimize falls back to one LinearBound BDD per bisection step
+TOTALIZER_MAX_CLAUSES = 250000
+
+
+class ClauseArray(object):
+    """Compact storage for a list of clauses.
+
+    The literals of all clauses are kept in a single flat array('i'), each
+    clause followed by a zero terminator, with a second array holding the
+    offset at which each clause starts. Iterating yields each clause as an
+    array('i') slice, which SAT solvers accept as is; the slices are made as
+    the solver consumes them, so only the flat arrays are kept in memory.
+    Truncating to an earlier clause count is a pair of in-place deletions.
+    """
+
+    def __init__(self, clauses=()):
+        self._literals = array(str('i'))
+        self._offsets = array(str('l'))
+        self.extend(clauses)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        return self.iter_clauses()
+
+    def __repr__(self):
+        return "ClauseArray(%r)" % [tuple(c) for c in self]
+
+    def __eq__(self, other):
+        if isinstance(other, ClauseArray):
+            return self._literals == other._literals
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def append(self, clause):
+        literals = self._literals
+        self._offsets.append(len(literals))
+        literals.extend(clause)
+        literals.append(0)
+
+    def extend(self, clauses):
+        literals = self._literals
+        offsets = self._offsets
+        for clause in clauses:
+            offsets.append(len(literals))
+            literals.extend(clause)
+            literals.append(0)
+
+    def iter_clauses(self, start=0):
+        literals = self._literals
+        offsets = self._offsets
+        if start >= len(offsets):
+            return
+        # each clause ends just before the zero terminator that precedes the next clause
+        begin = offsets[start]
+        for end in islice(offsets, start + 1, None):
+            yield literals[begin:end - 1]
+            begin = end
+        yield literals[begin:-1]
+
+    def truncate(self, nclauses):
+        if nclauses < len(self._offsets):
+            del self._literals[self._offsets[nclauses]:]
+            del self._offsets[nclauses:]
+
+    def guard(self, start, literal):
+        """Add literal to every clause from index start onward."""
+        tail = list(self.iter_clauses(start))
+        self.truncate(start)
+        literals = self._literals
+        offsets = self._offsets
+        for clause in tail:
+            offsets.append(len(literals))
+            literals.extend(clause)
+            literals.append(literal)
+            literals.append(0)
+
+
+class SatSolver(object):
+    """Interface between a Clauses object and a SAT solver backend.
+
+    Subclasses implement ``solve``, which returns a solution (a list of
+    literals for variables 1..m) for the current clauses of the Clauses
+    object plus any ``additional`` clauses, with each literal in
+    ``assumptions`` held true; or None if there is no solution, or the
+    propagation ``limit`` was reached first. The two cases are told apart by
+    ``limit_reached``, which is set by every call to ``solve``.
+    """
+    # An incremental backend never forgets a clause it was given, so temporary
+    # constraints must be guarded by activation literals rather than removed.
+    incremental = False
+    limit_reached = False
+
+    def __init__(self, clauses):
+        self._clauses = clauses
+
+    def solve(self, additional=(), assumptions=(), limit=0):
+        raise NotImplementedError()
+
+    def truncate(self, nclauses):
+        """Called when the clause list is truncated to its first nclauses entries."""
+        pass
+
+
+class PycoSatSolver(SatSolver):
+    module_name = 'pycosat'
+
+    def solve(self, additional=(), assumptions=(), limit=0):
+        C = self._clauses
+        clauses = iter(C.clauses)
+        if additional or assumptions:
+            clauses = chain(clauses, additional, ((a,) for a in assumptions))
+        solution = pycosat.solve(clauses, vars=C.m, prop_limit=limit)
+        self.limit_reached = solution == "UNKNOWN"
+        if solution in ("UNSAT", "UNKNOWN"):
+            return None
+        return solution
+
+
+class IncrementalSatSolver(SatSolver):
+    incremental = True
+
+    def __init__(self, clauses):
+        super(IncrementalSatSolver, self).__init__(clauses)
+        self._solver = None
+        self._clause_list = None
+        self._nclauses = 0
+
+    def _new_solver(self):
+        raise NotImplementedError()
+
+    def _add_clauses(self, clauses):
+        raise NotImplementedError()
+
+    def _solve(self, assumptions, limit):
+        # return the truth values of variables 1..m as (var or -var) literals, or None
+        raise NotImplementedError()
+
+    def truncate(self, nclauses):
+        if nclauses < self._nclauses:
+            # clauses can't be taken back out of the solver; start over on the next solve
+            self._solver = None
+
+    def _sync(self):
+        clauses = self._clauses.clauses
+        if self._solver is None or clauses is not self._clause_list:
+            log.trace('Building new %s instance', type(self).__name__)
+            self._solver = self._new_solver()
+            self._clause_list = clauses
+            self._nclauses = 0
+        if len(clauses) > self._nclauses:
+            self._add_clauses(clauses.iter_clauses(self._nclauses))
+            self._nclauses = len(clauses)
+
+    def solve(self, additional=(), assumptions=(), limit=0):
+        # anything handed to the solver stays there; Clauses.sat turns temporary
+        # clauses into clauses guarded by an activation literal instead
+        assert not additional, "incremental solvers only take assumptions"
+        self._sync()
+        return self._solve(list(assumptions), limit)
+
+
+class CryptoMiniSatSolver(IncrementalSatSolver):
+    module_name = 'pycryptosat'
+
+    def _new_solver(self):
+        from pycryptosat import Solver
+        return Solver()
+
+    def _add_clauses(self, clauses):
+        add_clause = self._solver.add_clause
+        for clause in clauses:
+            add_clause(clause)
+
+    def _solve(self, assumptions, limit):
+        # pycryptosat has no per-call propagation limit; limit is ignored
+        sat, solution = self._solver.solve(assumptions)
+        if not sat:
+            return None
+        m = self._clauses.m
+        n = len(solution)
+        return [k if k < n and solution[k] else -k for k in range(1, m + 1)]
+
+
+class PySatSolver(IncrementalSatSolver):
+    module_name = 'pysat'
+    solver_name = 'glucose4'
+
+    def _new_solver(self):
+        from pysat.solvers import Solver
+        return Solver(name=self.solver_name)
+
+    def _add_clauses(self, clauses):
+        self._solver.append_formula(clauses)
+
+    def _solve(self, assumptions, limit):
+        solver = self._solver
+        if limit:
+            solver.prop_budget(limit)
+            sat = solver.solve_limited(assumptions=assumptions)
+        else:
+            sat = solver.solve(assumptions=assumptions)
+        # solve_limited returns None when it runs out of budget
+        self.limit_reached = sat is None
+        if not sat:
+            return None
+        model = solver.get_model()
+        m = self._clauses.m
+        # variables the solver has never seen are unconstrained
+        return model[:m] + list(range(-len(model) - 1, -m - 1, -1))
+
+
+SAT_SOLVERS = odict((
+    ('pycosat', PycoSatSolver),
+    ('pycryptosat', CryptoMiniSatSolver),
+    ('pysat', PySatSolver),
+))
+
+
+def get_sat_solver_cls(name):
+    """Return the SatSolver class for name, falling back to pycosat if the
+    backend is unknown or its module can't be imported."""
+    try:
+        cls = SAT_SOLVERS[name or 'pycosat']
+    except KeyError:
+        log.warn("Unknown SAT solver %r; using pycosat. Available solvers: %s",
+                 name, ', '.join(SAT_SOLVERS))
+        return PycoSatSolver
+    try:
+        import_module(cls.module_name)
+    except ImportError:
+        log.warn("Could not import the Python module for the %r SAT solver; using pycosat.",
+                 name)
+        return PycoSatSolver
+    return cls
+
+
+class SolveBudget(object):
+    """A bound on the work Clauses.minimize may spend improving a solution.
+
+    :param timeout: seconds from now after which no further bisection steps are
+        started; 0 means no time limit
+    :param prop_limit: the propagation limit of each individual SAT call made
+        while minimizing; 0 means no limit
+
+    Once either limit is hit the budget is ``exhausted``, and minimize returns the
+    best solution found so far instead of the optimum, for this and every later
+    objective. The timeout is only checked between SAT calls, so bounding a single
+    call also requires a propagation limit.
+    """
+
+    def __init__(self, timeout=0, prop_limit=0):
+        self.deadline = time() + timeout if timeout else None
+        self.prop_limit = prop_limit
+        self.exhausted = False
+
+    def expired(self):
+        if not self.exhausted and self.deadline is not None and time() >= self.deadline:
+            log.debug('Solver time budget exhausted')
+            self.exhausted = True
+        return self.exhausted
+
 
 # Code that uses special cases (generates no clauses) is in ADTs/FEnv.h in
 # minisatp. Code that generates clauses is in Hardware_clausify.cc (and are
 # also described in the paper, "Translating Pseudo-Boolean Constraints into
 # SAT," Eén and Sörensson).
 class Clauses(object):
-    def __init__(self, m=0):
-        self.clauses = []
+    def __init__(self, m=0, sat_solver=None, budget=None):
+        self.clauses = ClauseArray()
         self.names = {}
         self.indices = {}
         self.unsat = False
         self.m = m
+        self.budget = budget
+        self._sat_solver_cls = get_sat_solver_cls(sat_solver)
+        self._sat_solver = None
+
+    @property
+    def sat_solver(self):
+        if self._sat_solver is None:
+            self._sat_solver = self._sat_solver_cls(self)
+        return self._sat_solver
+
+    def truncate(self, nclauses):
+        """Drop all clauses added after the first nclauses."""
+        self.clauses.truncate(nclauses)
+        if self._sat_solver is not None:
+            self._sat_solver.truncate(nclauses)
+
+    def guard_clauses(self, nclauses):
+        """Guard all clauses added after the first nclauses by a new activation
+        literal, which is returned. The clauses are only enforced when the
+        literal is assumed or required to be true."""
+        act = self.new_var()
+        self.clauses.guard(nclauses, -act)
+        return act
 
     def name_var(self, m, name):
         nname = '!' + name
@@ -105,7 +405,7 @@ class Clauses(object):
         elif tvals is not bool:
             self.clauses.append((vals if polarity else -vals,))
         else:
-            self.clauses = self.clauses[:nz]
+            self.truncate(nz)
             self.unsat = self.unsat or polarity != vals
 
     def Combine_(self, args, polarity):
@@ -399,7 +699,52 @@ class Clauses(object):
         return self.Eval_(self.LinearBound_, (equation, lo, hi, preprocess),
                           polarity, name, conv=False)
 
-    def sat(self, additional=None, includeIf=False, names=False, limit=0):
+    def Totalizer(self, equation, cap, max_clauses=None):
+        """
+        Generalized totalizer encoding of the sum of a preprocessed equation:
+        a list of (coeff, literal) pairs with positive coefficients.
+
+        Returns a dict mapping each value the sum can take, with all values of
+        at least cap lumped into cap, to a literal that is forced true when the
+        sum reaches that value. So, the sum is bounded above by k when all
+        literals for values greater than k are false; which makes the bound
+        something to assume rather than something to encode.
+
+        Returns None, having added nothing, if the encoding would take more
+        than max_clauses clauses.
+        """
+        nz, m_orig = len(self.clauses), self.m
+        nclauses = 0
+        nodes = [{min(c, cap): a} for c, a in equation]
+        while len(nodes) > 1:
+            merged = []
+            for left, right in zip(nodes[::2], nodes[1::2]):
+                nclauses += (len(left) + 1) * (len(right) + 1) - 1
+                if max_clauses is not None and nclauses > max_clauses:
+                    self.truncate(nz)
+                    self.m = m_orig
+                    return None
+                merged.append(self.TotalizerMerge_(left, right, cap))
+            if len(nodes) % 2:
+                merged.append(nodes[-1])
+            nodes = merged
+        return nodes[0] if nodes else {}
+
+    def TotalizerMerge_(self, left, right, cap):
+        sums = {}
+        for lv in chain((0,), left):
+            for rv in chain((0,), right):
+                if lv or rv:
+                    sums.setdefault(min(lv + rv, cap), []).append((lv, rv))
+        outputs = {}
+        for total in sorted(sums):
+            x = outputs[total] = self.new_var()
+            self.clauses.extend(((x,) + ((-left[lv],) if lv else ()) +
+                                 ((-right[rv],) if rv else ()))
+                                for lv, rv in sums[total])
+        return outputs
+
+    def sat(self, additional=None, includeIf=False, names=False, limit=0, assumptions=()):
         """
         Calculate a SAT solution for the current clause set.
 
@@ -411,7 +756,6 @@ class Clauses(object):
             return None
         if not self.m:
             return set() if names else []
-        clauses = self.clauses
         if additional:
             def preproc(eqs):
                 def preproc_(cc):
@@ -433,22 +777,23 @@ class Clauses(object):
             if additional:
                 if not additional[-1]:
                     return None
-                clauses = chain(clauses, additional)
-        try:
-            solution = pycosat.solve(clauses, vars=self.m, prop_limit=limit)
-        except TypeError:
-            # pycosat 0.6.1 should not require this; pycosat 0.6.0 did, but we
-            # have made conda dependent on pycosat 0.6.1. However, issue #2276
-            # suggests that some people are still seeing this behavior even when
-            # pycosat 0.6.1 is installed. Until we can understand why, this
-            # needs to stay. I still don't want to invoke it unnecessarily,
-            # because for large clauses lists it is slow.
-            clauses = list(map(list, clauses))
-            solution = pycosat.solve(clauses, vars=self.m, prop_limit=limit)
-        if solution in ("UNSAT", "UNKNOWN"):
-            return None
-        if additional and includeIf:
+        solver = self.sat_solver
+        if additional and solver.incremental:
+            # The solver keeps every clause it is given, so the additional
+            # clauses are guarded by an activation literal. It is assumed true
+            # for this call, and then fixed for good: true if the clauses are
+            # to be kept, false otherwise.
+            nz = len(self.clauses)
             self.clauses.extend(additional)
+            act = self.guard_clauses(nz)
+            solution = solver.solve(assumptions=tuple(chain(assumptions, (act,))), limit=limit)
+            self.clauses.append((act,) if solution is not None and includeIf else (-act,))
+        else:
+            solution = solver.solve(additional or (), assumptions, limit=limit)
+            if solution is not None and additional and includeIf:
+                self.clauses.extend(additional)
+        if solution is None:
+            return None
         if names:
             return set(nm for nm in (self.indices.get(s) for s in solution) if nm and nm[0] != '!')
         return solution
@@ -468,16 +813,31 @@ class Clauses(object):
             yield sol
             exclude.append([-k for k in sol if -m <= k <= m])
 
-    def minimize(self, objective, bestsol=None, trymax=False):
+    def minimize(self, objective, bestsol=None, trymax=False, totalizer=True):
         """
         Minimize the objective function given either by (coeff, integer)
         tuple pairs, or a dictionary of varname: coeff values. The actual
         minimization is multiobjective: first, we minimize the largest
         active coefficient value, then we minimize the sum.
+
+        The sum is bounded with a generalized totalizer, built once, so that
+        each bisection step only changes the assumptions the solver is run
+        under. If the totalizer would be too large, or totalizer=False, each
+        step instead adds a LinearBound BDD, which is removed again afterward.
+
+        If the Clauses object has a SolveBudget, bisection stops as soon as it
+        is exhausted, and the best solution found so far is returned.
         """
+        budget = self.budget
+        limit = budget.prop_limit if budget is not None else 0
         if bestsol is None or len(bestsol) < self.m:
             log.debug('Clauses added, recomputing solution')
-            bestsol = self.sat()
+            if bestsol and budget is not None and budget.exhausted:
+                # extend the current solution to the new variables, rather than
+                # discard the objectives it was optimized for
+                bestsol = self.sat(assumptions=bestsol) or self.sat()
+            else:
+                bestsol = self.sat()
         if bestsol is None or self.unsat:
             log.debug('Constraints are unsatisfiable')
             return bestsol, sum(abs(c) for c, a in objective) + 1 if objective else 1
@@ -497,6 +857,15 @@ class Clauses(object):
         def sum_val(sol, odict):
             return sum(odict.get(s, 0) for s in sol)
 
+        if budget is not None and budget.expired():
+            bestval = sum_val(bestsol, {a: c for c, a in objective})
+            log.debug('Solver budget exhausted; objective not minimized: %d' % bestval)
+            return bestsol, bestval
+
+        # An incremental solver keeps one instance alive across all bisection
+        # steps: each step's bound constraints are guarded by an activation
+        # literal instead of being truncated away afterwards.
+        incremental = self.sat_solver.incremental
         lo = 0
         try0 = 0
         for peak in ((True, False) if maxval > 1 else (False,)):
@@ -518,23 +887,51 @@ class Clauses(object):
             if trymax and not peak:
                 try0 = hi - 1
 
+            outputs = None
+            if totalizer and not peak and hi > lo:
+                # values above hi need an output of their own, so that the final bound
+                #   still excludes them when the optimum is hi itself
+                outputs = self.Totalizer(objective, hi + 1, TOTALIZER_MAX_CLAUSES)
+                if outputs is None:
+                    log.debug('Totalizer too large; using LinearBound bisection')
+                else:
+                    log.trace('Totalizer: %d values, (%d+%d) clauses' %
+                              (len(outputs), nz, len(self.clauses)-nz))
+                    nz = len(self.clauses)
+
             log.trace("Initial range (%d,%d)" % (lo, hi))
             while True:
+                if budget is not None and budget.expired():
+                    break
                 if try0 is None:
                     mid = (lo+hi) // 2
                 else:
                     mid = try0
-                if peak:
-                    self.Prevent(self.Any, tuple(a for c, a in objective if c > mid))
-                    temp = tuple(a for c, a in objective if lo <= c <= mid)
-                    if temp:
-                        self.Require(self.Any, temp)
+                if outputs is not None:
+                    # the bound is a set of assumptions; there is nothing to undo
+                    bound = tuple(-x for total, x in iteritems(outputs) if total > mid)
+                    log.trace('Bisection attempt: (%d,%d), %d assumptions' %
+                              (lo, mid, len(bound)))
+                    newsol = self.sat(assumptions=bound, limit=limit)
                 else:
-                    self.Require(self.LinearBound, objective, lo, mid, False)
-                log.trace('Bisection attempt: (%d,%d), (%d+%d) clauses' %
-                          (lo, mid, nz, len(self.clauses)-nz))
-                newsol = self.sat()
-                if newsol is None:
+                    if peak:
+                        self.Prevent(self.Any, tuple(a for c, a in objective if c > mid))
+                        temp = tuple(a for c, a in objective if lo <= c <= mid)
+                        if temp:
+                            self.Require(self.Any, temp)
+                    else:
+                        self.Require(self.LinearBound, objective, lo, mid, False)
+                    log.trace('Bisection attempt: (%d,%d), (%d+%d) clauses' %
+                              (lo, mid, nz, len(self.clauses)-nz))
+                    if incremental:
+                        act = self.guard_clauses(nz)
+                        newsol = self.sat(assumptions=(act,), limit=limit)
+                    else:
+                        newsol = self.sat(limit=limit)
+                if newsol is None and limit and self.sat_solver.limit_reached:
+                    log.debug('Solver propagation limit reached')
+                    budget.exhausted = True
+                elif newsol is None:
                     lo = mid + 1
                     log.trace("Bisection failure, new range=(%d,%d)" % (lo, hi))
                     # If this was a failure of the first test after peak minimization,
@@ -547,13 +944,27 @@ class Clauses(object):
                     hi = bestval
                     log.trace("Bisection success, new range=(%d,%d)" % (lo, hi))
                     if done:
+                        if outputs is not None:
+                            self.clauses.extend((x,) for x in bound)
+                        elif incremental:
+                            self.clauses.append((act,))
                         break
-                self.m = m_orig
-                if len(self.clauses) > nz:
-                    self.clauses = self.clauses[:nz]
+                if outputs is not None:
+                    pass
+                elif incremental:
+                    self.clauses.append((-act,))
+                    nz = len(self.clauses)
+                else:
+                    self.m = m_orig
+                    if len(self.clauses) > nz:
+                        self.truncate(nz)
                 self.unsat = False
                 try0 = None
 
+            if budget is not None and budget.exhausted:
+                bestval = sum_val(bestsol, odict)
+                log.debug('Solver budget exhausted; best sum objective found: %d' % bestval)
+                break
             log.debug('Final %s objective: %d' % ('peak' if peak else 'sum', bestval))
             if bestval == 0:
                 break
@@ -571,13 +982,77 @@ class Clauses(object):
         return bestsol, bestval
 
 
+# the probe function of the ProbePool being created; inherited by its forked workers
+_pool_probe = None
+
+
+def _run_pool_probe(args):
+    return _pool_probe(*args)
+
+
+class ProbePool(object):
+    """Evaluate independent probes of a SAT problem in a pool of worker processes.
+
+    The workers are forked when the pool is created, so they share everything the
+    probe function refers to, e.g. a Clauses object built up to that point, without
+    pickling it. Only the probe arguments and results go through pipes, so both
+    must be picklable.
+
+    Use ``ProbePool.create``, which returns None where forking isn't available.
+    """
+
+    def __init__(self, probe, processes, context):
+        global _pool_probe
+        _pool_probe = probe
+        try:
+            self._pool = context.Pool(processes)
+        finally:
+            _pool_probe = None
+        self.processes = processes
+
+    @classmethod
+    def create(cls, probe, processes):
+        # processes=0 means one per CPU
+        if on_win:
+            return None
+        try:
+            import multiprocessing
+            if not processes:
+                processes = multiprocessing.cpu_count()
+            if processes <= 1:
+                return None
+            # workers must be forked whatever the default start method is, since a spawned
+            #   worker would not inherit the probe; Python 2 always forks
+            context = multiprocessing
+            if hasattr(multiprocessing, 'get_context'):
+                context = multiprocessing.get_context('fork')
+            return cls(probe, processes, context)
+        except (ImportError, NotImplementedError, OSError, ValueError) as e:
+            # e.g. no working sem_open, fork isn't supported, or the process limit was reached
+            log.debug("unable to start solver worker processes: %r", e)
+            return None
+
+    def map(self, args_list):
+        return self._pool.map(_run_pool_probe, args_list, chunksize=1)
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 def evaluate_eq(eq, sol):
     if type(eq) is not dict:
         eq = {c: v for v, c in eq if type(c) is not bool}
     return sum(eq.get(s, 0) for s in sol if type(s) is not bool)
 
 
-def minimal_unsatisfiable_subset(clauses, sat, log=False):
+def minimal_unsatisfiable_subset(clauses, sat, log=False, processes=1):
     """
     Given a set of clauses, find a minimal unsatisfiable subset (an
     unsatisfiable core)
@@ -588,6 +1063,9 @@ def minimal_unsatisfiable_subset(clauses, sat, log=False):
 
     If log=True, progress bars will be displayed with the progress.
 
+    If processes is greater than 1 (or 0, for one per CPU), the two halves of
+    each split are probed concurrently in a ProbePool.
+
     sat should be a function that takes a tuple of clauses and returns True if
     the clauses are satisfiable and False if they are not.  The algorithm will
     work with any order-reversing function (reversing the order of subset and
@@ -642,6 +1120,13 @@ def minimal_unsatisfiable_subset(clauses, sat, log=False):
     if sat(clauses):
         raise CondaValueError("Clauses are not unsatisfiable")
 
+    # The search works on tuples of indices into clauses, so that only those
+    # have to be sent to worker processes.
+    def sat_(indices):
+        return sat(tuple(clauses[k] for k in indices))
+
+    pool = ProbePool.create(sat_, processes) if len(clauses) > 2 else None
+
     def split(S):
         """
         Split S into two equal parts
@@ -674,11 +1159,16 @@ def minimal_unsatisfiable_subset(clauses, sat, log=False):
 
         # To display progress, every time we discard clauses, we update the
         # progress by that much.
-        if not sat(A + include):
+        if pool is not None:
+            satA, satB = pool.map(((A + include,), (B + include,)))
+        else:
+            satA = sat_(A + include)
+            satB = None if not satA else sat_(B + include)
+        if not satA:
             d += len(B)
             update(d, L)
             return minimal_unsat(A, include)
-        if not sat(B + include):
+        if not satB:
             d += len(A)
             update(d, L)
             return minimal_unsat(B, include)
@@ -691,6 +1181,10 @@ def minimal_unsatisfiable_subset(clauses, sat, log=False):
     L = len(clauses)
     d = 0
     start(L)
-    ret = minimal_unsat(clauses)
+    try:
+        ret = minimal_unsat(tuple(range(L)))
+    finally:
+        if pool is not None:
+            pool.close()
     stop()
-    return ret
+    return tuple(clauses[k] for k in ret)
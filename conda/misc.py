@@ -3,6 +3,7 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from codecs import getincrementaldecoder
 from collections import defaultdict
 import os
 from os.path import (abspath, dirname, exists, expanduser, isdir, isfile, join,
@@ -16,13 +17,14 @@ from .base.context import context
 from .common.compat import iteritems, iterkeys, itervalues, on_win, open
 from .common.path import url_to_path, win_path_ok
 from .common.url import is_url, join_url, path_to_url, unquote
-from .core.index import get_index, _supplement_index_with_cache
+from .core.index import _supplement_index_with_cache
 from .core.linked_data import linked_data
 from .core.package_cache import PackageCache, ProgressiveFetchExtract
-from .exceptions import CondaFileNotFoundError, ParseError, PackageNotFoundError
+from .exceptions import CondaError, CondaFileNotFoundError, ParseError, PackageNotFoundError
+from .gateways.disk.create import create_reflink_hard_link_or_copy
 from .gateways.disk.delete import rm_rf
 from .gateways.disk.link import islink
-from .instructions import LINK, UNLINK
+from .instructions import LINK, PREFIX, UNLINK
 from .models.dist import Dist
 from .models.index_record import IndexRecord
 from .plan import execute_actions
@@ -203,9 +205,96 @@ def append_env(prefix):
         pass
 
 
+# untracked files are read in chunks of this many bytes when they are cloned
+CLONE_CHUNK_SIZE = 1 << 20
+
+
+def _read_chunks(fh):
+    return iter(lambda: fh.read(CLONE_CHUNK_SIZE), b'')
+
+
+def needs_prefix_replacement(path, prefix):
+    """Whether the file at path is UTF-8 text that mentions prefix.
+
+    Only such files are rewritten when an environment is cloned. The file is scanned in
+    chunks, so it is never held in memory as a whole.
+    """
+    needle = prefix.encode('utf-8')
+    keep = len(needle) - 1
+    decoder = getincrementaldecoder('utf-8')()
+    found = False
+    tail = b''
+    with open(path, 'rb') as fh:
+        for chunk in _read_chunks(fh):
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError:
+                return False
+            if not found:
+                found = needle in chunk or needle in tail + chunk[:keep]
+                tail = (tail + chunk)[-keep:] if len(chunk) < keep else chunk[len(chunk) - keep:]
+    try:
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return found
+
+
+def copy_replacing_prefix(src, dst, prefix1, prefix2):
+    """Stream src to dst, replacing every occurrence of prefix1 with prefix2."""
+    old, new = prefix1.encode('utf-8'), prefix2.encode('utf-8')
+    keep = len(old) - 1
+    with open(src, 'rb') as fi:
+        with open(dst, 'wb') as fo:
+            pending = b''
+            chunks = _read_chunks(fi)
+            chunk = next(chunks, b'')
+            while chunk or pending:
+                data = pending + chunk
+                chunk = next(chunks, b'')
+                # an occurrence that starts in the last keep bytes may continue in the next chunk
+                safe = len(data) - keep if chunk else len(data)
+                pos = 0
+                while True:
+                    match = data.find(old, pos)
+                    if match < 0 or match >= safe:
+                        break
+                    fo.write(data[pos:match])
+                    fo.write(new)
+                    pos = match + len(old)
+                flushed = max(pos, safe)
+                fo.write(data[pos:flushed])
+                pending = data[flushed:]
+    shutil.copystat(src, dst)
+
+
+def clone_untracked_file(src, dst, prefix1, prefix2):
+    """Clone a file that no package owns from prefix1 into prefix2.
+
+    Only UTF-8 text that mentions prefix1 is rewritten; everything else shares its data with the
+    source through a reflink or a hard link where the filesystem allows it. Returns False if src
+    cannot be read.
+    """
+    if islink(src):
+        os.symlink(os.readlink(src), dst)
+        return True
+    try:
+        rewrite = needs_prefix_replacement(src, prefix1)
+    except (IOError, OSError):
+        return False
+    if rewrite:
+        copy_replacing_prefix(src, dst, prefix1, prefix2)
+    else:
+        create_reflink_hard_link_or_copy(src, dst)
+    return True
+
+
 def clone_env(prefix1, prefix2, verbose=True, quiet=False, index_args=None):
     """
     clone existing prefix1 into new prefix2
+
+    The packages are linked from the source prefix's own records, so no index is fetched;
+    index_args is accepted for compatibility only.
     """
     untracked_files = untracked(prefix1)
 
@@ -240,42 +329,24 @@ def clone_env(prefix1, prefix2, verbose=True, quiet=False, index_args=None):
                 print(' - ' + pkg.dist_name, file=fh)
             drecs = {dist: info for dist, info in iteritems(drecs) if info['name'] not in filter}
 
-    # Resolve URLs for packages that do not have URLs
-    r = None
+    # Packages without a URL can only be linked from a package cache that already holds them
     index = {}
-    unknowns = [dist for dist, info in iteritems(drecs) if not info.get('url')]
     notfound = []
-    if unknowns:
-        index_args = index_args or {}
-        index = get_index(**index_args)
-        r = Resolve(index, sort=True)
-        for dist in unknowns:
-            name = dist.dist_name
-            fn = dist.to_filename()
-            fkeys = [d for d in r.index.keys() if r.index[d]['fn'] == fn]
-            if fkeys:
-                del drecs[dist]
-                dist_str = sorted(fkeys, key=r.version_key, reverse=True)[0]
-                drecs[Dist(dist_str)] = r.index[dist_str]
-            else:
-                notfound.append(fn)
-    if notfound:
-        what = "Package%s " % ('' if len(notfound) == 1 else 's')
-        raise PackageNotFoundError(what)
-
-    # Assemble the URL and channel list
-    urls = {}
     for dist, info in iteritems(drecs):
-        fkey = dist
-        if fkey not in index:
-            index[fkey] = IndexRecord.from_objects(info, not_fetched=True)
-            r = None
-        urls[dist] = info['url']
+        if not info.get('url'):
+            try:
+                dist = PackageCache.get_entry_to_link(dist).dist
+            except CondaError:
+                notfound.append(dist.to_filename())
+                continue
+        index[dist] = IndexRecord.from_objects(info)
+    if notfound:
+        raise PackageNotFoundError("Package%s not found in any package cache and without a URL "
+                                   "to fetch from: %s"
+                                   % ('' if len(notfound) == 1 else 's', ', '.join(notfound)))
 
-    if r is None:
-        r = Resolve(index)
-    dists = r.dependency_sort({d.quad[0]: d for d in urls.keys()})
-    urls = [urls[d] for d in dists]
+    r = Resolve(index)
+    dists = r.dependency_sort({d.quad[0]: d for d in iterkeys(index)})
 
     if verbose:
         print('Packages: %d' % len(dists))
@@ -289,29 +360,16 @@ def clone_env(prefix1, prefix2, verbose=True, quiet=False, index_args=None):
             rm_rf(dst_dir)
         if not isdir(dst_dir):
             os.makedirs(dst_dir)
-        if islink(src):
-            os.symlink(os.readlink(src), dst)
-            continue
+        clone_untracked_file(src, dst, prefix1, prefix2)
 
-        try:
-            with open(src, 'rb') as fi:
-                data = fi.read()
-        except IOError:
-            continue
-
-        try:
-            s = data.decode('utf-8')
-            s = s.replace(prefix1, prefix2)
-            data = s.encode('utf-8')
-        except UnicodeDecodeError:  # data is binary
-            pass
-
-        with open(dst, 'wb') as fo:
-            fo.write(data)
-        shutil.copystat(src, dst)
-
-    actions = explicit(urls, prefix2, verbose=not quiet, index=index,
-                       force_extract=False, index_args=index_args)
+    actions = defaultdict(list)
+    actions[PREFIX] = prefix2
+    actions[LINK] = dists
+    actions['ACTION'] = 'CLONE'
+    if not quiet:
+        from .console import setup_verbose_handlers
+        setup_verbose_handlers()
+    execute_actions(actions, index, verbose=not quiet)
     return actions, untracked_files
 
 
@@ -9,6 +9,11 @@ from .._vendor.auxlib.entity import (BooleanField, ComposableField, DictSafeMixi
                                      EnumField, Field, IntegerField, ListField, StringField)
 from ..common.compat import itervalues, string_types
 
+# combined_depends results, keyed by the (depends, constrains) pair they were parsed from;
+# identical dependency lists are shared by many records across a channel
+COMBINED_DEPENDS_CACHE_SIZE = 20000
+combined_depends_cache = {}
+
 
 @total_ordering
 class Priority(object):
@@ -121,8 +126,18 @@ class IndexRecord(DictSafeMixin, Entity):
 
     @property
     def combined_depends(self):
+        key = self.depends or (), self.constrains or ()
+        result = combined_depends_cache.get(key)
+        if result is None:
+            if len(combined_depends_cache) >= COMBINED_DEPENDS_CACHE_SIZE:
+                combined_depends_cache.clear()
+            result = combined_depends_cache[key] = self._combine_depends(*key)
+        return result
+
+    @staticmethod
+    def _combine_depends(depends, constrains):
         from .match_spec import MatchSpec
-        result = {ms.name: ms for ms in (MatchSpec(spec) for spec in self.depends or ())}
-        result.update({ms.name: ms for ms in (MatchSpec(spec, option=True)
-                                              for spec in self.constrains or ())})
+        result = {ms.name: ms for ms in (MatchSpec(spec) for spec in depends)}
+        result.update({ms.name: ms for ms in (MatchSpec(spec, optional=True)
+                                              for spec in constrains)})
         return tuple(itervalues(result))
@@ -31,6 +31,10 @@ class SplitSearch(object):
         return "'%s'" % self.exact
 
 
+# parsed MatchSpec objects, interned by their raw spec string; cleared when it grows too large
+MATCH_SPEC_CACHE_SIZE = 20000
+match_spec_cache = {}
+
 _implementors = {
     'features': SplitSearch,
     'track_features': SplitSearch,
@@ -85,9 +89,21 @@ class MatchSpec(object):
             spec = None
 
         # memoize spec objects without additional kwargs
-        if not kwargs and isinstance(spec, cls):
-            return spec
-
+        if not kwargs:
+            if isinstance(spec, cls):
+                return spec
+            elif isinstance(spec, string_types):
+                self = match_spec_cache.get(spec)
+                if self is None:
+                    self = cls._parse(spec)
+                    if len(match_spec_cache) >= MATCH_SPEC_CACHE_SIZE:
+                        match_spec_cache.clear()
+                    match_spec_cache[spec] = self
+                return self
+        return cls._parse(spec, **kwargs)
+
+    @classmethod
+    def _parse(cls, spec, **kwargs):
         normalize = kwargs.pop('normalize', False)
         self = object.__new__(cls)
         _specs_map = {}
@@ -23,6 +23,10 @@ version_check_re = re.compile(r'^[\*\.\+!_0-9a-z]+$')
 version_split_re = re.compile('([0-9]+|[*]+|[^0-9*]+)')
 version_cache = {}
 
+# parsed VersionSpec objects, interned by their raw spec string; cleared when it grows too large
+VERSION_SPEC_CACHE_SIZE = 20000
+version_spec_cache = {}
+
 
 class VersionOrder(object):
     """
@@ -386,6 +390,18 @@ class VersionSpec(object):
     def __new__(cls, spec):
         if isinstance(spec, cls):
             return spec
+        if isinstance(spec, string_types):
+            self = version_spec_cache.get(spec)
+            if self is None:
+                self = cls._parse(spec)
+                if len(version_spec_cache) >= VERSION_SPEC_CACHE_SIZE:
+                    version_spec_cache.clear()
+                version_spec_cache[spec] = self
+            return self
+        return cls._parse(spec)
+
+    @classmethod
+    def _parse(cls, spec):
         if isinstance(spec, string_types) and regex_split_re.match(spec):
             spec = treeify(spec)
         if isinstance(spec, tuple):
@@ -1,6 +1,10 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from hashlib import sha256
+import json
 import logging
+from os import getpid, rename, unlink
+from os.path import dirname, join
 
 from .base.constants import DEFAULTS_CHANNEL_NAME, MAX_CHANNEL_PRIORITY
 from .base.context import context
@@ -8,7 +12,7 @@ from .common.compat import iteritems, iterkeys, itervalues, string_types
 from .common.toposort import toposort
 from .console import setup_handlers
 from .exceptions import NoPackagesFoundError, UnsatisfiableError
-from .logic import Clauses, minimal_unsatisfiable_subset
+from .logic import Clauses, ProbePool, SolveBudget, minimal_unsatisfiable_subset
 from .models.dist import Dist
 from .models.match_spec import MatchSpec
 from .models.version import normalized_version
@@ -24,33 +28,209 @@ setup_handlers()
 Unsatisfiable = UnsatisfiableError
 NoPackagesFound = NoPackagesFoundError
 
+CONFLICT_CACHE_VERSION = 1
+CONFLICT_CACHE_DIR = 'conflicts'
+
+# dependency match tables computed when repodata is refreshed, and persisted with it
+depends_match_tables = {}  # Dict[channel_url, Tuple[Dict[Dist, IndexRecord], Dict[str, Set]]]
+
 
 def dashlist(iter):
     return ''.join('\n  - ' + str(x) for x in iter)
 
 
+def compute_depends_matches(packages):
+    """Match every named dependency of a channel's packages against that channel.
+
+    Args:
+        packages: a dictionary of (Dist, IndexRecord) pairs for a single channel.
+
+    Returns:
+        A dictionary mapping the string form of each dependency MatchSpec to the
+        frozenset of Dists in packages that it matches.
+    """
+    groups = {}
+    for dist, rec in iteritems(packages):
+        groups.setdefault(rec.name, []).append(dist)
+    table = {}
+    for rec in itervalues(packages):
+        for ms in rec.combined_depends:
+            key = str(ms)
+            if key not in table and ms.exact_field('name'):
+                table[key] = frozenset(dist for dist in groups.get(ms.name, ())
+                                       if ms.match(packages[dist]))
+    return table
+
+
+def register_depends_matches(channel_url, packages, table):
+    # makes a table from compute_depends_matches available to Resolve objects
+    # created afterward; it is only used for records identical to those in packages
+    if table is None:
+        depends_match_tables.pop(channel_url, None)
+    else:
+        depends_match_tables[channel_url] = packages, table
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def iter_bits(bits):
+    # yields the positions of the set bits of an integer bitmap, lowest first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def get_conflict_cache_path(key):
+    from .core.repodata import create_cache_dir
+    return join(create_cache_dir(), CONFLICT_CACHE_DIR, key + '.json')
+
+
+def read_cached_conflicts(key):
+    # returns the cached bad_deps argument of UnsatisfiableError, or None
+    try:
+        with open(get_conflict_cache_path(key)) as fh:
+            cached = json.load(fh)
+        if cached['version'] == CONFLICT_CACHE_VERSION:
+            return cached['bad_deps']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cached_conflicts(key, bad_deps):
+    from .gateways.disk import mkdir_p
+    path = get_conflict_cache_path(key)
+    temp_path = '%s.%s' % (path, getpid())
+    try:
+        mkdir_p(dirname(path))
+        with open(temp_path, 'w') as fh:
+            json.dump({
+                'version': CONFLICT_CACHE_VERSION,
+                'bad_deps': [[str(MatchSpec(ms, target=None)) for ms in dep]
+                             for dep in bad_deps],
+            }, fh)
+        rename(temp_path, path)
+    except (IOError, OSError) as e:
+        log.debug("unable to cache conflict explanation %s\n%r", path, e)
+        try:
+            unlink(temp_path)
+        except (IOError, OSError):
+            pass
+
+
 class Resolve(object):
 
     def __init__(self, index, sort=False, processed=False):
+        # A Resolve object can be kept around for any number of solves. If the index
+        # changes, either go through update_index, or call reindex afterward.
         self.index = index
+        self.sort = sort
+        self.reindex()
 
+    def reindex(self):
+        """Rebuild all lookup tables and drop all cached results, e.g. after
+        self.index was modified directly."""
+        index = self.index
         groups = {}
         trackers = {}
+        dist_ids = {}
 
         for dist, info in iteritems(index):
+            dist_ids[dist] = len(dist_ids)
             groups.setdefault(info['name'], []).append(dist)
             for feat in info.get('track_features', '').split():
                 trackers.setdefault(feat, []).append(dist)
 
         self.groups = groups  # Dict[package_name, List[Dist]]
         self.trackers = trackers  # Dict[track_feature, List[Dist]]
-        self.find_matches_ = {}  # Dict[MatchSpec, List[Dist]]
-        self.ms_depends_ = {}  # Dict[Dist, List[MatchSpec]]
 
-        if sort:
+        # dense integer ids for bitmap-based set operations; bit i of a bitmap is dists[i]
+        self.dist_ids = dist_ids  # Dict[Dist, int]
+        self.dists = sorted(dist_ids, key=dist_ids.get)  # List[Dist]
+
+        depends_tables = {}
+        for packages, table in itervalues(depends_match_tables):
+            for dist, rec in iteritems(packages):
+                if index.get(dist) is rec:
+                    depends_tables[dist] = table
+        self.depends_tables = depends_tables  # Dict[Dist, Dict[str, Set[Dist]]]
+
+        self.invalidate()
+
+        if self.sort:
             for name, group in iteritems(groups):
                 groups[name] = sorted(group, key=self.version_key, reverse=True)
 
+    def invalidate(self, names=None):
+        """Drop the cached results about the packages with the given names, or
+        about all packages if names is None."""
+        if names is None:
+            self.find_matches_ = {}  # Dict[MatchSpec, List[Dist]]
+            self.ms_depends_ = {}  # Dict[Dist, List[MatchSpec]]
+            self.group_bits_ = {}  # Dict[package_name, int]
+            self.match_bits_ = {}  # Dict[MatchSpec, int]
+            self.group_depends_ = {}  # Dict[package_name, List[Tuple[MatchSpec, int]]]
+            return
+        names = set(names)
+        for cache in (self.find_matches_, self.match_bits_):
+            for ms in [ms for ms in cache if ms.name in names or not ms.exact_field('name')]:
+                del cache[ms]
+        for dist in [dist for dist in self.ms_depends_ if dist.name in names]:
+            del self.ms_depends_[dist]
+        for name in names:
+            self.group_bits_.pop(name, None)
+            self.group_depends_.pop(name, None)
+
+    def update_index(self, records):
+        """Add, replace or remove records in the index, updating the lookup tables
+        and invalidating only the cached results affected by the change.
+
+        Args:
+            records: a dictionary of (Dist, IndexRecord) pairs; a record of None
+                removes that Dist from the index.
+
+        Returns:
+            A dictionary of the same form that undoes the update when passed back
+            to update_index.
+        """
+        index = self.index
+        undo = {}
+        names = set()
+        for dist, rec in iteritems(records):
+            old_rec = undo[dist] = index.get(dist)
+            self.ms_depends_.pop(dist, None)
+            if old_rec is not None:
+                names.add(old_rec['name'])
+                self.groups[old_rec['name']].remove(dist)
+                for feat in old_rec.get('track_features', '').split():
+                    self.trackers[feat].remove(dist)
+                self.depends_tables.pop(dist, None)
+                del index[dist]
+            if rec is not None:
+                names.add(rec['name'])
+                index[dist] = rec
+                if dist not in self.dist_ids:
+                    self.dist_ids[dist] = len(self.dists)
+                    self.dists.append(dist)
+                self.groups.setdefault(rec['name'], []).append(dist)
+                for feat in rec.get('track_features', '').split():
+                    self.trackers.setdefault(feat, []).append(dist)
+                for packages, table in itervalues(depends_match_tables):
+                    if packages.get(dist) is rec:
+                        self.depends_tables[dist] = table
+        for name in names:
+            if not self.groups[name]:
+                del self.groups[name]
+            elif self.sort:
+                self.groups[name].sort(key=self.version_key, reverse=True)
+        for feat in [feat for feat, dists in iteritems(self.trackers) if not dists]:
+            del self.trackers[feat]
+        self.invalidate(names)
+        return undo
+
     @property
     def installed(self):
         # type: () -> Set[Dist]
@@ -175,7 +355,8 @@ class Resolve(object):
             It is assumed that the specs conflict.
 
         Returns:
-            Nothing, because it always raises an UnsatisfiableError.
+            Nothing, because it always raises an UnsatisfiableError, with the
+            dependency chains found by get_conflict_chains.
 
         Strategy:
             If we're here, we know that the specs conflict. This could be because:
@@ -194,6 +375,11 @@ class Resolve(object):
             above) that all of the specs depend on *but in different ways*. We
             then identify the dependency chains that lead to those packages.
         """
+        raise UnsatisfiableError(self.get_conflict_chains(specs))
+
+    def get_conflict_chains(self, specs):
+        """Return the dependency chains that explain the conflict between specs,
+        as described for find_conflicts."""
         sdeps = {}
         # For each spec, assemble a dictionary of dependencies, with package
         # name as key, and all of the matching packages as values.
@@ -232,31 +418,65 @@ class Resolve(object):
             else:
                 # This means the package *itself* was the common conflict.
                 bad_deps.append((ms,))
+        return bad_deps
+
+    def conflict_cache_key(self, specs):
+        """A key for the explanation of a conflict between specs, which changes
+        whenever the specs or any package in the index change."""
+        h = sha256()
+        h.update(json.dumps([CONFLICT_CACHE_VERSION,
+                             [(str(ms), ms.target, ms.optional) for ms in specs]]).encode('utf-8'))
+        for line in sorted('%s %s\n' % (dist.full_name, rec.get('md5', ''))
+                           for dist, rec in iteritems(self.index)):
+            h.update(line.encode('utf-8'))
+        return h.hexdigest()
+
+    def explain_conflicts(self, specs, sat):
+        # raises an UnsatisfiableError for specs, for which sat(specs) is False
+        if not context.explain_conflicts:
+            raise UnsatisfiableError([specs], chains=False)
+        key = self.conflict_cache_key(specs)
+        bad_deps = read_cached_conflicts(key)
+        if bad_deps is not None:
+            log.debug('Using cached conflict explanation %s', key)
+        else:
+            specs = minimal_unsatisfiable_subset(specs, sat=sat,
+                                                 processes=context.solver_processes)
+            bad_deps = self.get_conflict_chains(specs)
+            write_cached_conflicts(key, bad_deps)
         raise UnsatisfiableError(bad_deps)
 
     def get_reduced_index(self, specs):
         log.debug('Retrieving packages for: %s', specs)
 
         specs, features = self.verify_specs(specs)
-        filter = self.default_filter(features)
         snames = set()
 
+        # The pruning state is kept as bitmaps over self.dists: 'visited' holds every
+        # package that has been tested, and 'valid' every package not (yet) pruned.
+        def reset_state():
+            filter = self.default_filter(features)
+            state['visited'] = self.bits(filter)
+            state['valid'] = self.all_bits & ~self.bits(k for k, v in iteritems(filter) if not v)
+        state = {}
+        reset_state()
+
         def filter_group(matches):
             match1 = next(ms for ms in matches)
             name = match1.name
-            group = self.groups.get(name, [])
+            group = self.group_bits(name)
 
             # Prune packages that don't match any of the patterns
             # or which have unsatisfiable dependencies
-            nold = nnew = 0
-            for fkey in group:
-                if filter.setdefault(fkey, True):
-                    nold += 1
-                    sat = (self.match_any(matches, fkey) and
-                           all(any(filter.get(f2, True) for f2 in self.find_matches(ms))
-                               for ms in self.ms_depends(fkey)))
-                    filter[fkey] = sat
-                    nnew += sat
+            state['visited'] |= group
+            active = group & state['valid']
+            keep = active & self.match_bits_any(matches)
+            state['valid'] &= ~active | keep
+            for ms, users in self.group_depends(name):
+                if users & keep and not self.match_bits(ms) & state['valid']:
+                    state['valid'] &= ~(users & keep)
+                    keep &= ~users
+            nold, nnew = popcount(active), popcount(keep)
 
             reduced = nnew < nold
             if reduced:
@@ -275,14 +495,15 @@ class Resolve(object):
             if reduced or name not in snames:
                 snames.add(name)
                 cdeps = {}
-                for fkey in group:
-                    if filter.get(fkey, True):
-                        for m2 in self.ms_depends(fkey):
-                            if m2.exact_field('name') and not m2.optional:
-                                cdeps.setdefault(m2.name, []).append(m2)
-                for deps in itervalues(cdeps):
-                    if len(deps) >= nnew:
-                        res = filter_group(set(deps))
+                for m2, users in self.group_depends(name):
+                    nusers = popcount(users & keep)
+                    if nusers and m2.exact_field('name') and not m2.optional:
+                        deps = cdeps.setdefault(m2.name, [set(), 0])
+                        deps[0].add(m2)
+                        deps[1] += nusers
+                for deps, ndeps in itervalues(cdeps):
+                    if ndeps >= nnew:
+                        res = filter_group(deps)
                         if res:
                             reduced = True
                         elif res is None:
@@ -308,9 +529,12 @@ class Resolve(object):
                 elif found is None:
                     break
             if found is None:
-                filter = self.default_filter(features)
+                reset_state()
                 break
 
+        dists, valid = self.dists, state['valid']
+        filter = {dists[i]: bool(valid >> i & 1) for i in iter_bits(state['visited'])}
+
         # Determine all valid packages in the dependency graph
         reduced_index = {}
         slist = list(specs)
@@ -335,6 +559,60 @@ class Resolve(object):
                             slist.append(ms)
         return reduced_index
 
+    @property
+    def all_bits(self):
+        return (1 << len(self.dists)) - 1
+
+    def bits(self, dists):
+        # type: (Iterable[Dist]) -> int
+        dist_ids = self.dist_ids
+        bits = 0
+        for dist in dists:
+            i = dist_ids.get(dist)
+            if i is not None:
+                bits |= 1 << i
+        return bits
+
+    def group_bits(self, name):
+        # type: (str) -> int
+        res = self.group_bits_.get(name)
+        if res is None:
+            res = self.group_bits_[name] = self.bits(self.groups.get(name, ()))
+        return res
+
+    def match_bits(self, ms):
+        # type: (MatchSpec) -> int
+        # the bitmap of find_matches(ms)
+        res = self.match_bits_.get(ms)
+        if res is None:
+            res = self.match_bits_[ms] = self.bits(self.find_matches(ms))
+        return res
+
+    def match_bits_any(self, mss):
+        bits = 0
+        for ms in mss:
+            bits |= self.match_bits(ms)
+        return bits
+
+    def group_depends(self, name):
+        # type: (str) -> List[Tuple[MatchSpec, int]]
+        # each distinct dependency of the packages named `name`, paired with
+        # the bitmap of the packages that have it
+        res = self.group_depends_.get(name)
+        if res is None:
+            users = {}
+            res = []
+            for dist in self.groups.get(name, ()):
+                bit = 1 << self.dist_ids[dist]
+                for ms in self.ms_depends(dist):
+                    if ms in users:
+                        res[users[ms]][1] |= bit
+                    else:
+                        users[ms] = len(res)
+                        res.append([ms, bit])
+            res = self.group_depends_[name] = [tuple(x) for x in res]
+        return res
+
     def match_any(self, mss, dist):
         rec = self.index[dist]
         return any(ms.match(rec) for ms in mss)
@@ -355,11 +633,28 @@ class Resolve(object):
                 res = self.trackers.get(ms.exact_field('track_features'))
             else:
                 res = self.index.keys()
-            res = [p for p in res if self.match(ms, p)]
+            if self.depends_tables:
+                res = self.match_with_tables(ms, res)
+            else:
+                res = [p for p in res if self.match(ms, p)]
             assert all(isinstance(d, Dist) for d in res)
             self.find_matches_[ms] = res
         return res
 
+    def match_with_tables(self, ms, dists):
+        # type: (MatchSpec, Iterable[Dist]) -> List[Dist]
+        # filters dists like find_matches, but looks up packages covered by a
+        # precomputed dependency match table instead of matching them against ms
+        key = str(ms)
+        depends_tables = self.depends_tables
+        res = []
+        for dist in dists:
+            table = depends_tables.get(dist)
+            matches = None if table is None else table.get(key)
+            if dist in matches if matches is not None else self.match(ms, dist):
+                res.append(dist)
+        return res
+
     def ms_depends(self, dist):
         # type: (Dist) -> List[MatchSpec]
         deps = self.ms_depends_.get(dist)
@@ -468,7 +763,7 @@ class Resolve(object):
         return name
 
     def gen_clauses(self):
-        C = Clauses()
+        C = Clauses(sat_solver=context.sat_solver)
         for name, group in iteritems(self.groups):
             group = [dist.full_name for dist in group]
             # Create one variable for each package
@@ -729,11 +1024,54 @@ class Resolve(object):
         self.restore_bad(pkgs, preserve)
         return pkgs
 
+    def find_alternate_solutions(self, C, psolution, clean, max_solutions):
+        # Returns a list of psolution followed by up to max_solutions - 1 other solutions
+        # of C, and the number of solutions found, which is max_solutions + 1 if there
+        # are more than max_solutions.
+        pool = ProbePool.create(lambda constraints: clean(C.sat(constraints) or ()),
+                                context.solver_processes)
+        if pool is None:
+            psolutions = [psolution]
+            while True:
+                nclause = tuple(C.Not(C.from_name(q)) for q in psolution)
+                solution = C.sat((nclause,), True)
+                if solution is None:
+                    break
+                if len(psolutions) == max_solutions:
+                    log.debug('Too many solutions; terminating')
+                    return psolutions, max_solutions + 1
+                psolution = clean(solution)
+                psolutions.append(psolution)
+            return psolutions, len(psolutions)
+
+        # Every other solution lacks at least one package of psolution. Split that
+        # condition into disjoint probes, one per worker: probe k requires that the
+        # first missing package lies in chunk k. Repeat, excluding all solutions
+        # found so far, until a round finds nothing new.
+        with pool:
+            nchunks = min(pool.processes, len(psolution))
+            bounds = [len(psolution) * k // nchunks for k in range(nchunks + 1)]
+            psolutions = [psolution]
+            while len(psolutions) <= max_solutions:
+                exclude = [tuple('!' + q for q in sol) for sol in psolutions]
+                probes = [(exclude + [(q,) for q in psolution[:lo]]
+                           + [tuple('!' + q for q in psolution[lo:hi])],)
+                          for lo, hi in zip(bounds, bounds[1:])]
+                found = [sol for sol in pool.map(probes) if sol]
+                if not found:
+                    break
+                psolutions.extend(found)
+            if len(psolutions) > max_solutions:
+                log.debug('Too many solutions; terminating')
+                return psolutions[:max_solutions], max_solutions + 1
+            return psolutions, len(psolutions)
+
     def solve(self, specs, returnall=False):
         # type: (List[str], bool) -> List[Dist]
         try:
             stdoutlog.info("Solving package specifications: ")
             log.debug("Solving for %s", specs)
+            budget = SolveBudget(context.solver_timeout_secs, context.solver_prop_limit)
 
             # Find the compliant packages
             len0 = len(specs)
@@ -751,9 +1089,9 @@ class Resolve(object):
             r2 = Resolve(reduced_index, True, True)
             C = r2.gen_clauses()
             solution = mysat(specs, True)
+            C.budget = budget
             if not solution:
-                specs = minimal_unsatisfiable_subset(specs, sat=mysat)
-                self.find_conflicts(specs)
+                self.explain_conflicts(specs, mysat)
 
             speco = []  # optional packages
             specr = []  # requested packages
@@ -770,66 +1108,71 @@ class Resolve(object):
                     speca.append(s)
             speca.extend(MatchSpec(s) for s in specm)
 
+            # Each objective is reported as it is minimized. Once the solver budget
+            # is exhausted, the remaining objectives keep the current solution.
+            unoptimized = []
+
+            def progress(metric, value):
+                log.debug('%s: %d', metric, value)
+                dotlog.debug('%s: %d' % (metric, value))
+                if budget.exhausted:
+                    unoptimized.append(metric)
+
             # Removed packages: minimize count
             eq_optional_c = r2.generate_removal_count(C, speco)
             solution, obj7 = C.minimize(eq_optional_c, solution)
-            log.debug('Package removal metric: %d', obj7)
+            progress('Package removal metric', obj7)
 
             # Requested packages: maximize versions
             eq_req_v, eq_req_b = r2.generate_version_metrics(C, specr)
             solution, obj3 = C.minimize(eq_req_v, solution)
-            log.debug('Initial package version metric: %d', obj3)
+            progress('Initial package version metric', obj3)
 
             # Track features: minimize feature count
             eq_feature_count = r2.generate_feature_count(C)
             solution, obj1 = C.minimize(eq_feature_count, solution)
-            log.debug('Track feature count: %d', obj1)
+            progress('Track feature count', obj1)
 
             # Featured packages: maximize featured package count
             eq_feature_metric, ftotal = r2.generate_feature_metric(C)
             solution, obj2 = C.minimize(eq_feature_metric, solution)
             obj2 = ftotal - obj2
-            log.debug('Package feature count: %d', obj2)
+            progress('Package feature count', obj2)
 
             # Requested packages: maximize builds
             solution, obj4 = C.minimize(eq_req_b, solution)
-            log.debug('Initial package build metric: %d', obj4)
+            progress('Initial package build metric', obj4)
 
             # Dependencies: minimize the number of packages that need upgrading
             eq_u = r2.generate_update_count(C, speca)
             solution, obj50 = C.minimize(eq_u, solution)
-            log.debug('Dependency update count: %d', obj50)
+            progress('Dependency update count', obj50)
 
             # Remaining packages: maximize versions, then builds
             eq_v, eq_b = r2.generate_version_metrics(C, speca)
             solution, obj5 = C.minimize(eq_v, solution)
+            progress('Additional package version metric', obj5)
             solution, obj6 = C.minimize(eq_b, solution)
-            log.debug('Additional package version/build metrics: %d/%d', obj5, obj6)
+            progress('Additional package build metric', obj6)
 
             # Prune unnecessary packages
             eq_c = r2.generate_package_count(C, specm)
             solution, obj7 = C.minimize(eq_c, solution, trymax=True)
-            log.debug('Weak dependency count: %d', obj7)
+            progress('Weak dependency count', obj7)
+
+            if unoptimized:
+                stdoutlog.info('\nWarning: the solver budget was exhausted; the solution '
+                               'found may not be optimal for:%s' % dashlist(unoptimized))
 
             def clean(sol):
                 return [q for q in (C.from_index(s) for s in sol)
                         if q and q[0] != '!' and '@' not in q]
-            log.debug('Looking for alternate solutions')
-            nsol = 1
-            psolutions = []
             psolution = clean(solution)
-            psolutions.append(psolution)
-            while True:
-                nclause = tuple(C.Not(C.from_name(q)) for q in psolution)
-                solution = C.sat((nclause,), True)
-                if solution is None:
-                    break
-                nsol += 1
-                if nsol > 10:
-                    log.debug('Too many solutions; terminating')
-                    break
-                psolution = clean(solution)
-                psolutions.append(psolution)
+            if budget.expired():
+                psolutions, nsol = [psolution], 1
+            else:
+                log.debug('Looking for alternate solutions')
+                psolutions, nsol = self.find_alternate_solutions(C, psolution, clean, 10)
 
             if nsol > 1:
                 psols2 = list(map(set, psolutions))
@@ -2,9 +2,11 @@ from __future__ import absolute_import, print_function
 
 import os
 from collections import OrderedDict
+from conda.base.constants import ROOT_ENV_NAME
 from conda.base.context import context
 from conda.cli import common  # TODO: this should never have to import form conda.cli
-from conda.core.linked_data import linked
+from conda.core.envs_manager import list_all_known_prefixes
+from conda.core.linked_data import linked, load_linked_data_concurrently
 from copy import copy
 from itertools import chain
 
@@ -63,6 +65,27 @@ def from_environment(name, prefix, no_builds=False, ignore_channels=False):
     return Environment(name=name, dependencies=dependencies, channels=channels, prefix=prefix)
 
 
+def from_environments(prefixes=None, no_builds=False, ignore_channels=False):
+    """
+        Get environment objects for many prefixes in one process
+    Args:
+        prefixes: The paths of the prefixes; every environment conda knows about by default
+        no_builds: Whether has build requirement
+        ignore_channels: whether ignore_channels
+
+    Returns:     a generator of Environment objects, in the order of prefixes. The conda-meta
+                 of the prefixes that follow is loaded in parallel while each one is built.
+    """
+    if prefixes is None:
+        prefixes = list_all_known_prefixes()
+    for prefix, _, error in load_linked_data_concurrently(prefixes, ignore_channels):
+        if error is not None:
+            raise error
+        name = ROOT_ENV_NAME if prefix == context.root_prefix else os.path.basename(prefix)
+        yield from_environment(name, prefix, no_builds=no_builds,
+                               ignore_channels=ignore_channels)
+
+
 def from_yaml(yamlstr, **kwargs):
     """Load and return a ``Environment`` from a given ``yaml string``"""
     data = yaml.load(yamlstr)
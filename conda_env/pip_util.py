@@ -9,6 +9,11 @@ import re
 import subprocess
 import sys
 
+from conda.common.compat import itervalues
+from conda.core.linked_data import linked_data
+from conda.egg_info import find_site_packages_dirs, scan_site_packages
+from conda.misc import rel_path
+
 
 def pip_args(prefix):
     """
@@ -36,6 +41,11 @@ def pip_args(prefix):
         return None
 
 
+def safe_name(name):
+    # the project name pip reports for a distribution, as in pkg_resources.safe_name
+    return re.sub('[^A-Za-z0-9.]+', '-', name)
+
+
 class PipPackage(dict):
     def __str__(self):
         if 'path' in self:
@@ -47,67 +57,51 @@ class PipPackage(dict):
         return '%s-%s-<pip>' % (self['name'], self['version'])
 
 
-def installed(prefix, output=True):
-    args = pip_args(prefix)
-    if args is None:
-        return
-    args.append('list')
-    try:
-        pipinst = subprocess.check_output(
-            args, universal_newlines=True
-        ).splitlines()
-    except Exception:
-        # Any error should just be ignored
-        if output:
-            print("# Warning: subprocess call to pip failed")
-        return
-
-    # For every package in pipinst that is not already represented
-    # in installed append a fake name to installed with 'pip'
-    # as the build string
-    pat = re.compile('([\w.-]+)\s+\((.+)\)')
-    for line in pipinst:
-        line = line.strip()
-        if not line:
-            continue
-        m = pat.match(line)
-        if m is None:
-            if output:
-                print('Could not extract name and version from: %r' % line)
-            continue
-        name, version = m.groups()
-        name = name.lower()
-        kwargs = {
-            'name': name,
-            'version': version,
-        }
-        if ', ' in version:
-            # Packages installed with setup.py develop will include a path in
-            # the version. They should be included here, even if they are
-            # installed with conda, as they are preferred over the conda
-            # version. We still include the conda version, though, because it
-            # is still installed.
-
-            version, path = version.split(', ')
-            # We do this because the code below uses rsplit('-', 2)
-            version = version.replace('-', ' ')
-            kwargs.update({
-                'path': path,
+def _installed(prefix):
+    # yield (owned_by_conda, PipPackage) for the python distributions installed in prefix
+    installed_pkgs = linked_data(prefix)
+    conda_files = set()
+    for info in itervalues(installed_pkgs):
+        conda_files.update(info.get('files', ()))
+
+    for sp_dir in find_site_packages_dirs(prefix, installed_pkgs):
+        for path, name, version, develop_path in scan_site_packages(sp_dir):
+            kwargs = {
+                'name': safe_name(name).lower(),
                 'version': version,
-            })
-        yield PipPackage(**kwargs)
+            }
+            if develop_path:
+                # Packages installed with setup.py develop should be included here, even
+                # if they are installed with conda, as they are preferred over the conda
+                # version. We still include the conda version, though, because it is
+                # still installed.
+                # The version's dashes are replaced because callers use rsplit('-', 2)
+                kwargs.update({
+                    'path': develop_path,
+                    'version': version.replace('-', ' '),
+                })
+            yield rel_path(prefix, path) in conda_files, PipPackage(**kwargs)
+
+
+def installed(prefix):
+    """
+    Yield a PipPackage for every python distribution installed in prefix, as `pip list` would
+    list it. The .egg-info and .dist-info metadata in site-packages is read directly, so pip
+    does not have to be run.
+    """
+    for _, pip_pkg in _installed(prefix):
+        yield pip_pkg
 
 
 def add_pip_installed(prefix, installed_pkgs, json=None, output=True):
-    # Defer to json for backwards compatibility
-    if isinstance(json, bool):
-        output = not json
+    # json and output are kept for backwards compatibility; pip is no longer run, so there
+    # is no output to show or hide
 
     # TODO Refactor so installed is a real list of objects/dicts
     #      instead of strings allowing for direct comparison
     # split :: to get rid of channel info
     conda_names = {d.quad[0] for d in installed_pkgs}
-    for pip_pkg in installed(prefix, output=output):
-        if pip_pkg['name'] in conda_names and 'path' not in pip_pkg:
+    for owned_by_conda, pip_pkg in _installed(prefix):
+        if (owned_by_conda or pip_pkg['name'] in conda_names) and 'path' not in pip_pkg:
             continue
         installed_pkgs.add(str(pip_pkg))
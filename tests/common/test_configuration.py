@@ -4,20 +4,26 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from conda.common.io import env_var
 
 from conda._vendor.auxlib.ish import dals
-from conda.common.compat import odict, string_types
+from conda.common.compat import odict, on_win, string_types
 from conda.common.configuration import (Configuration, MapParameter, ParameterFlag,
                                         PrimitiveParameter, SequenceParameter, YamlRawParameter,
                                         load_file_configs, MultiValidationError, InvalidTypeError,
                                         CustomValidationError)
 from conda.common.yaml import yaml_load
 from conda.common.configuration import ValidationError
-from os import environ, mkdir
-from os.path import join
+from os import environ, mkdir, stat
+from os.path import isfile, join
 from pytest import raises
 from shutil import rmtree
+from stat import S_IMODE
 from tempfile import mkdtemp
 from unittest import TestCase
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 
 test_yaml_raw = {
     'file1': dals("""
@@ -428,3 +434,83 @@ class ConfigurationTests(TestCase):
         config = SampleConfiguration()._set_raw_data(load_from_string_data('bad_boolean_map'))
         config.check_source('bad_boolean_map')
 
+
+
+class ConfigurationCacheTests(TestCase):
+
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.condarc = join(self.tempdir, '.condarc')
+        self.condarcd = join(self.tempdir, 'condarc.d')
+        mkdir(self.condarcd)
+        self.write(self.condarc, 'file3')
+        self.write(join(self.condarcd, 'file1.yml'), 'file1')
+        self.search_path = [self.condarc, join(self.tempdir, 'not_a_file'), self.condarcd]
+        self.cache_paths = (join(self.tempdir, 'not_a_dir', '.condarc_cache'),
+                            join(self.tempdir, '.condarc_cache'))
+
+    def tearDown(self):
+        rmtree(self.tempdir, ignore_errors=True)
+
+    @staticmethod
+    def write(path, test_yaml_key):
+        with open(path, 'wb') as fh:
+            fh.write(test_yaml_raw[test_yaml_key].encode('utf-8'))
+
+    def load(self):
+        return load_file_configs(self.search_path, self.cache_paths)
+
+    def test_cache_hit_skips_yaml(self):
+        raw_data = self.load()
+        assert isfile(self.cache_paths[1])
+        if not on_win:
+            assert S_IMODE(stat(self.cache_paths[1]).st_mode) == 0o600
+
+        with patch("conda.common.configuration.YamlRawParameter.make_raw_parameters_from_file"
+                   ) as make_raw_parameters_from_file:
+            cached_raw_data = self.load()
+            assert not make_raw_parameters_from_file.called
+
+        assert list(cached_raw_data) == list(raw_data) == [self.condarc,
+                                                           join(self.condarcd, 'file1.yml')]
+        for source in raw_data:
+            for key, raw_parameter in raw_data[source].items():
+                cached_parameter = cached_raw_data[source][key]
+                assert cached_parameter.value(None) == raw_parameter.value(None)
+                assert cached_parameter.keyflag() == raw_parameter.keyflag()
+                assert cached_parameter.valueflags(None) == raw_parameter.valueflags(None)
+
+        config = SampleConfiguration()._set_raw_data(raw_data)
+        cached_config = SampleConfiguration()._set_raw_data(cached_raw_data)
+        assert cached_config.always_yes is config.always_yes is True
+        assert cached_config.channels == config.channels
+        assert cached_config.proxy_servers == config.proxy_servers
+
+    def test_changed_file_invalidates_cache(self):
+        self.load()
+        self.write(join(self.condarcd, 'file2.yml'), 'file2')
+        raw_data = self.load()
+        assert raw_data[join(self.condarcd, 'file2.yml')]['changeps1'].value(None) == 'no'
+
+        self.write(self.condarc, 'file4')
+        raw_data = self.load()
+        assert raw_data[self.condarc]['channels'].keyflag() is ParameterFlag.final
+
+    def test_corrupt_cache_ignored(self):
+        self.load()
+        with open(self.cache_paths[1], 'wb') as fh:
+            fh.write(b'not marshal data')
+        raw_data = self.load()
+        assert raw_data[self.condarc]['channels'].value(None) == ('wile', 'daffy', 'foghorn')
+
+    def test_cache_shared_between_search_paths(self):
+        self.load()
+        other_condarc = join(self.tempdir, 'other_condarc')
+        self.write(other_condarc, 'file5')
+        load_file_configs([other_condarc], self.cache_paths)
+
+        with patch("conda.common.configuration.YamlRawParameter.make_raw_parameters_from_file"
+                   ) as make_raw_parameters_from_file:
+            self.load()
+            load_file_configs([other_condarc], self.cache_paths)
+            assert not make_raw_parameters_from_file.called
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from conda.common.io import attach_stderr_handler, captured
+from conda.base.context import reset_context
+from conda.common.io import attach_stderr_handler, captured, concurrent_map, env_var
 from logging import DEBUG, NOTSET, WARN, getLogger
+from threading import current_thread
 
 
 def test_attach_stderr_handler():
@@ -42,3 +44,18 @@ def test_attach_stderr_handler():
     assert debug_message in c.stderr
 
 
+
+
+def test_concurrent_map():
+    def square(n):
+        return n * n, current_thread().name
+
+    with env_var('CONDA_CONCURRENT', 'false', reset_context):
+        results = list(concurrent_map(square, range(5), 3))
+    assert [n for n, _ in results] == [0, 1, 4, 9, 16]
+    assert set(name for _, name in results) == {current_thread().name}
+
+    with env_var('CONDA_CONCURRENT', 'true', reset_context):
+        results = list(concurrent_map(square, range(5), 3))
+    assert [n for n, _ in results] == [0, 1, 4, 9, 16]
+    assert current_thread().name not in set(name for _, name in results)
@@ -0,0 +1,67 @@
+import json
+import os
+from os.path import join
+from tempfile import mkdtemp
+import unittest
+
+from conda.core.linked_data import delete_prefix_from_linked_data
+from conda.gateways.disk.delete import rm_rf
+from conda_env.pip_util import add_pip_installed, installed
+
+
+def write_file(path, content):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fh:
+        fh.write(content)
+
+
+class installed_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.prefix = mkdtemp()
+        self.develop_dir = mkdtemp()
+        self.sp_dir = join(self.prefix, 'lib', 'python3.6', 'site-packages')
+        write_file(join(self.sp_dir, 'typing_extensions-4.1.1.dist-info', 'METADATA'),
+                   'Metadata-Version: 2.1\nName: typing_extensions\nVersion: 4.1.1\n')
+        write_file(join(self.sp_dir, 'six-1.10.0-py3.6.egg-info'),
+                   'Metadata-Version: 1.1\nName: six\nVersion: 1.10.0\n')
+        write_file(join(self.develop_dir, 'spam.egg-info', 'PKG-INFO'),
+                   'Metadata-Version: 1.1\nName: spam\nVersion: 0.1-dev\n')
+        write_file(join(self.sp_dir, 'spam.egg-link'), self.develop_dir + '\n.')
+
+    def tearDown(self):
+        delete_prefix_from_linked_data(self.prefix)
+        rm_rf(self.prefix)
+        rm_rf(self.develop_dir)
+
+    def test_reads_metadata(self):
+        assert sorted(map(str, installed(self.prefix))) == [
+            'six-1.10.0-<pip>',
+            'spam (%s)-0.1 dev-<pip>' % self.develop_dir,
+            'typing-extensions-4.1.1-<pip>',
+        ]
+
+    def test_rescans_changed_site_packages(self):
+        assert len(list(installed(self.prefix))) == 3
+        rm_rf(join(self.sp_dir, 'six-1.10.0-py3.6.egg-info'))
+        assert 'six-1.10.0-<pip>' not in map(str, installed(self.prefix))
+
+    def test_missing_develop_dir(self):
+        rm_rf(self.develop_dir)
+        assert sorted(map(str, installed(self.prefix))) == [
+            'six-1.10.0-<pip>',
+            'typing-extensions-4.1.1-<pip>',
+        ]
+
+    def test_add_pip_installed_skips_conda_packages(self):
+        # the metadata belongs to a conda package, even though the names differ
+        write_file(join(self.prefix, 'conda-meta', 'python-six-1.10.0-py36_0.json'), json.dumps({
+            'name': 'python-six', 'version': '1.10.0', 'build': 'py36_0', 'build_number': 0,
+            'files': ['lib/python3.6/site-packages/six-1.10.0-py3.6.egg-info'],
+        }))
+        installed_pkgs = set()
+        add_pip_installed(self.prefix, installed_pkgs, json=True)
+        assert sorted(installed_pkgs) == [
+            'spam (%s)-0.1 dev-<pip>' % self.develop_dir,
+            'typing-extensions-4.1.1-<pip>',
+        ]
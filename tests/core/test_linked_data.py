@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+from logging import getLogger
+import os
+from os.path import isfile, join
+from tempfile import gettempdir
+from threading import Thread
+import time
+from unittest import TestCase
+from uuid import uuid4
+
+from conda.base.context import reset_context
+from conda.common.io import env_var
+from conda.core.linked_data import (LINKED_DATA_SNAPSHOT_FN, delete_prefix_from_linked_data,
+                                    iter_linked_records, linked_data, linked_data_,
+                                    linked_data_lock)
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.delete import rm_rf
+from conda.models.dist import Dist
+import pytest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+log = getLogger(__name__)
+
+
+def make_record(name, version, build='0'):
+    return {
+        'name': name,
+        'version': version,
+        'build': build,
+        'build_number': 0,
+        'channel': 'https://repo.continuum.io/pkgs/free/linux-64',
+        'fn': '%s-%s-%s.tar.bz2' % (name, version, build),
+        'depends': [],
+    }
+
+
+class LinkedDataSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.prefix = join(gettempdir(), str(uuid4())[:8])
+        self.meta_dir = join(self.prefix, 'conda-meta')
+        mkdir_p(self.meta_dir)
+        self.write_record(make_record('zlib', '1.2.8'))
+        self.write_record(make_record('python', '3.6.1'))
+
+    def tearDown(self):
+        delete_prefix_from_linked_data(self.prefix)
+        rm_rf(self.prefix)
+
+    def write_record(self, record):
+        with open(join(self.meta_dir, record['fn'][:-8] + '.json'), 'w') as fh:
+            json.dump(record, fh)
+
+    def reload(self):
+        delete_prefix_from_linked_data(self.prefix)
+        return linked_data(self.prefix)
+
+    def test_snapshot_written_and_reused(self):
+        recs = linked_data(self.prefix)
+        assert isfile(join(self.meta_dir, LINKED_DATA_SNAPSHOT_FN))
+        assert set(rec.name for rec in recs.values()) == {'zlib', 'python'}
+
+        delete_prefix_from_linked_data(self.prefix)
+        with patch("conda.core.linked_data.load_linked_data") as load_linked_data:
+            snapshot_recs = linked_data(self.prefix)
+            assert not load_linked_data.called
+        assert snapshot_recs == recs
+        assert snapshot_recs[Dist('defaults::zlib-1.2.8-0')].schannel == 'defaults'
+
+    def test_snapshot_invalidated_by_meta_changes(self):
+        linked_data(self.prefix)
+
+        self.write_record(make_record('numpy', '1.12.1', 'py36_0'))
+        recs = self.reload()
+        assert set(rec.name for rec in recs.values()) == {'zlib', 'python', 'numpy'}
+
+        rm_rf(join(self.meta_dir, 'zlib-1.2.8-0.json'))
+        recs = self.reload()
+        assert set(rec.name for rec in recs.values()) == {'python', 'numpy'}
+
+    def test_snapshot_invalidated_by_channel_settings(self):
+        assert Dist('defaults::zlib-1.2.8-0') in linked_data(self.prefix)
+
+        with env_var('CONDA_DEFAULT_CHANNELS', 'https://example.com/pkgs/main', reset_context):
+            recs = self.reload()
+            assert Dist('defaults::zlib-1.2.8-0') not in recs
+            assert set(rec.schannel for rec in recs.values()) == {
+                'https://repo.continuum.io/pkgs/free'}
+
+    def test_corrupt_snapshot_ignored(self):
+        linked_data(self.prefix)
+        with open(join(self.meta_dir, LINKED_DATA_SNAPSHOT_FN), 'wb') as fh:
+            fh.write(b'not a pickle')
+        recs = self.reload()
+        assert set(rec.name for rec in recs.values()) == {'zlib', 'python'}
+
+    def test_iter_linked_records(self):
+        self.write_record(make_record('python-dateutil', '2.6.0', 'py36_0'))
+        with open(join(self.meta_dir, 'bogus-1.0-0.json'), 'w') as fh:
+            json.dump(make_record('other', '1.0'), fh)
+
+        recs = list(iter_linked_records(self.prefix))
+        assert self.prefix not in linked_data_
+        assert [rec['name'] for rec in recs] == ['python', 'python-dateutil', 'zlib']
+        assert recs[2]['url'] == ('https://repo.continuum.io/pkgs/free/linux-64/'
+                                  'zlib-1.2.8-0.tar.bz2')
+
+        assert all(isinstance(rec, dict) for rec in recs)
+
+        # once loaded, the records are reused
+        loaded = sorted(linked_data(self.prefix).values(), key=lambda rec: rec.name)
+        with patch("conda.core.linked_data._read_meta_file") as read_meta_file:
+            loaded_recs = list(iter_linked_records(self.prefix))
+            assert not read_meta_file.called
+        assert loaded_recs == [rec.dump() for rec in loaded]
+        assert all(isinstance(rec, dict) for rec in loaded_recs)
+        assert [(rec['name'], rec['version'], rec['build'], rec['fn'], rec['url'])
+                for rec in loaded_recs] == [(rec['name'], rec['version'], rec['build'],
+                                             rec['fn'], rec['url']) for rec in recs]
+
+        # as are those of a snapshot
+        delete_prefix_from_linked_data(self.prefix)
+        with patch("conda.core.linked_data._read_meta_file") as read_meta_file:
+            assert list(iter_linked_records(self.prefix)) == loaded_recs
+            assert not read_meta_file.called
+
+    def test_reads_wait_for_transactions(self):
+        # a transaction in another process holds the lock exclusively
+        fcntl = pytest.importorskip('fcntl')
+        lock = linked_data_lock(self.prefix)
+        fd = os.open(lock.lock_file_path, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        reader = Thread(target=linked_data, args=(self.prefix,))
+        try:
+            reader.start()
+            time.sleep(0.3)
+            assert self.prefix not in linked_data_ or not linked_data_[self.prefix]
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        reader.join()
+        assert set(rec.name for rec in linked_data_[self.prefix].values()) == {'zlib', 'python'}
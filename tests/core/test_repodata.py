@@ -2,6 +2,8 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from logging import getLogger
+from subprocess import check_output
+import sys
 from unittest import TestCase
 
 import pytest
@@ -11,7 +13,9 @@ from conda.common.compat import iteritems
 from conda.common.disk import temporary_content_in_file
 from conda.common.io import env_var
 from conda.core.index import get_index
-from conda.core.repodata import Response304ContentUnchanged, cache_fn_url, read_mod_and_etag
+from conda.core.repodata import (Response304ContentUnchanged, cache_fn_url, get_pickle_path,
+                                 read_local_repodata, read_mod_and_etag)
+from conda.gateways.disk.delete import rm_rf
 
 try:
     from unittest.mock import patch
@@ -130,6 +134,30 @@ class StaticFunctionTests(TestCase):
             assert mod_etag_dict["_mod"] == "Sun, 17 Jan 2016 21:59:39 GMT"
             assert mod_etag_dict["_etag"] == "\"569c0ecb-48\""
 
+    def test_read_local_repodata_reused(self):
+        url = "https://repo.continuum.io/pkgs/free/noarch"
+        content = """
+        {
+          "info": {},
+          "packages": {
+            "foo-1.0-0.tar.bz2": {"name": "foo", "version": "1.0", "build": "0",
+                                  "build_number": 0, "depends": []}
+          }
+        }
+        """.strip()
+        with temporary_content_in_file(content, suffix='.json') as path:
+            try:
+                repodata = read_local_repodata(path, url, 'defaults', 1, '"569c0ecb-48"', None)
+                assert read_local_repodata(path, url, 'defaults', 2, '"569c0ecb-48"',
+                                           None) is repodata
+                assert int(repodata['_priority']) == 2
+
+                # a different etag means the cache file was replaced
+                assert read_local_repodata(path, url, 'defaults', 2, '"569c0ecb-49"',
+                                           None) is not repodata
+            finally:
+                rm_rf(get_pickle_path(path))
+
     def test_cache_fn_url(self):
         hash1 = cache_fn_url("http://repo.continuum.io/pkgs/free/osx-64/")
         hash2 = cache_fn_url("http://repo.continuum.io/pkgs/free/osx-64")
@@ -145,3 +173,9 @@ class StaticFunctionTests(TestCase):
         hash6 = cache_fn_url("https://repo.continuum.io/pkgs/r/osx-64")
         assert hash4 != hash6
 
+
+    def test_solver_not_imported(self):
+        # the solver is only imported once repodata has to be processed
+        code = ("import sys, conda.core.repodata; "
+                "print('conda.resolve' in sys.modules or 'conda.logic' in sys.modules)")
+        assert check_output([sys.executable, '-c', code]).strip() == b'False'
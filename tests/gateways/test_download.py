@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from contextlib import contextmanager
+import hashlib
+import json
+from logging import getLogger
+import os
+from os.path import exists, join
+import re
+from tempfile import gettempdir
+from threading import Thread
+from unittest import TestCase
+import uuid
+
+import pytest
+
+from conda import CondaError
+from conda.base.constants import PARTIAL_EXTENSION, PARTIAL_INFO_EXTENSION
+from conda.base.context import reset_context
+from conda.common.io import env_var
+from conda.exceptions import MD5MismatchError
+from conda.gateways.disk.create import mkdir_p
+from conda.gateways.disk.delete import rm_rf
+from conda.gateways.download import download
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+log = getLogger(__name__)
+
+CONTENT = os.urandom(100000)
+CONTENT_MD5 = hashlib.md5(CONTENT).hexdigest()
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    # configured by the tests through the server object
+    #   server.support_ranges: answer Range requests with 206 Partial Content
+    #   server.drop_after: {offset: n}, to close the connection after sending only n bytes of
+    #       the next response that starts at offset
+    #   server.requests: the Range header of every request, or None
+    #   server.etag: the ETag of CONTENT; a Range request with any other If-Range gets all of it
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get('Range')
+        server.requests.append(range_header)
+        if self.headers.get('If-Range', server.etag) != server.etag:
+            range_header = None
+        match = server.support_ranges and re.match(r'bytes=(\d+)-(\d*)$', range_header or '')
+        start = int(match.group(1)) if match else 0
+        stop = min(int(match.group(2)) + 1, len(CONTENT)) if match and match.group(2) else (
+            len(CONTENT))
+        if start >= len(CONTENT):
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%d' % len(CONTENT))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = CONTENT[start:stop]
+        self.send_response(206 if match else 200)
+        if match:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, stop - 1, len(CONTENT)))
+        self.send_header('Accept-Ranges', 'bytes' if server.support_ranges else 'none')
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if start in server.drop_after:
+            body = body[:server.drop_after.pop(start)]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@contextmanager
+def segmented_downloads():
+    with env_var('CONDA_CONCURRENT', 'true', reset_context):
+        with env_var('CONDA_DOWNLOAD_SEGMENT_THRESHOLD', 10000, reset_context):
+            yield
+
+
+class ResumableDownloadTests(TestCase):
+
+    def setUp(self):
+        self.test_dir = join(gettempdir(), str(uuid.uuid4())[:8])
+        mkdir_p(self.test_dir)
+        self.target = join(self.test_dir, 'pkg-1.0-0.tar.bz2')
+        self.partial = self.target + PARTIAL_EXTENSION
+        self.partial_info = self.target + PARTIAL_INFO_EXTENSION
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        self.server.support_ranges = True
+        self.server.drop_after = {}
+        self.server.requests = []
+        self.server.etag = '"%s"' % CONTENT_MD5
+        self.thread = Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/pkg-1.0-0.tar.bz2' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        rm_rf(self.test_dir)
+
+    def write_partial(self, content, url=None, etag=None):
+        with open(self.partial, 'wb') as fh:
+            fh.write(content)
+        with open(self.partial_info, 'w') as fh:
+            json.dump({'url': url or self.url, 'etag': etag or self.server.etag}, fh)
+
+    def assert_downloaded(self):
+        with open(self.target, 'rb') as fh:
+            assert fh.read() == CONTENT
+        assert not exists(self.partial)
+        assert not exists(self.partial_info)
+
+    def test_download(self):
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None]
+
+    def test_resume_interrupted_download(self):
+        self.server.drop_after = {0: 30000}
+        with pytest.raises(CondaError):
+            download(self.url, self.target, CONTENT_MD5)
+        assert not exists(self.target)
+        assert os.path.getsize(self.partial) == 30000
+
+        # only the missing bytes are requested, and the checksum covers the whole file
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None, 'bytes=30000-']
+
+    def test_server_ignores_ranges(self):
+        self.server.support_ranges = False
+        self.write_partial(CONTENT[:30000])
+
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == ['bytes=30000-']
+
+    def test_partial_file_too_long(self):
+        self.write_partial(CONTENT + b'trailing garbage')
+
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == ['bytes=%d-' % (len(CONTENT) + 16), None]
+
+    def test_changed_file_is_not_resumed(self):
+        self.write_partial(b'\0' * 30000, etag='"old"')
+
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == ['bytes=30000-']
+
+    def test_partial_file_of_other_url_is_discarded(self):
+        self.write_partial(b'\0' * 30000, url=self.url + '.old')
+
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None]
+
+        # as is a partial file whose download wasn't recorded
+        with open(self.partial, 'wb') as fh:
+            fh.write(b'\0' * 30000)
+        rm_rf(self.target)
+        del self.server.requests[:]
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None]
+
+    def test_corrupt_partial_file_is_discarded(self):
+        self.write_partial(b'\0' * 30000)
+
+        with pytest.raises(MD5MismatchError):
+            download(self.url, self.target, CONTENT_MD5)
+        assert not exists(self.partial)
+        assert not exists(self.partial_info)
+
+        assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+
+    def test_segmented_download(self):
+        with segmented_downloads():
+            assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests[0] is None
+        assert sorted(self.server.requests[1:]) == ['bytes=0-24999', 'bytes=25000-49999',
+                                                    'bytes=50000-74999', 'bytes=75000-99999']
+
+    def test_segmented_download_needs_concurrent(self):
+        with env_var('CONDA_DOWNLOAD_SEGMENT_THRESHOLD', 10000, reset_context):
+            assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None]
+
+    def test_segmented_download_needs_ranges(self):
+        self.server.support_ranges = False
+        with segmented_downloads():
+            assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests == [None]
+
+    def test_resume_failed_segmented_download(self):
+        self.server.drop_after = {50000: 1000}
+        with segmented_downloads():
+            with pytest.raises(CondaError):
+                download(self.url, self.target, CONTENT_MD5)
+            # only bytes that were downloaded from the beginning of the file are kept
+            with open(self.partial, 'rb') as fh:
+                kept = fh.read()
+            assert len(kept) <= 51000
+            assert kept == CONTENT[:len(kept)]
+
+            del self.server.requests[:]
+            assert download(self.url, self.target, CONTENT_MD5) == CONTENT_MD5
+        self.assert_downloaded()
+        assert self.server.requests[0] == ('bytes=%d-' % len(kept) if kept else None)
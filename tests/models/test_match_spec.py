@@ -107,7 +107,7 @@ class MatchSpecTests(unittest.TestCase):
         d = MatchSpec(c, optional=True)
         assert d.optional
         assert not c.optional
-        assert a is not b
+        assert a is b  # string specs are interned
         assert a is not c
         assert a is not d
         assert a == b
@@ -194,3 +194,29 @@ class MatchSpecTests(unittest.TestCase):
         assert a.match(DPkg(dst, features='you test'))
         assert a.match(DPkg(dst, features='you test me'))
         assert a.exact_field('features') == 'test'
+
+    def test_interned(self):
+        a = MatchSpec('numpy >=1.11,<1.12 (optional)')
+        assert MatchSpec('numpy >=1.11,<1.12 (optional)') is a
+        assert MatchSpec('numpy >=1.11,<1.12', optional=True) is not a
+        assert MatchSpec('numpy >=1.11,<1.12', optional=True) == a
+        assert a.version is MatchSpec('scipy >=1.11,<1.12').version
+
+    def test_combined_depends(self):
+        dst = Dist('defaults::foo-1.2.3-4.tar.bz2')
+        rec = DPkg(dst, depends=['python 2.7*', 'numpy'])
+        deps = rec.combined_depends
+        assert set(str(ms) for ms in deps) == {'python 2.7*', 'numpy'}
+        assert DPkg(dst, depends=['python 2.7*', 'numpy']).combined_depends is deps
+        rec.depends = ('python 3.6*',)
+        assert set(str(ms) for ms in rec.combined_depends) == {'python 3.6*'}
+
+    def test_combined_depends_constrains(self):
+        dst = Dist('defaults::foo-1.2.3-4.tar.bz2')
+        rec = DPkg(dst, depends=['python 2.7*', 'numpy'], constrains=['numpy >=1.11', 'mkl'])
+        deps = dict((ms.name, ms) for ms in rec.combined_depends)
+        assert set(deps) == {'python', 'numpy', 'mkl'}
+        assert not deps['python'].optional
+        # a constraint replaces the dependency on the same package, and is only optional
+        assert deps['numpy'].optional and deps['mkl'].optional
+        assert str(deps['numpy']) == 'numpy >=1.11 (optional)'
@@ -220,3 +220,9 @@ class TestVersionSpec(unittest.TestCase):
             self.assertTrue(m.match(version))
 
 
+
+    def test_interned(self):
+        m = VersionSpec('>=1.7,<2|1.5*')
+        assert VersionSpec('>=1.7,<2|1.5*') is m
+        assert m.match('1.5.2')
+        assert not m.match('2.0')
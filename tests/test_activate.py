@@ -341,3 +341,42 @@ class ActivatorIntegrationTests(TestCase):
     def test_activate_has_extra_env_vars(shell):
         """Test that environment variables in activate.d show up when activated"""
         pass
+
+
+class ActivationContextUnitTests(TestCase):
+
+    def test_activation_context_cached(self):
+        from conda.activate import ActivationContext
+        with tempdir() as td:
+            cache_paths = (join(td, 'not', 'a', 'dir', 'cache.json'), join(td, 'cache.json'))
+            with patch('conda.activate.get_activation_cache_paths', return_value=cache_paths):
+                with env_var("CONDA_MAX_SHLVL", "3", reset_context):
+                    first = ActivationContext.load()
+                    assert first.max_shlvl == 3
+                    assert first.root_prefix == context.root_prefix
+                    assert first.envs_dirs == context.envs_dirs
+
+                    with patch.object(ActivationContext, 'from_context') as from_context:
+                        second = ActivationContext.load()
+                        assert not from_context.called
+                    assert second.dump() == first.dump()
+
+                with env_var("CONDA_MAX_SHLVL", "4", reset_context):
+                    # a changed environment variable invalidates the cache
+                    assert ActivationContext.load().max_shlvl == 4
+
+    def test_activator_with_activation_context(self):
+        from conda.activate import ActivationContext
+        with tempdir() as td:
+            prefix = mkdir_p(join(td, 'envs', 'named-env'))
+            mkdir_p(join(prefix, 'conda-meta'))
+            activation_context = ActivationContext(td, 2, False, (join(td, 'envs'),))
+            with env_var('CONDA_SHLVL', '0'):
+                with env_var('CONDA_PREFIX', ''):
+                    activator = Activator('posix', activation_context)
+                    builder = activator.build_activate('named-env')
+                    assert builder['set_vars']['CONDA_PREFIX'] == prefix
+                    assert builder['set_vars']['CONDA_DEFAULT_ENV'] == 'named-env'
+                    assert builder['set_vars']['CONDA_PROMPT_MODIFIER'] == ''
+                    root_builder = activator.build_activate('root')
+                    assert root_builder['set_vars']['CONDA_PREFIX'] == td
@@ -1,17 +1,30 @@
+import bz2
+import hashlib
 import json
-
+import os
+from os.path import join
 import unittest
 
-from conda.base.context import context
+from conda.base.context import context, reset_context
 from conda.gateways.disk.delete import rm_rf
 import pytest
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 from conda.cli.common import arg2spec, spec_from_line
-from conda.common.io import captured
+from conda.cli.main import find_subcommand
+from conda.cli.python_api import Commands, run_command
+from conda.common.io import captured, env_var
 from conda.common.compat import text_type
+from conda.common.url import path_to_url
 from conda.exceptions import CondaValueError
 
-from tests.helpers import capture_json_with_argv, assert_in, run_inprocess_conda_command
+from tests.core.test_linked_data import make_record
+from tests.helpers import (capture_json_with_argv, assert_in, run_inprocess_conda_command,
+                           tempdir)
 
 
 class TestArg2Spec(unittest.TestCase):
@@ -61,6 +74,128 @@ class TestSpecFromLine(unittest.TestCase):
         self.assertEqual(spec_from_line('foo >=1.0 , < 2.0'), 'foo >=1.0,<2.0')
 
 
+class TestFindSubcommand(unittest.TestCase):
+
+    def test_builtin(self):
+        self.assertEqual(find_subcommand(['list', '-n', 'foo']), 'list')
+        self.assertEqual(find_subcommand(['--debug', 'upgrade', 'numpy']), 'upgrade')
+
+    def test_help_and_external(self):
+        self.assertIsNone(find_subcommand([]))
+        self.assertIsNone(find_subcommand(['-h', 'list']))
+        self.assertIsNone(find_subcommand(['build', 'recipe']))
+        self.assertIsNone(find_subcommand(['help']))
+
+
+def test_help_lists_subcommands():
+    stdout, stderr, rc = run_inprocess_conda_command('conda help')
+    assert not rc
+    for subcommand in ('help', 'install', 'list'):
+        assert '    %s ' % subcommand in stdout
+
+
+def test_list_all_envs():
+    with tempdir() as envs_dir:
+        for env_name, record in (('one', make_record('zlib', '1.2.8')),
+                                 ('two', make_record('six', '1.10.0'))):
+            meta_dir = join(envs_dir, env_name, 'conda-meta')
+            os.makedirs(meta_dir)
+            with open(join(meta_dir, record['fn'][:-8] + '.json'), 'w') as fh:
+                json.dump(record, fh)
+
+        with env_var('CONDA_ENVS_DIRS', envs_dir, reset_context):
+            stdout, stderr, rc = run_inprocess_conda_command('conda list --all-envs --json')
+            documents = {doc['prefix']: doc for doc in map(json.loads, stdout.splitlines())}
+            assert documents[context.root_prefix]['name'] == 'root'
+        assert not rc
+        assert documents[join(envs_dir, 'one')]['name'] == 'one'
+        assert [pkg['dist_name'] for pkg in documents[join(envs_dir, 'one')]['packages']] == [
+            'zlib-1.2.8-0']
+        assert [pkg['dist_name'] for pkg in documents[join(envs_dir, 'two')]['packages']] == [
+            'six-1.10.0-0']
+
+
+def test_list_explicit_md5_from_package_cache():
+    with tempdir() as prefix, tempdir() as pkgs_dir:
+        record = make_record('zlib', '1.2.8')
+        url = record['channel'] + '/' + record['fn']
+        os.makedirs(join(prefix, 'conda-meta'))
+        with open(join(prefix, 'conda-meta', 'zlib-1.2.8-0.json'), 'w') as fh:
+            json.dump(record, fh)
+        with open(join(pkgs_dir, record['fn']), 'wb') as fh:
+            fh.write(b'not really a tarball')
+        with open(join(pkgs_dir, 'urls.txt'), 'w') as fh:
+            fh.write(url + '\n')
+
+        with env_var('CONDA_PKGS_DIRS', pkgs_dir, reset_context):
+            stdout, _, _ = run_inprocess_conda_command('conda list -p %s --export' % prefix)
+            assert stdout.splitlines()[-1] == 'zlib=1.2.8=0'
+
+            command = 'conda list -p %s --explicit --md5' % prefix
+            stdout, _, _ = run_inprocess_conda_command(command)
+            md5 = hashlib.md5(b'not really a tarball').hexdigest()
+            assert stdout.splitlines()[-1] == url + '#' + md5
+
+            # the checksum is remembered in the package cache
+            with patch('conda.core.package_cache.compute_md5sum') as compute_md5sum:
+                assert run_inprocess_conda_command(command)[0] == stdout
+                assert not compute_md5sum.called
+
+
+def test_list_export_sorted_by_lowercased_name():
+    with tempdir() as prefix:
+        os.makedirs(join(prefix, 'conda-meta'))
+        for name in ('zlib', 'PyQt', 'numpy'):
+            record = make_record(name, '1.0')
+            with open(join(prefix, 'conda-meta', '%s-1.0-0.json' % name), 'w') as fh:
+                json.dump(record, fh)
+
+        stdout, _, _ = run_inprocess_conda_command('conda list -p %s --export' % prefix)
+        assert [line for line in stdout.splitlines() if not line.startswith('#')] == [
+            'numpy=1.0=0', 'PyQt=1.0=0', 'zlib=1.0=0']
+
+
+def make_file_channel(channel_dir, packages):
+    for subdir in ('linux-64', 'noarch'):
+        os.makedirs(join(channel_dir, subdir))
+    repodata = {}
+    for name, depends in packages:
+        fn = '%s-1.0-0.tar.bz2' % name
+        data = b'tarball of ' + name.encode('ascii')
+        with open(join(channel_dir, 'linux-64', fn), 'wb') as fh:
+            fh.write(data)
+        repodata[fn] = {'name': name, 'version': '1.0', 'build': '0', 'build_number': 0,
+                        'depends': depends, 'md5': hashlib.md5(data).hexdigest(),
+                        'size': len(data), 'subdir': 'linux-64'}
+    for subdir, subdir_packages in (('linux-64', repodata), ('noarch', {})):
+        data = json.dumps({'info': {'subdir': subdir}, 'packages': subdir_packages})
+        with open(join(channel_dir, subdir, 'repodata.json.bz2'), 'wb') as fh:
+            fh.write(bz2.compress(data.encode('utf-8')))
+
+
+def test_prefetch():
+    def prefetch(packages):
+        stdout, _, _ = run_command(Commands.PREFETCH, '--subdir linux-64 --json', packages,
+                                   search_path=())
+        # the python api leaves the solver's progress messages on stdout
+        return json.loads(stdout[stdout.index('{'):])
+
+    with tempdir() as channel_dir, tempdir() as pkgs_dir:
+        make_file_channel(channel_dir, (('foo', ['bar']), ('bar', []), ('baz', [])))
+        channel_url = path_to_url(channel_dir) + '/linux-64/'
+
+        with env_var('CONDA_PKGS_DIRS', pkgs_dir, reset_context), \
+                env_var('CONDA_DEFAULT_CHANNELS', path_to_url(channel_dir), reset_context):
+            assert prefetch('foo')['fetched'] == [channel_url + 'bar-1.0-0.tar.bz2',
+                                                  channel_url + 'foo-1.0-0.tar.bz2']
+            assert os.listdir(join(pkgs_dir, 'cache'))
+
+            # packages already in the cache are not fetched again
+            result = prefetch('foo baz')
+            assert len(result['packages']) == 3
+            assert result['fetched'] == [channel_url + 'baz-1.0-0.tar.bz2']
+
+
 class TestJson(unittest.TestCase):
     def assertJsonSuccess(self, res):
         self.assertIsInstance(res, dict)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+from logging import getLogger
+from os.path import exists, join
+from tempfile import gettempdir
+from threading import Thread
+import time
+from unittest import TestCase
+from uuid import uuid4
+
+import pytest
+
+from conda.cli.daemon import CondaDaemon, run_in_daemon, shutdown_daemon
+from conda.common.compat import on_win
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.delete import rm_rf
+
+from .core.test_linked_data import make_record
+
+log = getLogger(__name__)
+
+
+@pytest.mark.skipif(on_win, reason="the conda daemon listens on a Unix socket")
+class CondaDaemonTests(TestCase):
+
+    def setUp(self):
+        self.prefix = join(gettempdir(), str(uuid4())[:8])
+        self.socket_path = self.prefix + '.sock'
+        mkdir_p(join(self.prefix, 'conda-meta'))
+        self.write_record(make_record('zlib', '1.2.8'))
+        self.daemon = CondaDaemon(self.socket_path)
+        self.thread = Thread(target=self.daemon.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        while not exists(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self):
+        shutdown_daemon(self.socket_path)
+        self.thread.join(10)
+        rm_rf(self.prefix)
+
+    def write_record(self, record):
+        with open(join(self.prefix, 'conda-meta', record['fn'][:-8] + '.json'), 'w') as fh:
+            json.dump(record, fh)
+
+    def list_prefix(self):
+        stdout, stderr, rc = run_in_daemon(['list', '-p', self.prefix, '--json'],
+                                           self.socket_path)
+        assert rc == 0, stderr
+        return sorted(pkg['dist_name'] for pkg in json.loads(stdout))
+
+    def test_commands_see_prefix_changes(self):
+        assert self.list_prefix() == ['zlib-1.2.8-0']
+        assert self.list_prefix() == ['zlib-1.2.8-0']
+
+        self.write_record(make_record('python', '3.6.1'))
+        assert self.list_prefix() == ['python-3.6.1-0', 'zlib-1.2.8-0']
+
+    def test_failed_command(self):
+        stdout, stderr, rc = run_in_daemon(['list', '--bogus'], self.socket_path)
+        assert rc == 2
+        assert 'unrecognized arguments: --bogus' in stderr
+
+        stdout, stderr, rc = run_in_daemon(['list', '--name', 'nonexistent', '--json'],
+                                           self.socket_path)
+        assert rc > 0
+        assert json.loads(stdout)['exception_name'] == 'EnvironmentNameNotFound'
+
+    def test_no_daemon(self):
+        assert run_in_daemon(['list'], self.socket_path + '.missing') is None
+        assert shutdown_daemon(self.socket_path + '.missing') is False
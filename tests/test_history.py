@@ -78,3 +78,86 @@ class UserRequestsTestCase(unittest.TestCase):
                           'unlink_dists': (),
                           'link_dists': ['+pyflakes-1.0.0-py27_0'],
                           })
+
+
+class HistoryIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        from os import makedirs
+        from os.path import join
+        from shutil import copyfile
+        self.prefix = make_temp_prefix()
+        makedirs(join(self.prefix, 'conda-meta'))
+        history_path = join(self.prefix, 'conda-meta', 'history')
+        copyfile(join(dirname(__file__), 'conda-meta', 'history'), history_path)
+        self.h = history.History(self.prefix)
+
+    def test_index_matches_full_parse(self):
+        states = self.h.construct_states()
+        assert self.h.get_state() == states[-1][1]
+        assert len(self.h.read_index()[0]['offsets']) == len(states) - 1
+        for rev in range(len(states)):
+            assert self.h.get_state(rev) == states[rev][1]
+        assert self.h.get_state(-2) == states[-2][1]
+        requested = set((s.spec, d and d.dist_name) for s, d in self.h.get_requested_specs())
+        assert ('pyflakes', 'pyflakes-1.0.0-py27_0') in requested
+        assert ('cas-mirror', 'cas-mirror-1.4.0-py27_x0') in requested
+
+    def test_index_extended_on_append(self):
+        self.h.get_state()
+        with mock.patch.object(history.History, 'parse') as mock_parse:
+            with open(self.h.path, 'a') as fo:
+                fo.write("==> 2016-02-19 10:00:00 <==\n"
+                         "# cmd: conda remove grin\n"
+                         "-grin-1.2.1-py27_1\n"
+                         "# remove specs: ['grin']\n")
+            state = self.h.get_state()
+            assert 'grin-1.2.1-py27_1' not in state
+            assert 'pyflakes-1.0.0-py27_0' in state
+            assert len(self.h.read_index()[0]['offsets']) == 6
+            assert 'grin' not in set(s.name for s, _ in self.h.get_requested_specs())
+        assert mock_parse.call_count == 0
+
+    def test_logs_read_from_index(self):
+        revisions = self.h.parse()
+        object_log = self.h.object_log()
+        assert list(self.h.iter_revisions()) == revisions
+        with mock.patch.object(history.History, 'parse') as mock_parse:
+            assert self.h.object_log() == object_log
+            assert [event['date'] for event in object_log] == [dt for dt, _, _ in revisions]
+            self.h.print_log()
+        assert mock_parse.call_count == 0
+
+        # only the history following the index is parsed as a whole
+        with open(self.h.path, 'a') as fo:
+            fo.write("==> 2016-02-19 10:00:00 <==\n"
+                     "# cmd: conda remove grin\n"
+                     "-grin-1.2.1-py27_1\n")
+        with mock.patch.object(history, 'parse_lines', wraps=history.parse_lines) as parse_lines:
+            revisions = list(self.h.iter_revisions())
+        assert revisions[-1] == ('2016-02-19 10:00:00', {'-grin-1.2.1-py27_1'},
+                                 ['# cmd: conda remove grin'])
+        assert revisions == self.h.parse()
+        # the previously last revision and the new one, then each of the 6 indexed revisions
+        first_lines = [call[0][0][0] for call in parse_lines.call_args_list]
+        assert len(first_lines) == 7
+        assert first_lines[0] == '==> 2016-02-18 22:53:20 <==\n'
+
+    def test_rewritten_history_invalidates_index(self):
+        self.h.get_state()
+        self.h.write_dists(['zlib-1.2.8-0'])
+        with open(self.h.path, 'a') as fo:
+            fo.write("==> 2016-02-19 10:00:00 <==\n"
+                     "zlib-1.2.8-0\n")
+        assert self.h.get_state() == {'zlib-1.2.8-0'}
+
+    def test_non_utf8_history(self):
+        with open(self.h.path, 'ab') as fo:
+            fo.write(b"==> 2016-02-19 10:00:00 <==\n"
+                     b"# cmd: conda install -p /home/jos\xe9/env zlib\n"
+                     b"+zlib-1.2.8-0\n"
+                     b"==> 2016-02-19 10:01:00 <==\n"
+                     b"# cmd: conda remove -p /home/jos\xe9/env zlib\n"
+                     b"-zlib-1.2.8-0\n")
+        assert 'zlib-1.2.8-0' in self.h.get_state(-2)
+        assert 'zlib-1.2.8-0' not in self.h.get_state()
@@ -0,0 +1,169 @@
+"""Import-time and memory budgets for conda's startup paths.
+
+Every measurement runs in a fresh interpreter. Module import times are recorded the way
+``python -X importtime`` reports them (self and cumulative time per module), by timing
+importlib's module loader, so they are also available on pythons older than 3.7.
+
+The budgets live in ``import_budget.json`` beside this file. Set
+CONDA_TEST_IMPORT_BUDGET_SCALE to stretch them on slow machines.
+
+Run this file directly for a report on one startup path::
+
+    python -m tests.test_import_budget info --json
+    python -m tests.test_import_budget --module conda.core.link
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import os
+from os.path import abspath, dirname, join
+import subprocess
+import sys
+from tempfile import mkstemp
+import time
+
+import pytest
+
+from conda._vendor.auxlib.ish import dals
+from conda.common.compat import PY2, iteritems, on_win
+
+BUDGET_FILE = join(dirname(abspath(__file__)), 'import_budget.json')
+CONDA_ROOT = dirname(dirname(abspath(__file__)))
+VENDORED_PACKAGES = ('conda._vendor.auxlib', 'conda._vendor.toolz', 'conda._vendor.boltons',
+                     'conda._vendor.urllib3', 'ruamel', 'ruamel_yaml', 'requests', 'setuptools',
+                     'pkg_resources')
+RUNS = 3
+
+PROBE = dals("""
+    import json
+    import resource
+    import sys
+    import time
+    import importlib._bootstrap as bootstrap
+
+    output, mode, args = sys.argv[1], sys.argv[2], sys.argv[3:]
+    imports, stack = [], []
+    load_unlocked = bootstrap._load_unlocked
+
+    def timed_load_unlocked(spec):
+        stack.append(0.)
+        start = time.time()
+        try:
+            return load_unlocked(spec)
+        finally:
+            elapsed = time.time() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            imports.append((spec.name, elapsed - children, elapsed))
+
+    bootstrap._load_unlocked = timed_load_unlocked
+    if mode == 'module':
+        __import__(args[0])
+        rc = 0
+    else:
+        from conda.cli.main import main
+        sys.argv = ['conda'] + args
+        rc = main()
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss //= 1024
+    with open(output, 'w') as fh:
+        json.dump({'rc': rc or 0, 'maxrss_kb': maxrss, 'imports': imports}, fh)
+""")
+
+
+def load_budget():
+    with open(BUDGET_FILE) as fh:
+        budget = json.load(fh)
+    scale = float(os.getenv('CONDA_TEST_IMPORT_BUDGET_SCALE', 1))
+    for entry in list(budget['commands'].values()) + list(budget['modules'].values()):
+        entry['seconds'] *= scale
+    return budget
+
+
+def probe(mode, args):
+    """Run one startup path in a fresh interpreter.
+
+    Returns a dict with the wall-clock 'seconds' of the whole process, its peak 'maxrss_kb',
+    the exit code 'rc', and 'imports' as a list of (module, self_seconds, cumulative_seconds).
+    """
+    fd, output = mkstemp(suffix='.json')
+    os.close(fd)
+    env = os.environ.copy()
+    env[str('PYTHONPATH')] = os.pathsep.join(p for p in (CONDA_ROOT, env.get('PYTHONPATH'))
+                                             if p)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            start = time.time()
+            subprocess.check_call([sys.executable, '-c', PROBE, output, mode] + list(args),
+                                  stdout=devnull, env=env)
+            elapsed = time.time() - start
+        with open(output) as fh:
+            result = json.load(fh)
+    finally:
+        os.unlink(output)
+    result['seconds'] = elapsed
+    return result
+
+
+def fastest_probe(mode, args, runs=RUNS):
+    # the fastest of several cold starts is the least noisy estimate of the startup cost
+    return min((probe(mode, args) for _ in range(runs)), key=lambda result: result['seconds'])
+
+
+def vendored_imports(result):
+    totals = {}
+    for name, self_seconds, _ in result['imports']:
+        for package in VENDORED_PACKAGES:
+            if name == package or name.startswith(package + '.'):
+                count, seconds = totals.get(package, (0, 0.))
+                totals[package] = count + 1, seconds + self_seconds
+    return totals
+
+
+def format_report(result, limit=20):
+    lines = ["wall time: %.3f sec   peak rss: %.1f MB   modules imported: %d"
+             % (result['seconds'], result['maxrss_kb'] / 1024, len(result['imports'])),
+             "",
+             "%10s %10s  %s" % ("self [ms]", "cumul [ms]", "module")]
+    slowest = sorted(result['imports'], key=lambda imp: imp[2], reverse=True)[:limit]
+    lines.extend("%10.1f %10.1f  %s" % (self_seconds * 1000, cumulative * 1000, name)
+                 for name, self_seconds, cumulative in slowest)
+    totals = vendored_imports(result)
+    if totals:
+        lines.extend(["", "%10s %10s  %s" % ("modules", "self [ms]", "vendored package")])
+        lines.extend("%10d %10.1f  %s" % (count, seconds * 1000, package)
+                     for package, (count, seconds) in sorted(iteritems(totals)))
+    return "\n".join(lines)
+
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(PY2 or on_win, reason="needs importlib._bootstrap and resource"),
+]
+
+
+@pytest.mark.parametrize('command', sorted(load_budget()['commands']))
+def test_command_startup_budget(command):
+    budget = load_budget()['commands'][command]
+    result = fastest_probe('command', command.split())
+    assert result['rc'] == 0
+    report = format_report(result)
+    assert result['seconds'] <= budget['seconds'], report
+    assert result['maxrss_kb'] <= budget['rss_mb'] * 1024, report
+
+
+@pytest.mark.parametrize('module', sorted(load_budget()['modules']))
+def test_module_import_budget(module):
+    budget = load_budget()['modules'][module]
+    result = fastest_probe('module', (module,))
+    cumulative = next(cumul for name, _, cumul in result['imports'] if name == module)
+    assert cumulative <= budget['seconds'], format_report(result)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--module']:
+        print(format_report(fastest_probe('module', sys.argv[2:3])))
+    else:
+        print(format_report(fastest_probe('command', sys.argv[1:])))
@@ -126,3 +126,79 @@ def test_permission_file():
 
             path = basename(lock.lock_file_path)
             assert not exists(join(f.name, path))
+
+
+def test_shared_locks_do_not_block_each_other(tmpdir):
+    tmpfile = join(tmpdir.strpath, "conda_file_4")
+    with FileLock(tmpfile, shared=True) as lock1:
+        with FileLock(tmpfile, shared=True, timeout=0) as lock2:
+            assert lock2.wait_time < 1
+            assert lock1.lock_file_path == lock2.lock_file_path
+
+        with pytest.raises(LockError):
+            with FileLock(tmpfile, timeout=0.2):
+                assert False  # a writer must wait for all readers
+
+    assert not exists(lock1.lock_file_path)
+
+
+def test_exclusive_lock_blocks_readers(tmpdir):
+    from subprocess import PIPE, Popen
+    import sys
+    tmpfile = join(tmpdir.strpath, "conda_file_5")
+    # the writer is another process; this process's own exclusive locks don't block its reads
+    writer = Popen([sys.executable, '-c', 'import sys; from conda.lock import FileLock\n'
+                    'with FileLock(sys.argv[1]):\n'
+                    '    print("locked"); sys.stdout.flush(); sys.stdin.read()', tmpfile],
+                   stdin=PIPE, stdout=PIPE)
+    try:
+        assert writer.stdout.readline().strip() == b"locked"
+        with pytest.raises(LockError) as execinfo:
+            with FileLock(tmpfile, shared=True, timeout=0.2):
+                assert False  # should never enter here
+        assert "LOCKERROR" in str(execinfo.value)
+    finally:
+        writer.communicate()
+    with FileLock(tmpfile, shared=True, timeout=0) as lock:
+        assert lock.wait_time < 1
+
+
+def test_blocking_wait_records_wait_time(tmpdir):
+    from threading import Thread
+    import time
+    tmpfile = join(tmpdir.strpath, "conda_file_6")
+    waiter = FileLock(tmpfile, timeout=None)
+
+    def lock_thread():
+        with waiter:
+            pass
+
+    t = Thread(target=lock_thread)
+    with FileLock(tmpfile):
+        t.start()
+        time.sleep(0.3)
+    t.join()
+    assert waiter.wait_time >= 0.2
+
+
+def test_stale_legacy_lock_file_is_removed(tmpdir):
+    tmpfile = join(tmpdir.strpath, "conda_file_7")
+    # pids are capped well below this value on every supported platform
+    stale_lock = tmpdir.join("conda_file_7.pid99999999.conda_lock")
+    stale_lock.write("")
+    with FileLock(tmpfile, timeout=0):
+        assert not stale_lock.exists()
+
+
+def test_exclusive_holder_reads_without_waiting(tmpdir):
+    tmpfile = join(tmpdir.strpath, "conda_file_8")
+    with FileLock(tmpfile) as lock1:
+        with FileLock(tmpfile, shared=True, timeout=0) as lock2:
+            assert lock2.wait_time == 0
+        assert isfile(lock1.lock_file_path)
+
+    # once released, the lock no longer counts as held
+    with FileLock(tmpfile, shared=True, timeout=0):
+        with pytest.raises(LockError):
+            with FileLock(tmpfile, timeout=0.2):
+                assert False  # a writer must wait for the reader
@@ -1,11 +1,21 @@
+from array import array
 from itertools import combinations, permutations, product, chain
 
 import pytest
 
-from conda.logic import (Clauses, evaluate_eq, minimal_unsatisfiable_subset)
+import pycosat
+
+from conda.logic import (SAT_SOLVERS, ClauseArray, Clauses, IncrementalSatSolver, ProbePool,
+                         PycoSatSolver, SolveBudget, evaluate_eq, get_sat_solver_cls,
+                         minimal_unsatisfiable_subset)
 from tests.helpers import raises
 from conda.common.compat import string_types, iteritems
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 # These routines implement logical tests with short-circuiting
 # and propogation of unknown values:
 #    - positive integers are variables
@@ -288,6 +298,79 @@ def test_minimize():
     assert sval == 11
 
 
+def test_Totalizer():
+    C = Clauses(4)
+    outputs = C.Totalizer([(1, 1), (2, 2), (2, -3), (4, 4)], 6)
+    assert sorted(outputs) == [1, 2, 3, 4, 5, 6]
+    for sol in C.itersolve([], 4):
+        total = min(my_EVAL([(1, 1), (2, 2), (2, -3), (4, 4)], sol), 6)
+        bound = [(-x,) for v, x in outputs.items() if v > total]
+        assert C.sat(bound) is not None
+        if total:
+            tight = [(-x,) for v, x in outputs.items() if v >= total]
+            assert C.sat(chain(tight, ((k,) for k in sol[:4]))) is None
+    assert Clauses(4).Totalizer([(1, 1), (2, 2), (2, -3), (4, 4)], 6, 5) is None
+
+
+def test_minimize_totalizer():
+    import random
+    rng = random.Random(7)
+    for _ in range(20):
+        objective = [(rng.randint(0, 6), k) for k in range(1, 13)]
+        values = []
+        for totalizer in (True, False):
+            C = Clauses(12)
+            for k in range(1, 13, 3):
+                C.Require(C.ExactlyOne, range(k, k + 3))
+            values.append(C.minimize(objective, totalizer=totalizer)[1])
+            # the optimum is kept as a constraint
+            assert evaluate_eq(objective, C.sat()) == values[-1]
+        assert values[0] == values[1]
+
+    # the optimum is kept even when it is the value of the initial solution
+    C = Clauses(2)
+    C.Require(C.Or, 1, 2)
+    assert C.minimize([(1, 1), (1, 2)], [1, -2], totalizer=True)[1] == 1
+    assert C.minimize([(1, -1), (1, -2)], totalizer=True)[1] == 1
+    assert evaluate_eq([(1, 1), (1, 2)], C.sat()) == 1
+
+
+def test_minimize_budget():
+    objective = [(k % 5, k) for k in range(1, 13)]
+
+    def make_clauses():
+        C = Clauses(12)
+        for k in range(1, 13, 3):
+            C.Require(C.ExactlyOne, range(k, k + 3))
+        return C
+
+    optimum = make_clauses().minimize(objective)[1]
+
+    # an exhausted budget keeps the current solution
+    C = make_clauses()
+    solution = C.sat()
+    C.budget = SolveBudget()
+    C.budget.exhausted = True
+    assert C.minimize(objective, solution) == (solution, evaluate_eq(objective, solution))
+
+    # so does a solver that reaches the propagation limit
+    def solve(clauses, vars, prop_limit):
+        return "UNKNOWN" if prop_limit else pycosat.solve(clauses, vars=vars)
+
+    C = make_clauses()
+    C.budget = SolveBudget(prop_limit=100)
+    solution = C.sat()
+    with patch('conda.logic.pycosat.solve', side_effect=solve):
+        bestsol, bestval = C.minimize(objective, solution)
+    assert C.budget.exhausted
+    assert bestsol == solution and bestval >= optimum
+
+    C = make_clauses()
+    C.budget = SolveBudget(timeout=60, prop_limit=100000)
+    assert C.minimize(objective)[1] == optimum
+    assert not C.budget.exhausted
+
+
 def test_minimal_unsatisfiable_subset():
     def sat(val):
         return Clauses(max(abs(v) for v in chain(*val))).sat(val)
@@ -310,3 +393,163 @@ def test_minimal_unsatisfiable_subset():
         res = minimal_unsatisfiable_subset(perm, sat)
         assert sorted(res) in [[[-1], [1]], [[-2], [2]]]
         assert not sat(res)
+
+
+def test_minimal_unsatisfiable_subset_parallel():
+    def sat(val):
+        return Clauses(max(abs(v) for v in chain(*val))).sat(val)
+
+    clauses = [[-10], [1], [5], [2, 3], [3, 4], [5, 2], [-7], [2], [3],
+        [-2, -3, 5], [7, 8, 9, 10], [-8], [-9]]
+    res = minimal_unsatisfiable_subset(clauses, sat, processes=2)
+    assert sorted(res) == [[-10], [-9], [-8], [-7], [7, 8, 9, 10]]
+
+    clauses = [[1], [-1], [2], [-2], [3, 4], [4]]
+    res = minimal_unsatisfiable_subset(clauses, sat, processes=0)
+    assert sorted(res) in [[[-1], [1]], [[-2], [2]]]
+
+    # without fork, the probes run serially
+    with patch('multiprocessing.get_context', side_effect=ValueError, create=True):
+        assert ProbePool.create(sat, 2) is None
+        res = minimal_unsatisfiable_subset(clauses, sat, processes=2)
+    assert sorted(res) in [[[-1], [1]], [[-2], [2]]]
+
+
+def test_clause_array():
+    clauses = ClauseArray([(1, -2), (3,)])
+    clauses.append((-1, 2, 3))
+    clauses.extend([(4,), (-4, 5)])
+    assert len(clauses) == 5
+    assert [tuple(c) for c in clauses] == [(1, -2), (3,), (-1, 2, 3), (4,), (-4, 5)]
+    assert [tuple(c) for c in clauses.iter_clauses(3)] == [(4,), (-4, 5)]
+    clauses.truncate(2)
+    assert [tuple(c) for c in clauses] == [(1, -2), (3,)]
+    clauses.truncate(5)
+    assert len(clauses) == 2
+    clauses.append((2,))
+    clauses.guard(1, -6)
+    assert [tuple(c) for c in clauses] == [(1, -2), (3, -6), (2, -6)]
+    clauses.truncate(0)
+    assert not clauses
+    assert list(clauses) == []
+
+
+def test_clause_array_memory():
+    # the flat arrays take a fraction of the memory of the list of tuples clauses were kept in
+    #   before, and are handed to the solver as they are
+    from random import Random
+    from sys import getsizeof
+    rand = Random(0)
+    m = 2000
+    assignment = [None] + [rand.choice((-1, 1)) for _ in range(m)]
+    tuples = []
+    for _ in range(20000):
+        clause = [rand.choice((-1, 1)) * rand.randint(1, m) for _ in range(rand.randint(1, 3))]
+        clause.append(assignment[abs(clause[0])] * abs(clause[0]))
+        tuples.append(tuple(clause))
+    clauses = ClauseArray(tuples)
+
+    tuples_size = getsizeof(tuples) + sum(getsizeof(clause) for clause in tuples)
+    assert getsizeof(clauses._literals) + getsizeof(clauses._offsets) < tuples_size / 2
+    assert not hasattr(clauses, '_tuples')
+    assert all(type(clause) is array for clause in clauses)
+    assert [tuple(c) for c in clauses] == tuples
+    assert pycosat.solve(iter(clauses), vars=m) == pycosat.solve(tuples, vars=m)
+
+    clauses.truncate(12345)
+    assert len(clauses) == 12345
+    assert len(clauses._literals) == sum(len(clause) + 1 for clause in tuples[:12345])
+    assert [tuple(c) for c in clauses] == tuples[:12345]
+    assert [tuple(c) for c in clauses.iter_clauses(12340)] == tuples[12340:12345]
+    assert list(clauses.iter_clauses(12345)) == []
+
+
+class ReferenceIncrementalSolver(IncrementalSatSolver):
+    # an "incremental" solver on top of pycosat, to exercise the activation
+    # literal code paths of Clauses without optional dependencies
+    module_name = 'pycosat'
+
+    def _new_solver(self):
+        return []
+
+    def _add_clauses(self, clauses):
+        self._solver.extend(clauses)
+
+    def _solve(self, assumptions, limit):
+        solution = pycosat.solve(chain(self._solver, ((a,) for a in assumptions)),
+                                 vars=self._clauses.m, prop_limit=limit)
+        return None if solution in ("UNSAT", "UNKNOWN") else solution
+
+
+incremental_solvers = [ReferenceIncrementalSolver] + [
+    cls for cls in SAT_SOLVERS.values()
+    if cls.incremental and get_sat_solver_cls(cls.module_name) is cls
+]
+
+
+def make_clauses(m, solver_cls):
+    C = Clauses(m)
+    C._sat_solver_cls = solver_cls
+    return C
+
+
+@pytest.mark.parametrize('solver_cls', incremental_solvers)
+def test_incremental_sat(solver_cls):
+    C = make_clauses(0, solver_cls)
+    C.new_var('x1')
+    C.new_var('x2')
+    assert C.sat([(+1, False), (+2,), (True,)], names=True) == {'x1', 'x2'}
+    assert C.sat([(-1, False), (True,), (+2,)], names=True) == {'x2'}
+    assert C.sat([(+1,), (-1, False)], names=True) is None
+    # temporary clauses don't stick
+    assert C.sat([(-1,), (-2,)], names=True) == set()
+    assert C.sat([(+1,), (+2,)], names=True) == {'x1', 'x2'}
+    # includeIf clauses do
+    assert C.sat([(-1,)], includeIf=True, names=True) is not None
+    assert C.sat([(+1,)]) is None
+    assert 'x1' not in C.sat(names=True)
+    # the solver instance is reused throughout
+    solver = C.sat_solver._solver
+    assert C.sat([(2,)]) is not None
+    assert C.sat_solver._solver is solver
+
+
+@pytest.mark.parametrize('solver_cls', incremental_solvers)
+def test_incremental_minimize(solver_cls):
+    C = make_clauses(15, solver_cls)
+    C.Require(C.ExactlyOne, range(1, 6))
+    sol, sval = C.minimize([(k, k) for k in range(1, 6)])
+    assert sval == 1
+    C.Require(C.ExactlyOne, range(6, 11))
+    sol, sval = C.minimize([(k, k) for k in range(6, 11)], sol)
+    assert sval == 6
+    C.Require(C.ExactlyOne, range(11, 16))
+    sol, sval = C.minimize([(k, k) for k in range(11, 16)], sol)
+    assert sval == 11
+    # the optimum of each objective is kept
+    assert {1, 6, 11} <= set(C.sat())
+    # peak, then sum minimization
+    C = make_clauses(6, solver_cls)
+    C.Require(C.Any, range(1, 4))
+    C.Require(C.Any, range(4, 7))
+    sol, sval = C.minimize([(1, 1), (3, 2), (3, 3), (2, 4), (1, 5), (4, 6)])
+    assert sval == 2
+    assert {1, 5} <= set(sol)
+
+
+@pytest.mark.parametrize('solver_cls', incremental_solvers)
+def test_incremental_truncation_rebuilds_solver(solver_cls):
+    C = make_clauses(2, solver_cls)
+    C.Require(C.Or, 1, 2)
+    nz = len(C.clauses)
+    C.Require(C.Not, 1)
+    assert C.sat() is not None
+    C.truncate(nz)
+    C.Require(C.Not, 2)
+    assert set(C.sat()) == {1, -2}
+
+
+def test_get_sat_solver_cls():
+    assert get_sat_solver_cls(None) is PycoSatSolver
+    assert get_sat_solver_cls('pycosat') is PycoSatSolver
+    assert get_sat_solver_cls('no-such-solver') is PycoSatSolver
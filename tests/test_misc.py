@@ -1,9 +1,23 @@
+import json
 import os.path
 import sys
 import unittest
 
+import pytest
+
+from conda.common.io import env_var
+from conda.base.context import reset_context
+from conda.core.linked_data import delete_prefix_from_linked_data
 from conda.core.repodata import cache_fn_url
-from conda.misc import url_pat, walk_prefix
+from conda.exceptions import PackageNotFoundError
+from conda.misc import clone_env, url_pat, walk_prefix
+
+from .core.test_linked_data import make_record
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 
 class TestMisc(unittest.TestCase):
@@ -69,5 +83,48 @@ def test_walk_prefix(tmpdir):  # tmpdir is a py.test utility
     assert walk_prefix(tmpdir.strpath) == answer
 
 
+def test_clone_untracked_files(tmpdir):
+    prefix1 = str(tmpdir.join('env'))
+    prefix2 = prefix1 + '-clone'  # the new prefix contains the old one
+    text = '#!%s/bin/python\n# %s/lib and %s/share\n' % (prefix1, prefix1, prefix1)
+    binary = b'\xff\xfe' + prefix1.encode('utf-8') + b'\0'
+    for path, content in (('bin/script', text.encode('utf-8')),
+                          ('share/data.bin', binary),
+                          ('share/readme.txt', b'nothing to see here\n')):
+        tmpdir.join('env', path).write_binary(content, ensure=True)
+    os.symlink('readme.txt', os.path.join(prefix1, 'share', 'readme'))
+    os.makedirs(os.path.join(prefix1, 'conda-meta'))
+
+    # small chunks, so that the prefix straddles chunk boundaries
+    with patch('conda.misc.CLONE_CHUNK_SIZE', 7):
+        actions, untracked_files = clone_env(prefix1, prefix2, verbose=False, quiet=True)
+
+    assert sorted(untracked_files) == ['bin/script', 'share/data.bin', 'share/readme',
+                                       'share/readme.txt']
+    with open(os.path.join(prefix2, 'bin', 'script')) as fh:
+        assert fh.read() == text.replace(prefix1, prefix2)
+    with open(os.path.join(prefix2, 'share', 'data.bin'), 'rb') as fh:
+        assert fh.read() == binary
+    assert os.readlink(os.path.join(prefix2, 'share', 'readme')) == 'readme.txt'
+    with open(os.path.join(prefix2, 'share', 'readme')) as fh:
+        assert fh.read() == 'nothing to see here\n'
+
+
+def test_clone_package_without_url(tmpdir):
+    prefix1 = str(tmpdir.join('env'))
+    record = make_record('zlib', '1.2.8')
+    del record['channel']
+    tmpdir.join('env', 'conda-meta', 'zlib-1.2.8-0.json').write(json.dumps(record), ensure=True)
+    try:
+        # a package that is neither cached nor has a URL cannot be cloned; no index is fetched
+        with env_var('CONDA_PKGS_DIRS', str(tmpdir.join('pkgs')), reset_context):
+            with patch('conda.core.index.fetch_index', side_effect=AssertionError):
+                with pytest.raises(PackageNotFoundError) as exc:
+                    clone_env(prefix1, prefix1 + '-clone', verbose=False, quiet=True)
+        assert 'zlib-1.2.8-0.tar.bz2' in str(exc.value)
+    finally:
+        delete_prefix_from_linked_data(prefix1)
+
+
 if __name__ == '__main__':
     unittest.main()
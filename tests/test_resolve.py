@@ -1,11 +1,13 @@
 from __future__ import absolute_import, print_function
 
+from itertools import chain
 import json
 import os
 import unittest
 from conda.base.constants import MAX_CHANNEL_PRIORITY
 from conda.base.context import reset_context
-from conda.common.compat import iteritems, text_type
+from conda.common.compat import iteritems, on_win, text_type
+from conda.common.io import env_var
 from conda.exceptions import NoPackagesFoundError, UnsatisfiableError
 from conda.models.dist import Dist
 from conda.models.channel import Channel
@@ -13,12 +15,20 @@ from conda.models.index_record import IndexRecord
 from conda.resolve import MatchSpec, Resolve
 from conda.core.index import supplement_index_with_repodata, supplement_index_with_features
 from os.path import dirname, join
+from shutil import rmtree
+from tempfile import mkdtemp
 
 import pytest
 
-from conda.resolve import MatchSpec, Resolve, NoPackagesFound, Unsatisfiable
+from conda.resolve import (MatchSpec, Resolve, NoPackagesFound, Unsatisfiable,
+                           compute_depends_matches, iter_bits, register_depends_matches)
 from tests.helpers import raises
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 with open(join(dirname(__file__), 'index.json')) as fi:
     repodata = json.load(fi)
 
@@ -187,6 +197,69 @@ def test_get_dists():
     assert Dist('defaults::dynd-python-0.3.0-np17py33_0.tar.bz2') in dists
 
 
+def test_match_bits():
+    for spec in ('numpy', 'numpy 1.7*', 'python >=2.7,<3', 'mkl@'):
+        ms = MatchSpec(spec)
+        assert r.match_bits(ms) == r.bits(r.find_matches(ms))
+        assert [r.dists[i] for i in iter_bits(r.match_bits(ms))] == sorted(
+            r.find_matches(ms), key=r.dist_ids.get)
+    for dist in r.groups['scipy']:
+        assert r.group_bits('scipy') >> r.dist_ids[dist] & 1
+        for ms in r.ms_depends(dist):
+            users = dict(r.group_depends('scipy'))[ms]
+            assert users >> r.dist_ids[dist] & 1
+
+
+def test_depends_match_tables():
+    table = compute_depends_matches(index)
+    assert table['numpy 1.7*'] == frozenset(r.find_matches(MatchSpec('numpy 1.7*')))
+    register_depends_matches('test-channel', index, table)
+    try:
+        r2 = Resolve(index)
+        assert len(r2.depends_tables) == len(index)
+        with patch.object(MatchSpec, 'match', side_effect=AssertionError):
+            assert r2.find_matches(MatchSpec('numpy 1.7*')) == r.find_matches(
+                MatchSpec('numpy 1.7*'))
+        assert r2.install(['anaconda 1.5.0']) == r.install(['anaconda 1.5.0'])
+
+        # records that differ from those the table was computed for are matched as usual
+        index2 = index.copy()
+        index2[Dist('defaults::numpy-1.7.1-py27_0.tar.bz2')] = IndexRecord(
+            **index[Dist('defaults::numpy-1.7.1-py27_0.tar.bz2')].dump())
+        assert len(Resolve(index2).depends_tables) == len(index) - 1
+    finally:
+        register_depends_matches('test-channel', None, None)
+
+
+def test_update_index():
+    r2 = Resolve(index.copy(), sort=True)
+    specs = ['numpy 1.7*', 'python 2.7*']
+    before = r2.install(specs)
+    numpy = Dist('defaults::numpy-1.7.1-py27_0.tar.bz2')
+    newer = Dist('defaults::numpy-1.7.2-py27_0.tar.bz2')
+    assert numpy in before
+
+    # cached results are invalidated for the affected packages only
+    assert r2.find_matches(MatchSpec('python 2.7*'))
+    rec = IndexRecord.from_objects(index[numpy], version='1.7.2',
+                                   fn='numpy-1.7.2-py27_0.tar.bz2')
+    undo = r2.update_index({newer: rec, numpy: None})
+    assert MatchSpec('numpy 1.7*') not in r2.find_matches_
+    assert MatchSpec('python 2.7*') in r2.find_matches_
+    assert r2.groups['numpy'][0] == newer
+
+    after = r2.install(specs)
+    assert newer in after and numpy not in after
+    assert after == Resolve(r2.index.copy(), sort=True).install(specs)
+
+    r2.update_index(undo)
+    assert set(r2.index) == set(index)
+    fresh = Resolve(index, sort=True)
+    assert ([r2.version_key(d) for d in r2.groups['numpy']] ==
+            [fresh.version_key(d) for d in fresh.groups['numpy']])
+    assert r2.install(specs) == before
+
+
 def test_generate_eq():
     dists = r.get_reduced_index(['anaconda'])
     r2 = Resolve(dists, True, True)
@@ -420,6 +493,40 @@ def test_unsat():
     assert raises(UnsatisfiableError, lambda: r.install(['numpy 1.5*', 'numpy 1.6*']))
 
 
+def test_unsat_explanation_cached():
+    tempdir = mkdtemp()
+    try:
+        with patch('conda.resolve.get_conflict_cache_path',
+                   side_effect=lambda key: join(tempdir, key + '.json')):
+            specs = ['numpy 1.5*', 'scipy 0.12.0b1']
+            with pytest.raises(UnsatisfiableError) as exc:
+                r.install(specs)
+            assert len(os.listdir(tempdir)) == 1
+            with patch('conda.resolve.minimal_unsatisfiable_subset') as mus:
+                with pytest.raises(UnsatisfiableError) as cached_exc:
+                    r.install(specs)
+                assert not mus.called
+            assert text_type(cached_exc.value) == text_type(exc.value)
+            assert 'scipy 0.12.0b1 -> numpy' in text_type(exc.value)
+
+            # a different index is a different key
+            index2 = index.copy()
+            del index2[Dist('defaults::iopro-1.4.3-np15py27_p0.tar.bz2')]
+            assert raises(UnsatisfiableError, lambda: Resolve(index2).install(specs))
+            assert len(os.listdir(tempdir)) == 2
+    finally:
+        rmtree(tempdir)
+
+
+def test_unsat_no_explain():
+    with env_var('CONDA_EXPLAIN_CONFLICTS', 'false', reset_context):
+        with patch('conda.resolve.minimal_unsatisfiable_subset') as mus:
+            with pytest.raises(UnsatisfiableError) as exc:
+                r.install(['numpy 1.5*', 'python 3*'])
+            assert not mus.called
+    assert 'numpy 1.5*, python 3*' in text_type(exc.value)
+
+
 def test_nonexistent():
     assert not r.find_matches(MatchSpec('notarealpackage 2.0*'))
     assert raises(NoPackagesFoundError, lambda: r.install(['notarealpackage 2.0*']))
@@ -639,6 +746,24 @@ def test_nonexistent_deps():
     ]]
 
 
+def test_solver_budget():
+    specs = ['anaconda 1.5.0', 'python 2.7*']
+    # pycosat reliably stops within a single propagation
+    with env_var('CONDA_SAT_SOLVER', 'pycosat', reset_context):
+        with env_var('CONDA_SOLVER_PROP_LIMIT', '1', reset_context):
+            with patch('conda.resolve.stdoutlog') as stdoutlog:
+                dists = r.install(specs)
+    assert any('may not be optimal' in call[0][0] for call in stdoutlog.info.call_args_list)
+    # the best-effort solution still satisfies every dependency
+    recs = [r.index[dist] for dist in dists]
+    for spec in chain(specs, *(rec.depends for rec in recs)):
+        assert any(MatchSpec(spec).match(rec) for rec in recs), spec
+
+    expected = r.install(specs)
+    with env_var('CONDA_SOLVER_PROP_LIMIT', '100000', reset_context):
+        assert r.install(specs) == expected
+
+
 def test_install_package_with_feature():
     index2 = index.copy()
     index2['mypackage-1.0-featurepy33_0.tar.bz2'] = IndexRecord(**{
@@ -881,6 +1006,24 @@ def test_multiple_solution():
     assert len(res) <= len(res1)
 
 
+@pytest.mark.skipif(on_win, reason="solver worker processes are not supported on windows")
+def test_multiple_solution_parallel():
+    index2 = index.copy()
+    fn = 'pandas-0.11.0-np16py27_1.tar.bz2'
+    for k in range(1, 4):
+        fn2 = Dist('%s_%d.tar.bz2' % (fn[:-8], k))
+        index2[fn2] = index[Dist(add_defaults_if_no_channel(fn))]
+    index2 = {Dist(key): value for key, value in iteritems(index2)}
+    r = Resolve(index2)
+    specs = ['pandas', 'python 2.7*', 'numpy 1.6*']
+    serial = r.solve(specs, returnall=True)
+    with env_var('CONDA_SOLVER_PROCESSES', '3', reset_context):
+        parallel = r.solve(specs, returnall=True)
+    assert len(serial) == 4
+    assert parallel[0] == serial[0]
+    assert sorted(parallel) == sorted(serial)
+
+
 def test_broken_install():
     installed = r.install(['pandas', 'python 2.7*', 'numpy 1.6*'])
     assert installed == [Dist(add_defaults_if_no_channel(fname)) for fname in [